@@ -15,6 +15,7 @@
 import asyncio
 import json
 import logging
+import signal
 import traceback
 from pathlib import Path
 from typing import Any, List, Optional
@@ -35,6 +36,7 @@ from itbench_utilities.app.models.base import (
 )
 from itbench_utilities.app.models.bundle import Bundle
 from itbench_utilities.app.utils import get_timestamp_iso
+from itbench_utilities.common import metrics
 from itbench_utilities.common.rest_client import RestClient
 from itbench_utilities.models.agent import AgentInfo, AgentRunCommand
 
@@ -68,6 +70,8 @@ class AgentHarness:
         interval=5,
         benchmark_timeout=300,
         opts: Optional[AgentHarnessOpts] = AgentHarnessOpts(),
+        metrics_port: Optional[int] = None,
+        shutdown_grace_period: int = 300,
     ) -> None:
         self.agent_manifest = agent_manifest
         self.agent_directory = agent_directory
@@ -88,13 +92,22 @@ class AgentHarness:
         self.stop_event = asyncio.Event()
         self.task_history = []
         self.opts = opts
+        self.metrics_port = metrics_port
+        self.shutdown_grace_period = shutdown_grace_period
+        self.agent_operators: List[AgentOperator] = []
+        self.shutdown_task: Optional[asyncio.Task] = None
 
     async def run(self):
 
+        if self.metrics_port:
+            metrics.start_metrics_server(self.metrics_port)
+        self.install_signal_handlers()
+
         timeout = 3600
         elapsed_time = 0
         while elapsed_time < timeout and not self.stop_event.is_set():
             entries: List[AgentBenchmarkEntry] = []
+            metrics.POLLS.inc(component="harness")
             try:
                 manifest_endpoint = f"{self.agent_manifest.manifest_endpoint}"
                 response = self.rest_client.get(manifest_endpoint)
@@ -109,26 +122,62 @@ class AgentHarness:
             logger.info(f"The benchmark statuses: {benchmatk_statuses}")
 
             entries = [x for x in entries if x.status.phase == AgentPhaseEnum.NotStarted]
+            metrics.QUEUED_TASKS.set(len(entries), component="harness")
             if len(entries) > 0:
                 for benchmark_entry in entries:
+                    if self.stop_event.is_set():
+                        logger.info("Shutdown requested. Leave the remaining benchmark entries to other harnesses.")
+                        break
                     benchmark_id = benchmark_entry.benchmark_id
                     logger.info(f"Take the benchmark '{benchmark_entry.benchmark_id}'")
                     self.add_history(benchmark_id)
-                    await run_with_retry(
-                        self.run_benchmark_with_status_update,
-                        retries=self.opts.benchmark_exec_max_attempts,
-                        delay=self.opts.benchmark_exec_retry_interval,
-                        benchmark_id=benchmark_id,
-                        benchmark_entry=benchmark_entry,
-                    )
+                    metrics.JOBS_TAKEN.inc(component="harness")
+                    metrics.RUNNING_TASKS.inc(component="harness")
+                    try:
+                        await run_with_retry(
+                            self.run_benchmark_with_status_update,
+                            retries=self.opts.benchmark_exec_max_attempts,
+                            delay=self.opts.benchmark_exec_retry_interval,
+                            benchmark_id=benchmark_id,
+                            benchmark_entry=benchmark_entry,
+                        )
+                    except Exception:
+                        metrics.JOBS_FAILED.inc(component="harness")
+                        raise
+                    finally:
+                        metrics.RUNNING_TASKS.dec(component="harness")
                 if self.single_run:
                     logger.info("Task completed. Exiting due to run-once mode.")
                     await self.stop()
             else:
                 logger.info(f"No benchmark entries with status 'NotStarted' found. Wait for {self.interval} seconds before the next check...")
+            if self.stop_event.is_set():
+                break
             await asyncio.sleep(self.interval)
             elapsed_time += self.interval
 
+        if self.shutdown_task:
+            self.shutdown_task.cancel()
+
+    def install_signal_handlers(self):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.request_shutdown)
+        except (NotImplementedError, RuntimeError, ValueError) as e:
+            # Signal handlers can only be installed from the main thread on Unix.
+            logger.debug(f"SIGTERM handler is not installed: {e}")
+
+    def request_shutdown(self):
+        logger.info(f"Received SIGTERM. Stop taking benchmarks and let the running agent finish within {self.shutdown_grace_period}s...")
+        self.stop_event.set()
+        if self.shutdown_task is None:
+            self.shutdown_task = asyncio.create_task(self.terminate_agents_after_grace_period())
+
+    async def terminate_agents_after_grace_period(self):
+        await asyncio.sleep(self.shutdown_grace_period)
+        logger.warning("Grace period is over. Terminate the running agents.")
+        for ao in list(self.agent_operators):
+            ao.terminate()
+
     async def run_benchmark_with_status_update(self, benchmark_id, benchmark_entry: AgentBenchmarkEntry):
         self.rest_client.put(
             f"{self.agent_manifest.manifest_endpoint}/benchmark-entries/{benchmark_id}",
@@ -137,6 +186,10 @@ class AgentHarness:
         is_completed = await self.run_benchmark(benchmark_id, benchmark_entry.agent_access_info.id)
         if is_completed:
             phase = AgentPhaseEnum.Finished
+        elif self.stop_event.is_set():
+            # Interrupted by a shutdown; another harness can take the entry again.
+            logger.info(f"Benchmark '{benchmark_id}' is interrupted. Put it back to {AgentPhaseEnum.NotStarted.value}.")
+            phase = AgentPhaseEnum.NotStarted
         else:
             phase = AgentPhaseEnum.TimeedOut
         self.rest_client.put(f"{self.agent_manifest.manifest_endpoint}/benchmark-entries/{benchmark_id}", Status(phase=phase).model_dump_json())
@@ -180,11 +233,13 @@ class AgentHarness:
         return False
 
     async def run_agent(self, target_bundle: Bundle, benchmark_id: str, agent_id: str):
+        ao: Optional[AgentOperator] = None
         try:
             response = self.rest_client.get(f"/benchmarks/{benchmark_id}/agents/{agent_id}")
             agent = Agent.model_validate(response.json())
             agent_info = AgentInfo(id=agent.metadata.id, name=agent.spec.name, directory=self.agent_directory)
-            ao = AgentOperator(agent_info=agent_info)
+            ao = AgentOperator(agent_info=agent_info, detach=True)
+            self.agent_operators.append(ao)
             self.rest_client.assign(benchmark_id, agent_id, target_bundle.metadata.id)
             self.rest_client.push_agent_status(benchmark_id, agent_id, AgentPhaseEnum.Executing)
             shared_workspace = Path("/tmp") / "shared_workspace" / agent.metadata.id / target_bundle.spec.name
@@ -196,12 +251,20 @@ class AgentHarness:
                 path.parent.mkdir(parents=True, exist_ok=True)
                 with path.open("w") as f:
                     f.write(json.dumps(target_bundle.spec.data))
-                stdout = ao.invoke_by_cmd(target_bundle.spec.name, self.config.run)
+                # The agent runs in a worker thread so that the event loop can still handle signals.
+                stdout = await asyncio.to_thread(ao.invoke_by_cmd, target_bundle.spec.name, self.config.run)
                 self.rest_client.upload_file(benchmark_id, self.config.path_to_data_pushed_to_scenario, target_bundle.metadata.id)
             else:
-                stdout = ao.invoke_agent(target_bundle.spec.name, shared_workspace, target_bundle.spec.data, output_dir_per_bundle)
+                stdout = await asyncio.to_thread(
+                    ao.invoke_agent, target_bundle.spec.name, shared_workspace, target_bundle.spec.data, output_dir_per_bundle
+                )
             self.add_history(benchmark_id, target_bundle, stdout)
             self.rest_client.push_agent_status(benchmark_id, agent_id, AgentPhaseEnum.Finished, message=stdout)
+        except asyncio.CancelledError:
+            # E.g. Ctrl-C: the detached agent does not receive the interrupt itself.
+            if ao:
+                ao.terminate()
+            raise
         except Exception as e:
             err = traceback.format_exc()
             logger.error(err)
@@ -209,6 +272,9 @@ class AgentHarness:
                 self.rest_client.push_agent_status(benchmark_id, agent_id, AgentPhaseEnum.Error, message=f"{e}")
             except Exception as e2:
                 logger.error(f"Failed to update agent status to 'Error' for benchmark {benchmark_id!r} (agent {agent_id!r}): {e2}")
+        finally:
+            if ao in self.agent_operators:
+                self.agent_operators.remove(ao)
 
         def wait_bundle_finished():
             logger.info(f"Wait for bundle to finish...")
@@ -282,5 +348,7 @@ def run(args):
         config=config,
         single_run=args.single_run,
         opts=opts,
+        metrics_port=args.metrics_port,
+        shutdown_grace_period=args.shutdown_grace_period,
     )
     asyncio.run(agent_harness.run())
@@ -15,7 +15,6 @@
 import argparse
 import logging
 
-import itbench_utilities.agent_harness.agent
 from itbench_utilities.app.config import DEFAULT_MINIBENCH_HOST, DEFAULT_MINIBENCH_PORT
 
 
@@ -53,6 +52,17 @@ def main():
         action="store_true",
         help="Process one benchmark job and exit",
     )
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        help="If specified, serve Prometheus metrics on http://0.0.0.0:<metrics_port>/metrics (default: disabled).",
+    )
+    parser.add_argument(
+        "--shutdown_grace_period",
+        type=int,
+        default=300,
+        help="Seconds to let a running agent finish after SIGTERM before it is terminated (default: 300).",
+    )
     parser.add_argument("--benchmark_exec_max_attempts", type=int, default=3, help=f"Maximum number of attempts to run the benchmark with status updates (default: 3).")
     parser.add_argument("--benchmark_exec_retry_interval", type=int, default=5, help=f"Seconds to wait between retry attempts for benchmark execution (default: 5).")
 
@@ -63,6 +73,8 @@ def main():
     else:
         logging.basicConfig(format=log_format, level=logging.INFO)
 
+    import itbench_utilities.agent_harness.agent
+
     itbench_utilities.agent_harness.agent.run(args)
 
 
@@ -15,12 +15,15 @@
 import logging
 import os
 import shutil
+import signal
 import subprocess
+import threading
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Optional, Set, Tuple
 
 from jinja2 import Template
 
+from itbench_utilities.common import metrics, tracing
 from itbench_utilities.models.agent import AgentInfo, AgentRunCommand
 
 logger = logging.getLogger(__name__)
@@ -28,9 +31,30 @@ logger = logging.getLogger(__name__)
 
 class AgentOperator:
 
-    def __init__(self, agent_info: AgentInfo, _logger: Optional[logging.Logger] = None) -> None:
+    def __init__(self, agent_info: AgentInfo, _logger: Optional[logging.Logger] = None, detach: bool = False) -> None:
         self.agent_info = agent_info
+        # A detached agent runs in its own session, out of reach of terminal signals such as Ctrl-C; its owner stops it with terminate().
+        self.detach = detach
         self.logger = _logger if _logger else logger
+        self.processes: Set[subprocess.Popen] = set()
+        self.lock = threading.Lock()
+
+    def terminate(self):
+        with self.lock:
+            processes = list(self.processes)
+        for process in processes:
+            self.logger.warning(f"Terminate the agent process {process.pid}")
+            self.terminate_process(process)
+
+    def terminate_process(self, process: subprocess.Popen):
+        try:
+            if self.detach:
+                # The agent runs in its own session, so this reaches the shell and everything it started.
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+        except ProcessLookupError:
+            pass
 
     def invoke_by_cmd(self, bundle_name: str, run_command: AgentRunCommand) -> str:
         logger = self.logger
@@ -93,27 +117,42 @@ class AgentOperator:
         if env:
             current_env.update(env)
 
-        process = subprocess.Popen(
-            argv,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            cwd=cwd,
-            env=current_env,
-            shell=True,
-        )
-
-        stdout = ''
-        for stdout_line in process.stdout:
-            stdout += stdout_line
-            logger.info(stdout_line.strip())
-
-        for stderr_line in process.stderr:
-            logger.error(stderr_line.strip())
-
-        process.stdout.close()
-        process.stderr.close()
-        process.wait()
+        with metrics.track_subprocess("agent"), tracing.span(f"agent {self.agent_info.name}", category="agent", agent=self.agent_info.name) as span:
+            process = subprocess.Popen(
+                argv,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                cwd=cwd,
+                env=current_env,
+                shell=True,
+                start_new_session=self.detach,
+            )
+            with self.lock:
+                self.processes.add(process)
+
+            try:
+                stdout = ''
+                for stdout_line in process.stdout:
+                    stdout += stdout_line
+                    logger.info(stdout_line.strip())
+
+                for stderr_line in process.stderr:
+                    logger.error(stderr_line.strip())
+
+                process.stdout.close()
+                process.stderr.close()
+                process.wait()
+            except BaseException:
+                # E.g. KeyboardInterrupt: a detached agent does not receive it, so it is forwarded.
+                if self.detach and process.poll() is None:
+                    self.terminate_process(process)
+                raise
+            finally:
+                with self.lock:
+                    self.processes.discard(process)
+            if span:
+                span.attributes["returncode"] = process.returncode
 
         if process.returncode != 0:
             stderr = process.stderr.read()
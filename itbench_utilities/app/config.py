@@ -49,6 +49,37 @@ class AppConfig(BaseSettings):
         False,
         description="Enable or disable SSL certificate verification. Set to True to verify the certificate, or False to disable verification (default: False).",
     )
+    event_log_dir: Optional[str] = Field(
+        None, description="Directory to write benchmark events as rotating JSONL files (one set per benchmark). Disabled if not set."
+    )
+    event_log_max_bytes: Optional[int] = Field(64 * 1024 * 1024, description="Size in bytes at which an event file is rotated.")
+    event_log_compress: Optional[bool] = Field(False, description="Compress rotated event files with gzip.")
+    results_store_dir: Optional[str] = Field(
+        None, description="Root directory of the historical results store that every benchmark job appends to. Disabled if not set."
+    )
+    log_dir: Optional[str] = Field(None, description="Directory to write per-benchmark log files. Default is the current working directory.")
+    log_max_bytes: Optional[int] = Field(32 * 1024 * 1024, description="Size in bytes at which a per-benchmark log file is rotated.")
+    log_backup_count: Optional[int] = Field(5, description="Number of rotated per-benchmark log files to keep.")
+    max_concurrent_tasks: Optional[int] = Field(1, description="The maximum number of benchmark jobs a runner executes at the same time.")
+    worker_mode: Optional[str] = Field(
+        "thread", description="Run each benchmark job in a thread of the runner ('thread') or in a worker process of its own ('process')."
+    )
+    worker_start_method: Optional[str] = Field("spawn", description="Start method of worker processes: 'spawn' or 'forkserver'.")
+    worker_memory_limit: Optional[int] = Field(
+        None, description="Resident memory in bytes above which a worker process is stopped and its job fails. Unlimited if not set."
+    )
+    worker_time_limit: Optional[int] = Field(
+        None, description="Seconds after which a worker process is stopped and its job fails. Unlimited if not set."
+    )
+    job_lease_seconds: Optional[int] = Field(
+        60, description="Lease of a taken benchmark job. The runner renews it by heartbeats; a job whose lease expires can be taken again."
+    )
+    shutdown_grace_period: Optional[int] = Field(
+        300, description="Seconds a runner lets running scenarios finish after SIGTERM before it aborts them."
+    )
+    shutdown_abort_timeout: Optional[int] = Field(
+        60, description="Seconds a runner waits for aborted scenarios to be cleaned up before it releases their jobs and exits."
+    )
 
     class Config:
         env_file = ".env"
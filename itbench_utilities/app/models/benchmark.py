@@ -25,6 +25,7 @@ from itbench_utilities.app.models.scenario import Scenario
 class BenchmarkSpec(BaseModel):
     name: str
     runner_id: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
     agent_id: Optional[str] = None
     scenarios: Optional[List[Scenario]] = None
     log_file_path: Optional[str] = None
@@ -66,6 +67,17 @@ class BenchmarkJobTake(BaseModel):
     runner_id: str
 
 
+class BenchmarkJobHeartbeat(BaseModel):
+    runner_id: str
+    lease_seconds: int
+
+
+class BenchmarkJobLease(BaseModel):
+    success: bool
+    runner_id: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+
+
 class BenchmarkJob(BaseModel):
     benchmark: Benchmark
     agent_manifest: Optional[AgentManifest] = None
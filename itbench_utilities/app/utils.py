@@ -12,11 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from uuid import uuid4
 
 from itbench_utilities.app.models.base import Status
+from itbench_utilities.app.models.benchmark import BenchmarkSpec
 
 
 def get_tempdir(id: str):
@@ -37,3 +38,21 @@ def get_uuid() -> str:
 
 def create_status(phase: str, message: Optional[str] = None) -> Status:
     return Status(lastTransitionTime=get_timestamp(), phase=phase, message=message)
+
+
+def renew_job_lease(spec: BenchmarkSpec, runner_id: str, lease_seconds: int, now: Optional[datetime] = None) -> bool:
+    # A runner can only renew the lease of a job it holds, or take over one whose lease has expired.
+    now = now if now else get_timestamp()
+    if spec.runner_id and spec.runner_id != runner_id and not is_job_lease_expired(spec, now):
+        return False
+    spec.runner_id = runner_id
+    spec.lease_expires_at = now + timedelta(seconds=lease_seconds)
+    return True
+
+
+def is_job_lease_expired(spec: BenchmarkSpec, now: Optional[datetime] = None) -> bool:
+    return spec.lease_expires_at is not None and spec.lease_expires_at <= (now if now else get_timestamp())
+
+
+def is_job_claimable(spec: BenchmarkSpec, now: Optional[datetime] = None) -> bool:
+    return not spec.runner_id or is_job_lease_expired(spec, now)
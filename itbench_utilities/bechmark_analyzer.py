@@ -13,15 +13,89 @@
 # limitations under the License.
 
 import logging
+import math
+import os
 from datetime import timedelta
-from typing import List
+from typing import Any, Dict, List, Optional
 
-from itbench_utilities.models.benchmark import BenchmarkResult
+import numpy as np
+import pandas as pd
+
+from itbench_utilities.models.benchmark import BenchmarkResult, ScenarioResult
 from itbench_utilities.models.bundle import BundleResult
 
 logger = logging.getLogger(__name__)
 log_format = "[%(asctime)s %(levelname)s %(name)s] %(message)s"
 
+DEFAULT_BOOTSTRAP_RESAMPLES = 1000
+DEFAULT_CONFIDENCE = 0.95
+TTR_PERCENTILES = (50, 90, 99)
+# Above this many resampled values the MTTR interval uses the normal approximation, which the bootstrap converges to.
+BOOTSTRAP_EXACT_LIMIT = int(os.getenv("BOOTSTRAP_EXACT_LIMIT", str(20_000_000)))
+BOOTSTRAP_CHUNK_SIZE = 4_000_000
+
+
+def to_timedelta(ns: float) -> timedelta:
+    return pd.Timedelta(ns, unit="ns").to_pytimedelta()
+
+
+def calc_ttr_percentiles(ttr_ns: np.ndarray) -> Dict[str, timedelta]:
+    values = np.percentile(ttr_ns, TTR_PERCENTILES)
+    return {f"ttr_p{p}": to_timedelta(v) for p, v in zip(TTR_PERCENTILES, values)}
+
+
+def bootstrap_pass_rate(passed: np.ndarray, not_errored: np.ndarray, resamples: int, rng: np.random.Generator) -> np.ndarray:
+    # A resample only matters through how many rows fall into each (passed, not_errored) cell,
+    # so draw the cell counts from a multinomial instead of resampling rows: O(resamples) for any history size.
+    n = len(passed)
+    cells = passed.astype(np.int64) * 2 + not_errored.astype(np.int64)
+    probabilities = np.bincount(cells, minlength=4) / n
+    counts = rng.multinomial(n, probabilities, size=resamples)
+    num_of_passed = counts[:, 2] + counts[:, 3]
+    num_of_non_errored = counts[:, 1] + counts[:, 3]
+    return np.divide(num_of_passed, num_of_non_errored, out=np.zeros(resamples), where=num_of_non_errored > 0)
+
+
+def bootstrap_mean(values: np.ndarray, resamples: int, rng: np.random.Generator) -> np.ndarray:
+    n = len(values)
+    if resamples * n > BOOTSTRAP_EXACT_LIMIT:
+        return rng.normal(values.mean(), values.std() / np.sqrt(n), size=resamples)
+    means = np.empty(resamples)
+    chunk = max(1, BOOTSTRAP_CHUNK_SIZE // n)
+    for start in range(0, resamples, chunk):
+        stop = min(start + chunk, resamples)
+        means[start:stop] = values[rng.integers(0, n, size=(stop - start, n))].mean(axis=1)
+    return means
+
+
+def calc_statistics(
+    passed: np.ndarray,
+    not_errored: np.ndarray,
+    ttr_ns: np.ndarray,
+    resamples: int = DEFAULT_BOOTSTRAP_RESAMPLES,
+    seed: Optional[int] = None,
+    confidence: float = DEFAULT_CONFIDENCE,
+) -> Dict[str, Any]:
+    if len(ttr_ns) == 0:
+        return {}
+    statistics: Dict[str, Any] = calc_ttr_percentiles(ttr_ns)
+    if resamples <= 0:
+        return statistics
+    rng = np.random.default_rng(seed)
+    quantiles = [(1 - confidence) / 2, 1 - (1 - confidence) / 2]
+    score_low, score_high = np.quantile(bootstrap_pass_rate(passed, not_errored, resamples, rng), quantiles)
+    mttr_low, mttr_high = np.quantile(bootstrap_mean(ttr_ns.astype(np.float64), resamples, rng), quantiles)
+    statistics.update(
+        {
+            "score_ci_low": float(score_low),
+            "score_ci_high": float(score_high),
+            "mttr_ci_low": to_timedelta(mttr_low),
+            "mttr_ci_high": to_timedelta(mttr_high),
+            "confidence": confidence,
+        }
+    )
+    return statistics
+
 
 class Analyzer:
 
@@ -41,7 +115,19 @@ class Analyzer:
             return 0
         return self.calc_num_of_pass() / total
 
-    def to_benchmark_result(self, title, agent) -> BenchmarkResult:
+    def calc_statistics(self, resamples: int = DEFAULT_BOOTSTRAP_RESAMPLES, seed: Optional[int] = None, confidence: float = DEFAULT_CONFIDENCE):
+        return calc_statistics(
+            self.df[BundleResult.Column.passed].to_numpy(dtype=bool),
+            ~self.df[BundleResult.Column.errored].to_numpy(dtype=bool),
+            self.df[BundleResult.Column.ttr].to_numpy(dtype="timedelta64[ns]").astype(np.int64),
+            resamples=resamples,
+            seed=seed,
+            confidence=confidence,
+        )
+
+    def to_benchmark_result(
+        self, title, agent, resamples: int = DEFAULT_BOOTSTRAP_RESAMPLES, seed: Optional[int] = None, confidence: float = DEFAULT_CONFIDENCE
+    ) -> BenchmarkResult:
         mttr = self.calc_mttr()
         num_of_pass = self.calc_num_of_pass()
         score = self.calc_pass_rate()
@@ -56,4 +142,123 @@ class Analyzer:
             score=score,
             results=self.bundle_results,
             date=latest_one.date,
+            **self.calc_statistics(resamples=resamples, seed=seed, confidence=confidence),
+        )
+
+
+def calc_pass_at_k(n: int, c: int, k: int) -> Optional[float]:
+    # Unbiased estimator 1 - C(n-c, k) / C(n, k) of the probability that at least one of k trials passes, given c passes in n trials.
+    if n < k:
+        return None
+    if n - c < k:
+        return 1.0
+    return 1.0 - math.comb(n - c, k) / math.comb(n, k)
+
+
+def calc_scenario_results(df: pd.DataFrame, k: int) -> List[ScenarioResult]:
+    scenarios = df.groupby([BundleResult.Column.agent, BundleResult.Column.name], sort=False).agg(
+        incident_type=(BundleResult.Column.incident_type, "first"),
+        trials=(BundleResult.Column.passed, "size"),
+        num_of_passed=(BundleResult.Column.passed, "sum"),
+        ttr_mean=("ttr_seconds", "mean"),
+        ttr_variance=("ttr_seconds", "var"),
+    )
+    scenario_results = []
+    for (agent, name), row in zip(scenarios.index, scenarios.itertuples(index=False)):
+        scenario_results.append(
+            ScenarioResult(
+                agent=agent,
+                name=name,
+                incident_type=row.incident_type if isinstance(row.incident_type, str) else None,
+                trials=row.trials,
+                num_of_passed=row.num_of_passed,
+                pass_at_1=row.num_of_passed / row.trials,
+                pass_at_k=calc_pass_at_k(row.trials, row.num_of_passed, k),
+                ttr_mean=row.ttr_mean,
+                ttr_variance=None if pd.isna(row.ttr_variance) else row.ttr_variance,
+            )
+        )
+    return scenario_results
+
+
+def calc_repeat_statistics(df: pd.DataFrame, k: int) -> Dict[str, Any]:
+    scenario_results = calc_scenario_results(df, k)
+    pass_at_k = [x.pass_at_k for x in scenario_results if x.pass_at_k is not None]
+    return {
+        "k": k,
+        "pass_at_1": float(np.mean([x.pass_at_1 for x in scenario_results])),
+        "pass_at_k": float(np.mean(pass_at_k)) if pass_at_k else None,
+        "scenarios": scenario_results,
+    }
+
+
+def aggregate(
+    bundle_results: List[BundleResult],
+    title: str,
+    by_incident_type: bool = False,
+    resamples: int = DEFAULT_BOOTSTRAP_RESAMPLES,
+    seed: Optional[int] = None,
+    confidence: float = DEFAULT_CONFIDENCE,
+    k: Optional[int] = None,
+) -> List[BenchmarkResult]:
+    # Same semantics as Analyzer.to_benchmark_result, computed for every group in one grouped pass:
+    # MTTR over all results, score over non-errored results and date of the latest result.
+    n = len(bundle_results)
+    if n == 0:
+        return []
+    df = pd.DataFrame(
+        {
+            BundleResult.Column.agent: [x.agent for x in bundle_results],
+            BundleResult.Column.name: [x.name for x in bundle_results],
+            BundleResult.Column.incident_type: [x.incident_type for x in bundle_results],
+            BundleResult.Column.passed: np.fromiter((x.passed for x in bundle_results), dtype=bool, count=n),
+            "not_errored": np.fromiter((not x.errored for x in bundle_results), dtype=bool, count=n),
+            "ttr_ns": np.fromiter((x.ttr // timedelta(microseconds=1) for x in bundle_results), dtype=np.int64, count=n) * 1000,
+            BundleResult.Column.date: pd.to_datetime([x.date for x in bundle_results], utc=True),
+        }
+    )
+    keys = [BundleResult.Column.agent, BundleResult.Column.incident_type] if by_incident_type else [BundleResult.Column.agent]
+    grouped = df.groupby(keys, sort=False, dropna=False)
+    stats = grouped.agg(
+        num_of_passed=(BundleResult.Column.passed, "sum"),
+        num_of_non_errored=("not_errored", "sum"),
+        mttr_ns=("ttr_ns", "mean"),
+        latest=(BundleResult.Column.date, "idxmax"),
+    )
+    if by_incident_type:
+        incident_types = None
+    else:
+        unique_types = df[keys + [BundleResult.Column.incident_type]].dropna().drop_duplicates()
+        incident_types = unique_types.groupby(BundleResult.Column.agent, sort=False)[BundleResult.Column.incident_type].agg(",".join)
+    indices = grouped.indices
+    passed = df[BundleResult.Column.passed].to_numpy()
+    not_errored = df["not_errored"].to_numpy()
+    ttr_ns = df["ttr_ns"].to_numpy()
+
+    benchmark_results: List[BenchmarkResult] = []
+    for key, row in zip(stats.index, stats.itertuples(index=False)):
+        agent = key[0] if by_incident_type else key
+        if by_incident_type:
+            incident_type = key[1] if isinstance(key[1], str) else ""
+        else:
+            incident_type = incident_types.get(agent, "")
+        score = row.num_of_passed / row.num_of_non_errored if row.num_of_non_errored > 0 else 0
+        index = indices[key]
+        statistics = calc_statistics(passed[index], not_errored[index], ttr_ns[index], resamples=resamples, seed=seed, confidence=confidence)
+        if k:
+            group = df.iloc[index].assign(ttr_seconds=ttr_ns[index] / 1e9)
+            statistics.update(calc_repeat_statistics(group, k))
+        benchmark_results.append(
+            BenchmarkResult(
+                name=title,
+                agent=agent,
+                incident_type=incident_type,
+                mttr=pd.Timedelta(row.mttr_ns, unit="ns").to_pytimedelta(),
+                num_of_passed=int(row.num_of_passed),
+                score=score,
+                results=[bundle_results[i] for i in index],
+                date=bundle_results[row.latest].date,
+                **statistics,
+            )
         )
+    return benchmark_results
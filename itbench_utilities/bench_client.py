@@ -14,12 +14,11 @@
 
 import asyncio
 import logging
+import sys
+from http import HTTPStatus
 from typing import Any, Dict, List, Optional
 
 import requests
-from fastapi import HTTPException
-from fastapi.responses import StreamingResponse
-from starlette.status import HTTP_404_NOT_FOUND
 
 from itbench_utilities.app.models.agent import Agent
 from itbench_utilities.app.models.base import AgentPhaseEnum, BundlePhaseEnum
@@ -27,6 +26,7 @@ from itbench_utilities.app.models.benchmark import Benchmark
 from itbench_utilities.app.models.bundle import Bundle as BundleInApp
 from itbench_utilities.app.models.result import ResultSpec
 from itbench_utilities.app.utils import create_status
+from itbench_utilities.common.blob_store import BlobStore
 from itbench_utilities.common.rest_client import RestClient
 from itbench_utilities.models.benchmark import BenchRunConfig
 from itbench_utilities.models.bundle import Bundle, BundleResult
@@ -52,11 +52,11 @@ class BenchClient:
                 endpoint = f"/benchmarks/{self.bench_run_config.benchmark_id}"
                 response = self.client.get(endpoint)
                 Benchmark.model_validate(response.json())
-        except HTTPException as e:
-            if e.status_code == HTTP_404_NOT_FOUND:
-                raise BenchNotFoundException(f"Benchmark id '{self.bench_run_config.benchmark_id}' is not found.")
         except Exception as e:
-            raise e
+            if not is_http_exception(e):
+                raise e
+            if e.status_code == HTTPStatus.NOT_FOUND:
+                raise BenchNotFoundException(f"Benchmark id '{self.bench_run_config.benchmark_id}' is not found.")
 
     def push_bundle_status(self, bundle_id: str, phase: BundlePhaseEnum, message: Optional[str] = None):
         bench_run_config = self.bench_run_config
@@ -88,7 +88,7 @@ class BenchClient:
             res = self.client.get(endpoint)
             return Agent.model_validate(res.json())
 
-    def upload_bundle_results(self, bundle: Bundle, bundle_results: List[BundleResult]):
+    def upload_bundle_results(self, bundle: Bundle, bundle_results: List[BundleResult], blob_store: Optional[BlobStore] = None):
         bench_run_config = self.bench_run_config
         if bench_run_config.push_model:
             result_specs: List[ResultSpec] = [
@@ -102,7 +102,8 @@ class BenchClient:
                     ttr=x.ttr,
                     errored=x.errored,
                     date=x.date,
-                    message=x.message,
+                    # Offloaded messages are resolved: only the local copies keep a preview and a reference.
+                    message=x.load_message(blob_store) if blob_store else x.message,
                 )
                 for x in bundle_results
             ]
@@ -118,8 +119,20 @@ class BenchClient:
             save_response_to_file(response, download_path)
 
 
+# FastAPI objects can only come from an in-process app, which has already imported FastAPI,
+# so they are checked through sys.modules instead of importing FastAPI here.
+def is_http_exception(e: Exception) -> bool:
+    fastapi = sys.modules.get("fastapi")
+    return fastapi is not None and isinstance(e, fastapi.HTTPException)
+
+
+def is_streaming_response(response: Any) -> bool:
+    responses = sys.modules.get("starlette.responses")
+    return responses is not None and isinstance(response, responses.StreamingResponse)
+
+
 def save_response_to_file(response, output_file_path):
-    if isinstance(response, StreamingResponse):
+    if is_streaming_response(response):
 
         async def write_chunks():
             with open(output_file_path, "wb") as f:
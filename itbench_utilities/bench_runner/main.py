@@ -15,8 +15,6 @@
 import argparse
 import logging
 
-import itbench_utilities.agent_harness.agent
-import itbench_utilities.bench_runner.runner
 from itbench_utilities.app.config import (
     DEFAULT_MINIBENCH_HOST,
     DEFAULT_MINIBENCH_PORT,
@@ -52,6 +50,70 @@ def main():
         action="store_true",
         help="Process one benchmark job and exit",
     )
+    parser_runner.add_argument(
+        "--metrics_port",
+        type=int,
+        help="If specified, serve Prometheus metrics on http://0.0.0.0:<metrics_port>/metrics (default: disabled).",
+    )
+    parser_runner.add_argument(
+        "--max_concurrent_tasks",
+        type=int,
+        help="The maximum number of benchmark jobs run at the same time (default: max_concurrent_tasks in the configuration, or 1).",
+    )
+    parser_runner.add_argument(
+        "--worker_mode",
+        type=str,
+        choices=["thread", "process"],
+        help="Run each benchmark job in a thread or in a worker process of its own (default: worker_mode in the configuration, or thread).",
+    )
+    parser_runner.add_argument(
+        "--profile",
+        type=str,
+        choices=["bundle", "job"],
+        help="Profile each bundle run ('bundle') or the whole benchmark job ('job') with cProfile and tracemalloc (default: disabled).",
+    )
+
+    # global leaderboard
+    parser_leaderboard = subparsers.add_parser(
+        "leaderboard", description="Merge many bundle_results.jsonl files into a global leaderboard", help="see `leaderboard -h`"
+    )
+    parser_leaderboard.add_argument(
+        "-i", "--input", type=str, nargs="+", help="Result files or directories to search for bundle_results.jsonl recursively.", required=True
+    )
+    parser_leaderboard.add_argument("-o", "--out", type=str, help="Output directory of the leaderboard.", required=True)
+    parser_leaderboard.add_argument("--title", type=str, default="leaderboard", help="The name of the leaderboard (default: leaderboard).")
+    parser_leaderboard.add_argument("--by_incident_type", action="store_true", help="Rank each agent per incident type.")
+
+    # results query
+    parser_results = subparsers.add_parser("results", description="Query bundle results through an incremental index", help="see `results -h`")
+    parser_results.add_argument(
+        "-i", "--input", type=str, nargs="+", help="Output directories to (re)index before the query. Only new or modified files are read."
+    )
+    parser_results.add_argument(
+        "--index",
+        type=str,
+        help="Path to the index database (default: $RESULTS_INDEX_PATH or results_index.sqlite).",
+    )
+    parser_results.add_argument("--agent", type=str, nargs="+", help="Filter by agent names.")
+    parser_results.add_argument("--incident_type", type=str, nargs="+", help="Filter by incident types.")
+    parser_results.add_argument("--name", type=str, nargs="+", help="Filter by scenario names.")
+    parser_results.add_argument("--benchmark_id", type=str, nargs="+", help="Filter by benchmark ids.")
+    parser_results.add_argument("--since", type=str, help="Only results on or after this date (YYYY-MM-DD or ISO 8601).")
+    parser_results.add_argument("--until", type=str, help="Only results on or before this date (YYYY-MM-DD or ISO 8601).")
+    parser_results.add_argument("--summary", action="store_true", help="Show pass rate and MTTR per agent and incident type.")
+    parser_results.add_argument("--limit", type=int, default=100, help="The maximum number of results to show (default: 100).")
+
+    # regression detection
+    parser_compare = subparsers.add_parser(
+        "compare", description="Detect TTR, pass-rate and phase duration regressions between runs", help="see `compare -h`"
+    )
+    parser_compare.add_argument("-b", "--baseline", type=str, help="Output directory of the baseline run.", required=True)
+    parser_compare.add_argument("-c", "--candidate", type=str, nargs="+", help="Output directories of the candidate runs.", required=True)
+    parser_compare.add_argument("--baseline_agent", type=str, help="Only use results of this agent in the baseline run.")
+    parser_compare.add_argument("--candidate_agent", type=str, help="Only use results of this agent in the candidate runs.")
+    parser_compare.add_argument("--alpha", type=float, help="Significance level (default: 0.05).")
+    parser_compare.add_argument("-o", "--out", type=str, help="Path to write the JSON report.")
+    parser_compare.add_argument("--fail_on_regression", action="store_true", help="Exit with status 1 if any regression is detected.")
 
     # caa agent harness
     parser_benchmark_agent = subparsers.add_parser(
@@ -74,8 +136,23 @@ def main():
     else:
         log.init()
 
-    if args.command == 'runner':
+    # Subcommand modules are imported on demand so that parsing and `--help` do not load pandas or FastAPI.
+    if args.command == "runner":
+        import itbench_utilities.bench_runner.runner
+
         itbench_utilities.bench_runner.runner.run(args)
+    elif args.command == "leaderboard":
+        import itbench_utilities.leaderboard
+
+        itbench_utilities.leaderboard.run(args)
+    elif args.command == "compare":
+        import itbench_utilities.regression
+
+        itbench_utilities.regression.run(args)
+    elif args.command == "results":
+        import itbench_utilities.results_index
+
+        itbench_utilities.results_index.run(args)
 
 
 if __name__ == "__main__":
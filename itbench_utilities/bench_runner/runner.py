@@ -14,8 +14,12 @@
 
 import asyncio
 import logging
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 import yaml
 
@@ -27,19 +31,38 @@ from itbench_utilities.app.models.base import BenchmarkPhaseEnum
 from itbench_utilities.app.models.benchmark import (
     Benchmark,
     BenchmarkJob,
+    BenchmarkJobHeartbeat,
+    BenchmarkJobLease,
     BenchmarkJobTake,
 )
 from itbench_utilities.app.models.bundle import Bundle as BundleInApp
 from itbench_utilities.bench_runner.utils import (
     build_benchmark_run_config,
-    get_specific_log_file_path,
-    setup_request_logger,
+    get_request_log_file_path,
 )
-from itbench_utilities.app.utils import create_status
+from itbench_utilities.bench_runner.worker import (
+    WorkerJob,
+    WorkerMode,
+    WorkerProcess,
+    open_benchmark_job,
+)
+from itbench_utilities.app.utils import create_status, is_job_claimable
+from itbench_utilities.common import metrics, profiling
+from itbench_utilities.common.profiling import ProfileScope
 from itbench_utilities.common.rest_client import RestClient
+from itbench_utilities.models.benchmark import BenchRunConfig
 
 logger = logging.getLogger(__name__)
 
+# Threads of the default executor kept for asyncio.to_thread calls other than benchmark jobs.
+EXTRA_EXECUTOR_WORKERS = 4
+# Claim up to this many times the number of free slots per poll, to make up for claims lost to other runners.
+CLAIM_OVERSUBSCRIPTION = int(os.getenv("RUNNER_CLAIM_OVERSUBSCRIPTION", "2"))
+# Heartbeats are sent this many times per lease so that a few lost requests do not let the lease expire.
+HEARTBEATS_PER_LEASE = 3
+# Seconds before expiry at which the access token of a service account is renewed.
+TOKEN_REFRESH_MARGIN = int(os.getenv("RUNNER_TOKEN_REFRESH_MARGIN", "60"))
+
 
 class BenchmarkRunner:
     def __init__(
@@ -50,6 +73,10 @@ class BenchmarkRunner:
         token: Optional[str] = None,
         single_run=False,
         interval=10,
+        metrics_port: Optional[int] = None,
+        profile: Optional[ProfileScope] = None,
+        max_concurrent_tasks: Optional[int] = None,
+        worker_mode: Optional[WorkerMode] = None,
     ) -> None:
         self.app_config = app_config
         self.runner_id = runner_id
@@ -57,25 +84,41 @@ class BenchmarkRunner:
         self.port = app_config.port
         self.ssl = app_config.ssl_enabled
         self.ssl_verify = app_config.ssl_verify
-        self.max_concurrent_tasks = 1
+        self.max_concurrent_tasks = max(max_concurrent_tasks or app_config.max_concurrent_tasks or 1, 1)
         self.running_tasks = 0
+        self.running_tasks_lock = threading.Lock()
+        self.semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        self.tasks = set()
+        self.worker_mode = WorkerMode(worker_mode or app_config.worker_mode or WorkerMode.Thread)
+        self.jobs: Dict[str, Union[itbench_utilities.benchmark.Benchmark, WorkerProcess]] = {}
+        self.shutting_down = False
+        self.heartbeat_supported = True
+        # Jobs whose lease was lost: another runner may own them now, so they are neither released nor updated.
+        self.lost_leases: Set[str] = set()
         self.interval = interval
         self.service_type = service_type
         self.token = token
         self.single_run = single_run
+        self.metrics_port = metrics_port
+        self.profile = profile
         self.job_client: RestClient
         self.stop_event = asyncio.Event()
 
     def init_job_client(self):
         self.job_client = RestClient(self.host, self.port, ssl=self.ssl, verify=self.ssl_verify)
+        self.job_client.on_unauthorized = lambda: self.auth_job_client(force=True)
         self.auth_job_client()
 
-    def auth_job_client(self):
+    def auth_job_client(self, force: bool = False):
         if self.service_type:
+            # The token is reused across polls and renewed shortly before it expires, or when the server rejects it.
+            if not force and self.job_client.is_token_valid(margin=TOKEN_REFRESH_MARGIN):
+                return
             service_accounts = [x for x in self.app_config.service_accounts if x.type == self.service_type]
             if len(service_accounts) == 0:
                 logger.error("Please specify correct service type")
             service_account = service_accounts[0]
+            logger.info(f"Log in to the Bench Server as service account '{service_account.id}'.")
             self.job_client.login(service_account.id, get_service_api_key(service_account.id))
         elif self.token:
             self.job_client.headers["Authorization"] = f"Bearer {self.token}"
@@ -83,38 +126,173 @@ class BenchmarkRunner:
     def create_finished_status(self):
         return create_status(phase=BenchmarkPhaseEnum.Finished)
 
+    def task_started(self):
+        with self.running_tasks_lock:
+            self.running_tasks += 1
+            metrics.RUNNING_TASKS.set(self.running_tasks, component="runner")
+
+    def task_finished(self):
+        with self.running_tasks_lock:
+            self.running_tasks -= 1
+            metrics.RUNNING_TASKS.set(self.running_tasks, component="runner")
+
     async def run(self):
 
+        if self.metrics_port:
+            metrics.start_metrics_server(self.metrics_port)
+        # Each running job occupies one thread of the default executor through asyncio.to_thread, and so does each claim request.
+        max_workers = self.max_concurrent_tasks * max(CLAIM_OVERSUBSCRIPTION, 1) + EXTRA_EXECUTOR_WORKERS
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="benchmark-job")
+        asyncio.get_running_loop().set_default_executor(executor)
+        self.install_signal_handlers()
         self.init_job_client()
 
         while not self.stop_event.is_set():
-            if self.running_tasks < self.max_concurrent_tasks:
+            if not self.semaphore.locked():
                 logger.info("Fetch benchmark jobs...")
+                metrics.POLLS.inc(component="runner")
                 self.auth_job_client()
                 response = self.job_client.get("/benchmarks/queue/list_benchmark_jobs")
                 data = response.json()
                 jobs = [BenchmarkJob.model_validate(x) for x in data]
                 if len(jobs) == 0:
                     logger.info(f"There are no benchmark jobs. Wait for '{self.interval}s' the next poll..")
-                for job in jobs:
-                    benchmark_id = job.benchmark.metadata.id
-                    body = BenchmarkJobTake(runner_id=self.runner_id)
-                    response = self.job_client.put(f"/benchmarks/{benchmark_id}/take_benchmark_job", body=body.model_dump_json())
-                    data = response.json()
-                    if data["success"] == True:
-                        job.benchmark.spec.runner_id = self.runner_id  # TODO: fix to get the latest job from server
-                        logger.info(f"Benchmark job '{benchmark_id}' is successfully taken. Start benchmark...")
-                        self.running_tasks += 1
-                        asyncio.create_task(self.run_benchmark(job.benchmark, job.agent_manifest))
-                        break
-                    else:
-                        logger.info(f"Benchmark job '{benchmark_id}' is already assigned.")
+                free = 1 if self.single_run else self.max_concurrent_tasks - self.running_tasks
+                for job in await self.claim_jobs(jobs, free):
+                    job.benchmark.spec.runner_id = self.runner_id  # TODO: fix to get the latest job from server
+                    logger.info(f"Benchmark job '{job.benchmark.metadata.id}' is successfully taken. Start benchmark...")
+                    await self.semaphore.acquire()
+                    self.task_started()
+                    metrics.JOBS_TAKEN.inc(component="runner")
+                    task = asyncio.create_task(self.run_benchmark_with_slot(job.benchmark, job.agent_manifest))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+                metrics.QUEUED_TASKS.set(len([x for x in jobs if is_job_claimable(x.benchmark.spec)]), component="runner")
                 if self.single_run and self.running_tasks < 1:
                     logger.info("Task completed. Exiting due to run-once mode.")
                     await self.stop()
             else:
                 logger.info("The number of current task is over max concurrent jobs. Wait for the runner to be available.")
-            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+        if self.shutting_down:
+            await self.drain()
+
+    def install_signal_handlers(self):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.request_shutdown)
+        except (NotImplementedError, RuntimeError, ValueError) as e:
+            # Signal handlers can only be installed from the main thread on Unix.
+            logger.debug(f"SIGTERM handler is not installed: {e}")
+
+    def request_shutdown(self):
+        logger.info("Received SIGTERM. Stop taking benchmark jobs and drain the running ones...")
+        self.shutting_down = True
+        self.stop_event.set()
+        for benchmark_runner in self.jobs.values():
+            benchmark_runner.drain()
+
+    async def drain(self):
+        tasks = set(self.tasks)
+        if tasks:
+            grace_period = self.app_config.shutdown_grace_period
+            logger.info(f"Wait up to {grace_period}s for {len(tasks)} running benchmark jobs to finish their current scenarios...")
+            _, pending = await asyncio.wait(tasks, timeout=grace_period)
+            if pending:
+                logger.warning(f"Abort {len(pending)} benchmark jobs still running after the grace period.")
+                for benchmark_runner in self.jobs.values():
+                    benchmark_runner.abort()
+                await asyncio.wait(pending, timeout=self.app_config.shutdown_abort_timeout)
+        # Jobs that did not even finish their cleanup are handed back to the Bench Server as they are.
+        for benchmark_id in [x for x in self.jobs if x not in self.lost_leases]:
+            await asyncio.to_thread(self.release_benchmark_job, benchmark_id)
+        logger.info("Benchmark runner is drained.")
+
+    async def claim_jobs(self, jobs: List[BenchmarkJob], free: int) -> List[BenchmarkJob]:
+        # Claim in parallel and keep the first `free` successes; jobs won beyond that are released right away.
+        candidates = [x for x in jobs if is_job_claimable(x.benchmark.spec)][: free * max(CLAIM_OVERSUBSCRIPTION, 1)]
+
+        async def claim(job: BenchmarkJob) -> Tuple[BenchmarkJob, bool]:
+            return job, await asyncio.to_thread(self.take_benchmark_job, job.benchmark.metadata.id)
+
+        claimed: List[BenchmarkJob] = []
+        extras: List[BenchmarkJob] = []
+        for future in asyncio.as_completed([claim(x) for x in candidates]):
+            job, success = await future
+            if not success:
+                logger.info(f"Benchmark job '{job.benchmark.metadata.id}' is already assigned.")
+            elif len(claimed) < free:
+                claimed.append(job)
+            else:
+                extras.append(job)
+        if extras:
+            await asyncio.gather(*[asyncio.to_thread(self.release_benchmark_job, x.benchmark.metadata.id) for x in extras])
+        return claimed
+
+    def take_benchmark_job(self, benchmark_id: str) -> bool:
+        body = BenchmarkJobTake(runner_id=self.runner_id)
+        try:
+            response = self.job_client.put(f"/benchmarks/{benchmark_id}/take_benchmark_job", body=body.model_dump_json())
+            return response.json()["success"] == True
+        except Exception as e:
+            logger.error(f"Failed to take job of benchmark id '{benchmark_id}': {e}")
+            return False
+
+    def release_benchmark_job(self, benchmark_id: str) -> bool:
+        try:
+            response = self.job_client.put(f"/benchmarks/{benchmark_id}/release_benchmark_job")
+            success = response.json()["success"] == True
+            if success:
+                logger.info(f"Benchmark job '{benchmark_id}' is released.")
+            else:
+                logger.error(f"Failed to release job of benchmark id '{benchmark_id}': {response.text}")
+            return success
+        except Exception as e:
+            logger.error(f"Failed to release job of benchmark id '{benchmark_id}': {e}")
+            return False
+
+    def renew_job_lease(self, benchmark_id: str) -> Optional[bool]:
+        # Returns None if the Bench Server does not support heartbeats. A 404 only concerns this job, e.g. a deleted benchmark.
+        body = BenchmarkJobHeartbeat(runner_id=self.runner_id, lease_seconds=self.app_config.job_lease_seconds)
+        response = self.job_client.put(f"/benchmarks/{benchmark_id}/heartbeat", body=body.model_dump_json())
+        if response.status_code in [405, 501]:
+            return None
+        if response.status_code == 404:
+            logger.error(f"Benchmark job '{benchmark_id}' is not found on the Bench Server: {response.text}")
+            return False
+        response.raise_for_status()
+        return BenchmarkJobLease.model_validate(response.json()).success
+
+    async def heartbeat(self, benchmark_id: str):
+        interval = max(self.app_config.job_lease_seconds / HEARTBEATS_PER_LEASE, 1)
+        while self.heartbeat_supported:
+            try:
+                success = await asyncio.to_thread(self.renew_job_lease, benchmark_id)
+                if success is None:
+                    logger.warning("The Bench Server does not support job heartbeats. Job leases are not renewed.")
+                    self.heartbeat_supported = False
+                    return
+                if not success:
+                    logger.error(f"The lease of benchmark job '{benchmark_id}' was lost. Abort the job since another runner may take it.")
+                    self.lost_leases.add(benchmark_id)
+                    if benchmark_id in self.jobs:
+                        self.jobs[benchmark_id].abort()
+                    return
+            except Exception as e:
+                logger.warning(f"Failed to renew the lease of benchmark job '{benchmark_id}': {e}")
+            await asyncio.sleep(interval)
+
+    async def run_benchmark_with_slot(self, benchmark: Benchmark, agent_manifest: AgentManifest):
+        heartbeat = asyncio.create_task(self.heartbeat(benchmark.metadata.id))
+        try:
+            await self.run_benchmark(benchmark, agent_manifest)
+        finally:
+            heartbeat.cancel()
+            self.task_finished()
+            self.semaphore.release()
 
     async def run_benchmark(self, benchmark: Benchmark, agent_manifest: AgentManifest):
         benchmark_id = benchmark.metadata.id
@@ -135,25 +313,44 @@ class BenchmarkRunner:
                 _bundles,
                 self.app_config.enable_soft_delete,
                 self.interval,
+                profile=self.profile == ProfileScope.Bundle,
+                results_store_dir=self.app_config.results_store_dir,
             )
 
-            _logger = setup_request_logger(benchmark_id)
-            logfilepath = get_specific_log_file_path(_logger, benchmark_id)
-            benchmark_runner = itbench_utilities.benchmark.Benchmark(_logger=_logger)
+            if benchmark_id in self.lost_leases:
+                logger.warning(f"The lease of benchmark '{benchmark_id}' was lost before it started. Leave the job to its new owner.")
+                return
 
             benchmark.status = create_status(phase=BenchmarkPhaseEnum.Running)
-            benchmark.spec.log_file_path = logfilepath
+            benchmark.spec.log_file_path = get_request_log_file_path(benchmark_id, self.app_config.log_dir).as_posix()
             client.put(f"{base_endpoint}/update_benchmark_job", benchmark.model_dump_json())
-            await asyncio.to_thread(benchmark_runner.run_benchmark, bench_run_config, client)
+
+            if self.worker_mode == WorkerMode.Process:
+                interrupted = await self.run_job_in_process(benchmark_id, bench_run_config, headers)
+            else:
+                interrupted = await self.run_job_in_thread(benchmark_id, bench_run_config, client)
+
+            if benchmark_id in self.lost_leases:
+                logger.warning(f"Benchmark '{benchmark_id}' stopped after its lease was lost. Leave the job to its new owner.")
+                return
+
+            if interrupted:
+                # Scenarios were skipped or aborted by shutdown: hand the job back so that another runner can run it again.
+                logger.info(f"Benchmark '{benchmark_id}' was interrupted by shutdown. Release the job.")
+                self.release_benchmark_job(benchmark_id)
+                benchmark.status = create_status(phase=BenchmarkPhaseEnum.Queued, message="Interrupted by runner shutdown.")
+                client.put(f"{base_endpoint}/update_benchmark_job", benchmark.model_dump_json())
+                return
 
             benchmark.status = self.create_finished_status()
             client.put(f"{base_endpoint}/update_benchmark_job", benchmark.model_dump_json())
             logger.info("Benchmarking is finished")
-            self.running_tasks -= 1
         except Exception as e:
             message = f"Error while running benchmark '{benchmark.metadata.id}': {e}"
             logger.error(message)
-            self.running_tasks -= 1
+            if benchmark_id in self.lost_leases:
+                return
+            metrics.JOBS_FAILED.inc(component="runner")
             benchmark.status = create_status(phase=BenchmarkPhaseEnum.Error, message=message)
             try:
                 response = self.job_client.put(f"/benchmarks/{benchmark_id}/release_benchmark_job")
@@ -167,6 +364,56 @@ class BenchmarkRunner:
                 client.put(f"{base_endpoint}/update_benchmark_job", benchmark.model_dump_json())
             except Exception as e:
                 logger.error(f"Failed to update status of benchmark id '{benchmark.metadata.id}': {e}")
+        finally:
+            self.jobs.pop(benchmark_id, None)
+            self.lost_leases.discard(benchmark_id)
+
+    async def run_job_in_thread(self, benchmark_id: str, bench_run_config: BenchRunConfig, client: RestClient) -> bool:
+        with open_benchmark_job(benchmark_id, self.app_config) as benchmark_runner:
+            self.jobs[benchmark_id] = benchmark_runner
+            if benchmark_id in self.lost_leases:
+                benchmark_runner.abort()
+            elif self.shutting_down:
+                benchmark_runner.drain()
+
+            def run_job():
+                with profiling.maybe_profile(self.profile == ProfileScope.Job, Path(bench_run_config.output_dir), "benchmark_job"):
+                    benchmark_runner.run_benchmark(bench_run_config, client)
+
+            await asyncio.to_thread(run_job)
+            return benchmark_runner.interrupted
+
+    async def run_job_in_process(self, benchmark_id: str, bench_run_config: BenchRunConfig, headers: Dict[str, str]) -> bool:
+        # The job gets its own interpreter, logger and observer; the runner only relays drain/abort and enforces the limits.
+        job = WorkerJob(
+            benchmark_id=benchmark_id,
+            bench_run_config=bench_run_config,
+            app_config=self.app_config,
+            host=self.host,
+            port=self.port,
+            headers=headers,
+            ssl=self.ssl,
+            ssl_verify=self.ssl_verify,
+            profile=self.profile == ProfileScope.Job,
+            log_level=logging.getLogger("itbench_utilities").getEffectiveLevel(),
+            heartbeat_interval=max(self.app_config.job_lease_seconds / HEARTBEATS_PER_LEASE, 1),
+        )
+        worker = WorkerProcess(
+            job,
+            start_method=self.app_config.worker_start_method,
+            memory_limit=self.app_config.worker_memory_limit,
+            time_limit=self.app_config.worker_time_limit,
+            heartbeat_timeout=self.app_config.job_lease_seconds,
+            abort_timeout=self.app_config.shutdown_abort_timeout,
+        )
+        self.jobs[benchmark_id] = worker
+        worker.start()
+        if benchmark_id in self.lost_leases:
+            worker.abort()
+        elif self.shutting_down:
+            worker.drain()
+        await worker.wait()
+        return worker.interrupted
 
     async def stop(self):
         logger.info(f"Stopping benchmark runner...")
@@ -179,5 +426,15 @@ def run(args):
     with Path(config_path).open("r") as f:
         data = yaml.safe_load(f)
         app_config = AppConfig.model_validate(data)
-    runner = BenchmarkRunner(app_config, args.runner_id, args.service_type, args.token, single_run=args.single_run)
+    runner = BenchmarkRunner(
+        app_config,
+        args.runner_id,
+        args.service_type,
+        args.token,
+        single_run=args.single_run,
+        metrics_port=args.metrics_port,
+        profile=ProfileScope(args.profile) if args.profile else None,
+        max_concurrent_tasks=args.max_concurrent_tasks,
+        worker_mode=WorkerMode(args.worker_mode) if args.worker_mode else None,
+    )
     asyncio.run(runner.run())
@@ -13,8 +13,13 @@
 # limitations under the License.
 
 import logging
-from typing import List, Optional
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Optional
 
+from itbench_utilities.app.config import AppConfig
 from itbench_utilities.app.models.agent import Agent as AgentInApp
 from itbench_utilities.app.models.benchmark import Benchmark
 from itbench_utilities.app.models.bundle import Bundle as BundleInApp
@@ -25,6 +30,9 @@ from itbench_utilities.models.bundle import Bundle
 
 logger = logging.getLogger(__name__)
 
+_listeners: Dict[str, QueueListener] = {}
+_listeners_lock = threading.Lock()
+
 
 def build_benchmark_run_config(
     benchmark: Benchmark,
@@ -32,6 +40,8 @@ def build_benchmark_run_config(
     bundles: List[BundleInApp],
     enable_safe_delete: Optional[bool] = False,
     interval: Optional[int] = None,
+    profile: Optional[bool] = False,
+    results_store_dir: Optional[str] = None,
 ) -> BenchRunConfig:
     benchmark_id = benchmark.metadata.id
     agent_infos = [AgentInfo(id=x.metadata.id, name=x.spec.name, directory=x.spec.path if x.spec.path else "", mode=x.spec.mode) for x in agents]
@@ -54,7 +64,9 @@ def build_benchmark_run_config(
         for x in bundles
     ]
 
-    bench_config = BenchConfig(title=benchmark.spec.name, is_test=False, soft_delete=enable_safe_delete)
+    bench_config = BenchConfig(
+        title=benchmark.spec.name, is_test=False, soft_delete=enable_safe_delete, profile=profile, results_store_dir=results_store_dir
+    )
     bench_run_config = BenchRunConfig(
         benchmark_id=benchmark_id,
         push_model=True,
@@ -67,27 +79,70 @@ def build_benchmark_run_config(
     return bench_run_config
 
 
-def setup_request_logger(benchmark_id: str, debug=False) -> logging.Logger:
+def get_request_log_file_path(benchmark_id: str, log_dir: Optional[str] = None) -> Path:
+    log_dir_path = Path(log_dir) if log_dir else Path.cwd()
+    return log_dir_path.absolute() / f"log_{benchmark_id}.log"
+
+
+def setup_request_logger(
+    benchmark_id: str,
+    debug=False,
+    log_dir: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    backup_count: Optional[int] = None,
+) -> logging.Logger:
+    # Records are handed to a queue on the caller's thread and written to disk by a listener thread,
+    # so verbose agent output never blocks on file I/O.
+    close_request_logger(benchmark_id)
     logger = logging.getLogger(benchmark_id)
     log_format = logging.Formatter("[%(asctime)s %(levelname)s] %(message)s")
-    log_file_name = f"log_{benchmark_id}.log"
+    log_file_path = get_request_log_file_path(benchmark_id, log_dir)
+    log_file_path.parent.mkdir(parents=True, exist_ok=True)
 
     if logger.hasHandlers():
         logger.handlers.clear()
 
-    file_handler = logging.FileHandler(log_file_name)
+    # The limits are configured in AppConfig only; its defaults apply when the caller has no configuration.
+    if max_bytes is None:
+        max_bytes = AppConfig.model_fields["log_max_bytes"].default
+    if backup_count is None:
+        backup_count = AppConfig.model_fields["log_backup_count"].default
+    file_handler = RotatingFileHandler(log_file_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
     if debug:
         file_handler.setLevel(logging.DEBUG)
     else:
         file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(log_format)
-    logger.addHandler(file_handler)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    with _listeners_lock:
+        _listeners[benchmark_id] = listener
+    logger.addHandler(QueueHandler(log_queue))
 
     return logger
 
 
+def close_request_logger(benchmark_id: str):
+    with _listeners_lock:
+        listener = _listeners.pop(benchmark_id, None)
+    if listener is None:
+        return
+    # stop() drains the queue before returning, so no record is lost.
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    logger = logging.getLogger(benchmark_id)
+    for handler in [x for x in logger.handlers if isinstance(x, QueueHandler)]:
+        logger.removeHandler(handler)
+
+
 def get_specific_log_file_path(logger_instance, benchmark_id):
-    for handler in logger_instance.handlers:
+    with _listeners_lock:
+        listener = _listeners.get(benchmark_id)
+    handlers = list(listener.handlers) if listener else []
+    for handler in handlers + logger_instance.handlers:
         if isinstance(handler, logging.FileHandler) and benchmark_id in handler.baseFilename:
             return handler.baseFilename
     return None
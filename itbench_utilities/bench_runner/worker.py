@@ -0,0 +1,297 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+import itbench_utilities.benchmark
+from itbench_utilities.app.config import AppConfig
+from itbench_utilities.bench_runner.utils import close_request_logger, setup_request_logger
+from itbench_utilities.common import log, metrics, profiling
+from itbench_utilities.common.rest_client import RestClient
+from itbench_utilities.event_sink import JsonlEventSink
+from itbench_utilities.models.benchmark import BenchRunConfig
+from itbench_utilities.observer import (
+    DEFAULT_DISPATCH_MODE,
+    DEFAULT_FULL_POLICY,
+    DEFAULT_LOGGED_EVENTS,
+    Observer,
+    gen_json_logging_callback,
+)
+
+logger = logging.getLogger(__name__)
+
+# How often the runner checks the messages, memory and time of its worker processes.
+WORKER_POLL_INTERVAL = 0.5
+
+Message = Tuple[str, Any]
+
+
+class WorkerMode(str, Enum):
+    Thread = "thread"
+    Process = "process"
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerJob(BaseModel):
+    benchmark_id: str = Field(..., description="The identifier of the benchmark.")
+    bench_run_config: BenchRunConfig = Field(..., description="The configuration of the benchmark run.")
+    app_config: AppConfig = Field(..., description="The configuration of the runner.")
+    host: str = Field(..., description="The host of the Bench Server.")
+    port: int = Field(..., description="The port of the Bench Server.")
+    headers: Dict[str, str] = Field({}, description="Headers of the requests to the Bench Server.")
+    ssl: bool = Field(False, description="Whether the Bench Server is accessed over SSL.")
+    ssl_verify: bool = Field(False, description="Whether the certificate of the Bench Server is verified.")
+    profile: bool = Field(False, description="Whether the benchmark job is profiled.")
+    log_level: int = Field(logging.INFO, description="The log level of the worker process.")
+    heartbeat_interval: float = Field(10, description="Seconds between the heartbeats of the worker process.")
+
+
+@contextmanager
+def open_benchmark_job(benchmark_id: str, app_config: AppConfig) -> Iterator[itbench_utilities.benchmark.Benchmark]:
+    event_sink: Optional[JsonlEventSink] = None
+    observer: Optional[Observer] = None
+    try:
+        _logger = setup_request_logger(
+            benchmark_id,
+            log_dir=app_config.log_dir,
+            max_bytes=app_config.log_max_bytes,
+            backup_count=app_config.log_backup_count,
+        )
+        if app_config.event_log_dir:
+            event_sink = JsonlEventSink(
+                Path(app_config.event_log_dir),
+                benchmark_id,
+                max_bytes=app_config.event_log_max_bytes,
+                compress=app_config.event_log_compress,
+            )
+        # A dedicated observer per job keeps its events out of the logs of the other running jobs.
+        observer = Observer(mode=DEFAULT_DISPATCH_MODE, full_policy=DEFAULT_FULL_POLICY)
+        observer.register(gen_json_logging_callback(_logger), events=DEFAULT_LOGGED_EVENTS)
+        if event_sink:
+            observer.register(event_sink)
+        yield itbench_utilities.benchmark.Benchmark(observer=observer, _logger=_logger, detach_agents=True)
+    finally:
+        # Deliver queued events before their sink and the request logger are closed.
+        if observer:
+            observer.close()
+        if event_sink:
+            event_sink.close()
+        close_request_logger(benchmark_id)
+
+
+def run_worker(conn: Connection, job: WorkerJob):
+    # Entry point of a worker process. Messages to the runner are ("heartbeat", metrics), ("result", {...}) and ("error", message);
+    # messages from the runner are ("drain", None) and ("abort", None). Each heartbeat carries the change of the metrics since the
+    # previous one so that the runner exposes the metrics of its jobs.
+    log.init(job.log_level)
+    send_lock = threading.Lock()
+    finished = threading.Event()
+    # A forked worker starts with a copy of the runner's metrics; only the changes made by the job are forwarded.
+    last_snapshot = metrics.REGISTRY.snapshot()
+
+    def send(message: Message):
+        with send_lock:
+            conn.send(message)
+
+    def send_heartbeat():
+        nonlocal last_snapshot
+        with send_lock:
+            snapshot = metrics.REGISTRY.snapshot()
+            conn.send(("heartbeat", metrics.REGISTRY.diff(last_snapshot, snapshot)))
+            last_snapshot = snapshot
+
+    def send_heartbeats():
+        while not finished.wait(job.heartbeat_interval):
+            send_heartbeat()
+
+    try:
+        with open_benchmark_job(job.benchmark_id, job.app_config) as benchmark_runner:
+
+            def receive_commands():
+                while not finished.is_set():
+                    try:
+                        command, _ = conn.recv()
+                    except (EOFError, OSError):
+                        # The runner is gone: let the running scenarios finish their cleanup.
+                        benchmark_runner.abort()
+                        return
+                    if command == "drain":
+                        benchmark_runner.drain()
+                    elif command == "abort":
+                        benchmark_runner.abort()
+
+            threading.Thread(target=receive_commands, name="worker-commands", daemon=True).start()
+            threading.Thread(target=send_heartbeats, name="worker-heartbeats", daemon=True).start()
+            send_heartbeat()
+            client = RestClient(job.host, job.port, headers=dict(job.headers), ssl=job.ssl, verify=job.ssl_verify)
+            with profiling.maybe_profile(job.profile, Path(job.bench_run_config.output_dir), "benchmark_job"):
+                benchmark_runner.run_benchmark(job.bench_run_config, client)
+            send_heartbeat()
+            send(("result", {"interrupted": benchmark_runner.interrupted}))
+    except Exception as e:
+        logger.error(f"Error in worker process of benchmark '{job.benchmark_id}': {e}")
+        send_heartbeat()
+        send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        finished.set()
+        conn.close()
+
+
+def get_rss(pid: int) -> Optional[int]:
+    # Resident set size in bytes, or None where /proc is not available.
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class WorkerProcess:
+
+    def __init__(
+        self,
+        job: WorkerJob,
+        start_method: str = "spawn",
+        memory_limit: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        heartbeat_timeout: Optional[float] = None,
+        abort_timeout: float = 60,
+        target: Callable[[Connection, WorkerJob], None] = run_worker,
+    ) -> None:
+        self.job = job
+        self.memory_limit = memory_limit
+        self.time_limit = time_limit
+        self.heartbeat_timeout = heartbeat_timeout
+        self.abort_timeout = abort_timeout
+        context = multiprocessing.get_context(start_method)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=target, args=(child_conn, job), name=f"benchmark-worker-{job.benchmark_id}", daemon=True)
+        self.child_conn = child_conn
+        self.interrupted = False
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.stop_reason: Optional[str] = None
+        self.stop_deadline: Optional[float] = None
+        self.last_heartbeat = time.monotonic()
+        self.gauges: metrics.Snapshot = {}
+
+    def start(self):
+        self.process.start()
+        # The child holds its own copy of the connection.
+        self.child_conn.close()
+        logger.info(f"Started worker process {self.process.pid} for benchmark '{self.job.benchmark_id}'.")
+
+    def send(self, message: Message):
+        try:
+            self.conn.send(message)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Failed to send {message[0]} to worker process of benchmark '{self.job.benchmark_id}': {e}")
+
+    def drain(self):
+        self.send(("drain", None))
+
+    def abort(self):
+        self.send(("abort", None))
+
+    def stop(self, reason: str):
+        # Running scenarios are cleaned up first; the process is killed if that does not finish in time.
+        if self.stop_reason:
+            return
+        logger.error(f"Stop worker process of benchmark '{self.job.benchmark_id}': {reason}")
+        self.stop_reason = reason
+        self.stop_deadline = time.monotonic() + self.abort_timeout
+        self.abort()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+    def receive(self):
+        while self.conn.poll():
+            try:
+                kind, payload = self.conn.recv()
+            except (EOFError, OSError):
+                return
+            if kind == "result":
+                self.result = payload
+                self.interrupted = payload.get("interrupted", False)
+            elif kind == "error":
+                self.error = payload
+            elif kind == "heartbeat" and payload:
+                self.merge_metrics(payload)
+            self.last_heartbeat = time.monotonic()
+
+    def merge_metrics(self, delta: metrics.Snapshot):
+        metrics.REGISTRY.merge(delta)
+        # Gauges of the worker (e.g. running subprocesses) are withdrawn once it exits.
+        for name, values in delta.items():
+            if isinstance(metrics.REGISTRY.metrics.get(name), metrics.Gauge):
+                gauges = self.gauges.setdefault(name, {})
+                for key, value in values.items():
+                    gauges[key] = gauges.get(key, 0) + value
+
+    def withdraw_gauges(self):
+        metrics.REGISTRY.merge({name: {key: -value for key, value in values.items()} for name, values in self.gauges.items()})
+        self.gauges = {}
+
+    def check_limits(self, started_at: float):
+        now = time.monotonic()
+        if self.time_limit is not None and now - started_at > self.time_limit:
+            self.stop(f"exceeded the time limit of {self.time_limit}s")
+        rss = get_rss(self.process.pid) if self.memory_limit is not None else None
+        if rss is not None and rss > self.memory_limit:
+            self.stop(f"exceeded the memory limit of {self.memory_limit} bytes (rss: {rss} bytes)")
+        if self.heartbeat_timeout is not None and now - self.last_heartbeat > self.heartbeat_timeout:
+            self.stop(f"sent no heartbeat for {self.heartbeat_timeout}s")
+        if self.stop_deadline is not None and now > self.stop_deadline:
+            self.kill()
+
+    async def wait(self):
+        started_at = self.last_heartbeat = time.monotonic()
+        try:
+            with metrics.track_subprocess("benchmark_worker"):
+                while self.process.is_alive():
+                    self.receive()
+                    self.check_limits(started_at)
+                    await asyncio.sleep(WORKER_POLL_INTERVAL)
+                self.receive()
+                await asyncio.to_thread(self.process.join)
+        finally:
+            self.withdraw_gauges()
+        self.conn.close()
+        if self.stop_reason:
+            raise WorkerError(f"Worker process {self.stop_reason}.")
+        if self.error:
+            raise WorkerError(self.error)
+        if self.result is None:
+            raise WorkerError(f"Worker process exited with code {self.process.exitcode} without a result.")
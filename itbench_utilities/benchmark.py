@@ -12,26 +12,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextvars
 import json
 import logging
 import shutil
+import threading
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import DefaultDict, Dict, List, Optional
+from typing import TYPE_CHECKING, DefaultDict, Dict, List, Optional
 from uuid import uuid4
 
-import pandas as pd
 from pydantic import BaseModel
 
 import itbench_utilities.observer
 from itbench_utilities.agent_operator import AgentOperator
 from itbench_utilities.app.models.base import AgentPhaseEnum, BundlePhaseEnum
-from itbench_utilities.bechmark_analyzer import Analyzer
 from itbench_utilities.bench_client import BenchClient, BenchNotFoundException
 from itbench_utilities.bundle_operator import BundleError, BundleOperator
+from itbench_utilities.cassette import CASSETTE_FILE_NAME, Cassette
+from itbench_utilities.common import metrics, profiling, tracing
+from itbench_utilities.common.blob_store import BLOB_DIR_NAME, BlobStore
 from itbench_utilities.common.rest_client import RestClient
+from itbench_utilities.common.tracing import TRACE_FILE_NAME
 from itbench_utilities.models.agent import AgentInfo
 from itbench_utilities.models.benchmark import (
     BenchConfig,
@@ -45,16 +50,53 @@ from itbench_utilities.models.bundle import (
     BundleResult,
 )
 from itbench_utilities.observer import Observer
+from itbench_utilities.progress import (
+    PROGRESS_EVENTS,
+    PROGRESS_HISTORY_FILE_NAME,
+    PROGRESS_HTML_FILE_NAME,
+    ProgressReporter,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 log_format = "[%(asctime)s %(levelname)s %(name)s] %(message)s"
 
+PHASES_FILE_NAME = "bundle-phases.json"
+
+
+class BenchmarkAborted(Exception):
+    pass
+
 
 class Benchmark:
 
-    def __init__(self, observer: Optional[Observer] = None, _logger: Optional[logging.Logger] = None) -> None:
+    def __init__(self, observer: Optional[Observer] = None, _logger: Optional[logging.Logger] = None, detach_agents: bool = False) -> None:
         self.logger = _logger if _logger else None
         self.observer = observer if observer else itbench_utilities.observer.DEFAULT_OBSERVER
+        self.draining = threading.Event()
+        self.aborting = threading.Event()
+        self.interrupted = False
+        self.agent_operators: List[AgentOperator] = []
+        # Agents are only detached from the terminal where shutdown terminates them (runner and harness), so Ctrl-C still reaches them otherwise.
+        self.detach_agents = detach_agents
+
+    def drain(self):
+        # No new scenarios or trials are started; running ones finish normally.
+        self.draining.set()
+
+    def abort(self):
+        # Running scenarios stop at the next phase boundary and are cleaned up through error_action.
+        self.draining.set()
+        self.aborting.set()
+        for ao in self.agent_operators:
+            ao.terminate()
+
+    def check_aborted(self):
+        if self.aborting.is_set():
+            self.interrupted = True
+            raise BenchmarkAborted("Benchmark was aborted by shutdown.")
 
     def get_logger(self) -> logging.Logger:
         return self.logger if self.logger else logger
@@ -86,6 +128,11 @@ class Benchmark:
 
         benchmark_results = self.benchmark(bench_run_config, rest_client, user_id=user_id)
         write_for_leaderboard(benchmark_results, output_dir)
+        results_store_dir = bench_run_config.config.results_store_dir
+        if results_store_dir:
+            from itbench_utilities.results_store import ResultsStore
+
+            ResultsStore(Path(results_store_dir)).append([x for br in benchmark_results for x in br.results])
 
     def benchmark(
         self, bench_run_config: BenchRunConfig, rest_client: Optional[RestClient] = None, user_id: Optional[str] = None
@@ -95,42 +142,141 @@ class Benchmark:
         bundles = bench_run_config.bundles
         output_dir = Path(bench_run_config.output_dir).absolute()
         bench_config = bench_run_config.config
-        grouped_bundles_by_agent = self.setup(agents, bundles, output_dir, bench_config)
-        benchmark_results: List[BenchmarkResult] = []
-
-        agent_names = ",".join([x.agent_info.name for x in grouped_bundles_by_agent.keys()])
-        logger.info(f"Start benchmarking '[{agent_names}]'")
-        for ao, bos in grouped_bundles_by_agent.items():
-            output_dir_per_agent = output_dir / ao.agent_info.name
-            output_dir_per_agent.mkdir(parents=True, exist_ok=True)
-            bundle_names = ",".join([x.bundle.name for x in bos])
-            logger.info(f"Benchmark '{ao.agent_info.name}' by scenarios '[{bundle_names}]'")
-            bundle_results: List[BundleResult] = []
+        trace_path = output_dir / TRACE_FILE_NAME if bench_config.trace else None
+        with tracing.start_trace(trace_path), tracing.span("benchmark", category="benchmark", benchmark_id=bench_run_config.benchmark_id):
+            grouped_bundles_by_agent = self.setup(agents, bundles, output_dir, bench_config)
+            all_bundle_results: List[BundleResult] = []
+            progress_reporter = self.start_progress(grouped_bundles_by_agent, output_dir, bench_config)
+            try:
+                agent_names = ",".join([x.agent_info.name for x in grouped_bundles_by_agent.keys()])
+                logger.info(f"Start benchmarking '[{agent_names}]'")
+                for ao, bos in grouped_bundles_by_agent.items():
+                    output_dir_per_agent = output_dir / ao.agent_info.name
+                    output_dir_per_agent.mkdir(parents=True, exist_ok=True)
+                    bundle_names = ",".join([x.bundle.name for x in bos])
+                    logger.info(f"Benchmark '{ao.agent_info.name}' by scenarios '[{bundle_names}]'")
+                    bundle_results = self.run_scenarios(ao, bos, bench_run_config, rest_client, user_id, output_dir_per_agent)
+
+                    logger.info(f"Finished benchmarking '{ao.agent_info.name}' by scenarios '{bundle_names}'")
+                    print(to_summary_table(bundle_results))
+                    all_bundle_results.extend(bundle_results)
+
+                from itbench_utilities.bechmark_analyzer import aggregate
+
+                benchmark_results = aggregate(
+                    all_bundle_results,
+                    bench_config.title,
+                    resamples=bench_config.bootstrap_resamples,
+                    seed=bench_config.bootstrap_seed,
+                    confidence=bench_config.confidence,
+                    k=bench_config.repeats if bench_config.repeats > 1 else None,
+                )
+                for benchmark_result in benchmark_results:
+                    benchmark_result.id = bench_run_config.benchmark_id
+                logger.info("Finished benchmarking for all agents.")
+            finally:
+                if progress_reporter:
+                    self.observer.unregister(progress_reporter)
+                    progress_reporter.close()
+
+        return benchmark_results
+
+    def run_scenarios(
+        self,
+        ao: AgentOperator,
+        bos: List[BundleOperator],
+        bench_run_config: BenchRunConfig,
+        rest_client: Optional[RestClient],
+        user_id: Optional[str],
+        output_dir_per_agent: Path,
+    ) -> List[BundleResult]:
+        logger = self.get_logger()
+        parallel_scenarios = bench_run_config.config.parallel_scenarios
+        if parallel_scenarios > 1 and ao.agent_info.mode == "remote":
+            # A remote agent reports one status per agent id, so concurrent scenarios would read each other's agent phase.
+            logger.warning(f"Agent '{ao.agent_info.name}' is remote: run its scenarios one at a time instead of {parallel_scenarios} in parallel.")
+            parallel_scenarios = 1
+        bundle_results: List[BundleResult] = []
+        if parallel_scenarios <= 1:
             for bo in bos:
                 try:
-                    logger.info(f" Run scenario '{bo.bundle.name}'", extra={"agent": ao.agent_info.name})
-                    bench_client = BenchClient(bench_run_config=bench_run_config, rest_client=rest_client, user_id=user_id)
-                    bench_client.validate_benchmark()
-                    brs = self.benchmark_per_bundle(ao, bo, bench_client, output_dir_per_agent, bench_run_config)
-                    bench_client.upload_bundle_results(bo.bundle, brs)
-
-                    bundle_results = bundle_results + brs
+                    bundle_results = bundle_results + self.run_scenario(ao, bo, bench_run_config, rest_client, user_id, output_dir_per_agent)
                 except BenchNotFoundException as e:
                     logger.error("Benchmark not found. This might happen if someone deleted the benchmark. " "Exception details: %s", str(e))
                     break
                 except Exception as e:
                     logger.error(f"Unhandle exception happens, ignore it, and go next: {e}")
+            return bundle_results
 
-            logger.info(f"Finished benchmarking '{ao.agent_info.name}' by scenarios '{bundle_names}'")
-            print(to_summary_table(bundle_results))
-
-            analyzer = Analyzer(bundle_results)
-            benchmark_result = analyzer.to_benchmark_result(bench_config.title, ao.agent_info.name)
-            benchmark_results.append(benchmark_result)
-
-        logger.info("Finished benchmarking for all agents.")
+        with ThreadPoolExecutor(max_workers=parallel_scenarios, thread_name_prefix=f"scenario-{ao.agent_info.name}") as executor:
+            # Each scenario runs in a copy of the current context so that its spans nest under the current one.
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, self.run_scenario, ao, bo, bench_run_config, rest_client, user_id, output_dir_per_agent
+                )
+                for bo in bos
+            ]
+            for future in futures:
+                try:
+                    bundle_results = bundle_results + future.result()
+                except BenchNotFoundException as e:
+                    logger.error("Benchmark not found. This might happen if someone deleted the benchmark. " "Exception details: %s", str(e))
+                    for x in futures:
+                        x.cancel()
+                    break
+                except Exception as e:
+                    logger.error(f"Unhandle exception happens, ignore it, and go next: {e}")
+        return bundle_results
 
-        return benchmark_results
+    def run_scenario(
+        self,
+        ao: AgentOperator,
+        bo: BundleOperator,
+        bench_run_config: BenchRunConfig,
+        rest_client: Optional[RestClient],
+        user_id: Optional[str],
+        output_dir_per_agent: Path,
+    ) -> List[BundleResult]:
+        logger = self.get_logger()
+        bench_config = bench_run_config.config
+        repeats = max(bench_config.repeats, 1)
+        with tracing.span(bo.bundle.name, category="bundle", agent=ao.agent_info.name, bundle=bo.bundle.name):
+            if self.draining.is_set():
+                logger.info(f" Skip scenario '{bo.bundle.name}' due to shutdown", extra={"agent": ao.agent_info.name})
+                self.interrupted = True
+                return []
+            logger.info(f" Run scenario '{bo.bundle.name}'", extra={"agent": ao.agent_info.name})
+            bench_client = BenchClient(bench_run_config=bench_run_config, rest_client=rest_client, user_id=user_id)
+            bench_client.validate_benchmark()
+            brs: List[BundleResult] = []
+            deploy = True
+            for trial in range(repeats):
+                if trial > 0 and self.draining.is_set():
+                    self.interrupted = True
+                    break
+                last = trial == repeats - 1
+                # With reuse_deployment, intermediate trials only revert the fault and the next trial injects it again.
+                soft_delete = None if last or not bench_config.reuse_deployment else True
+                profile_name = "benchmark_per_bundle" if repeats == 1 else f"benchmark_per_bundle-trial-{trial}"
+                with profiling.maybe_profile(bench_config.profile, output_dir_per_agent / bo.bundle.name, profile_name):
+                    results = self.benchmark_per_bundle(
+                        ao, bo, bench_client, output_dir_per_agent, bench_run_config, trial=trial, deploy=deploy, soft_delete=soft_delete
+                    )
+                brs = brs + results
+                deploy = not bench_config.reuse_deployment or any(x.errored for x in results)
+            bench_client.upload_bundle_results(bo.bundle, brs, blob_store=get_blob_store(bench_run_config))
+        return brs
+
+    def start_progress(
+        self, grouped_bundles_by_agent: Dict[AgentOperator, List[BundleOperator]], output_dir: Path, bench_config: BenchConfig
+    ) -> Optional[ProgressReporter]:
+        if not bench_config.progress:
+            return None
+        scenarios = [(ao.agent_info.name, bo.bundle.name) for ao, bos in grouped_bundles_by_agent.items() for bo in bos]
+        history_path = Path(bench_config.progress_history) if bench_config.progress_history else output_dir / PROGRESS_HISTORY_FILE_NAME
+        progress_reporter = ProgressReporter(scenarios, html_path=output_dir / PROGRESS_HTML_FILE_NAME, history_path=history_path)
+        self.observer.register(progress_reporter, events=PROGRESS_EVENTS)
+        return progress_reporter
 
     def setup(
         self, agents: List[AgentInfo], bundles: List[Bundle], output_dir: Path, bench_config: BenchConfig
@@ -138,9 +284,10 @@ class Benchmark:
         agent_bundle_pairs = []
         for agent in agents:
             if self.get_logger():
-                ao = AgentOperator(agent, _logger=self.get_logger())
+                ao = AgentOperator(agent, _logger=self.get_logger(), detach=self.detach_agents)
             else:
-                ao = AgentOperator(agent)
+                ao = AgentOperator(agent, detach=self.detach_agents)
+            self.agent_operators.append(ao)
             for bundle in bundles:
                 info_path = bundle.get_path() / "info.json"
                 if info_path.exists():
@@ -149,7 +296,8 @@ class Benchmark:
                         bundle.description = bundle.description if bundle.description else info.description
                         bundle.incident_type = bundle.incident_type if bundle.incident_type else info.incident_type
                 timestamp = get_timestamp()
-                shared_workspace = Path("/tmp") / agent.name / f"{bundle.name}_{timestamp}"
+                # The random suffix keeps workspaces apart when concurrent jobs run the same agent and bundle in the same second.
+                shared_workspace = Path("/tmp") / agent.name / f"{bundle.name}_{timestamp}_{uuid4().hex[:8]}"
                 shared_workspace.mkdir(parents=True, exist_ok=True)
                 br = BundleRequest(shared_workspace=shared_workspace.as_posix())
 
@@ -175,10 +323,17 @@ class Benchmark:
                         dump.parent.mkdir(parents=True, exist_ok=True)
                         shutil.copy(updated_input_file, dump)
 
+                cassette = None
+                if bench_config.cassette_mode:
+                    cassette_dir = Path(bench_config.cassette_dir) if bench_config.cassette_dir else output_dir
+                    cassette = Cassette(cassette_dir / agent.name / bundle.name / CASSETTE_FILE_NAME, bench_config.cassette_mode)
+
                 if self.get_logger():
-                    bo = BundleOperator(bundle, br, observer=self.observer, is_test=bench_config.is_test, _logger=self.get_logger())
+                    bo = BundleOperator(
+                        bundle, br, observer=self.observer, is_test=bench_config.is_test, _logger=self.get_logger(), cassette=cassette
+                    )
                 else:
-                    bo = BundleOperator(bundle, br, observer=self.observer, is_test=bench_config.is_test)
+                    bo = BundleOperator(bundle, br, observer=self.observer, is_test=bench_config.is_test, cassette=cassette)
 
                 agent_bundle_pairs.append((ao, bo))
 
@@ -196,24 +351,34 @@ class Benchmark:
         bench_client: BenchClient,
         output_dir: Path,
         bench_run_config: BenchRunConfig,
+        trial: int = 0,
+        deploy: bool = True,
+        soft_delete: Optional[bool] = None,
     ):
         logger = self.get_logger()
 
         self.observer.notify(
             "benchmark_per_bundle:start",
-            {
+            lambda: {
                 "agent_info": agent_operator.agent_info,
                 "bundle": bundle_operator.bundle,
                 "bundle_request": bundle_operator.bundle_request,
                 "output_dir": output_dir,
                 "bench_run_config": bench_run_config,
+                "trial": trial,
             },
         )
         bench_config = bench_run_config.config
+        soft_delete = bench_config.soft_delete if soft_delete is None else soft_delete
         output_dir_per_bundle = output_dir / bundle_operator.bundle.name
+        if bench_config.repeats > 1:
+            output_dir_per_bundle = output_dir_per_bundle / f"trial-{trial}"
         output_dir_per_bundle.mkdir(parents=True, exist_ok=True)
+        blob_store = get_blob_store(bench_run_config)
 
         bundle_results: List[BundleResult] = []
+        report: Optional[str] = None
+        phase_durations: Dict[str, float] = {}
         ao = agent_operator
         agent = ao.agent_info
         bo = bundle_operator
@@ -227,70 +392,82 @@ class Benchmark:
 
         try:
 
-            bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Provisioning)
-            bo.deploy_bundle()
-            bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Provisioned)
+            self.check_aborted()
+            if deploy:
+                with metrics.time_phase("deploy", phase_durations), tracing.span("deploy", category="phase"):
+                    self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Provisioning)
+                    bo.deploy_bundle()
+                    self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Provisioned)
 
-            bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.FaultInjecting)
-            bo.inject_fault()
-            bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.FaultInjected)
+            self.check_aborted()
+            with metrics.time_phase("inject_fault", phase_durations), tracing.span("inject_fault", category="phase"):
+                self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.FaultInjecting)
+                bo.inject_fault()
+                self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.FaultInjected)
 
+            self.check_aborted()
             timestamp_before = datetime.now(timezone.utc)
 
-            # TODO: Need generalization to support other bundles, agents
-            bundle_entity = bo.get_bundle()
-            bundle_entity["shared_workspace"] = bo.bundle_request.shared_workspace
-            bench_client.push_bundle_data(bundle_id, bundle_entity)
-            bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Ready)
-
-            agent_result: WaitAgentResult
-            agent_remote_mode = ao.agent_info.mode and ao.agent_info.mode == "remote"
-            if agent_remote_mode:
-                agent_result = self.wait_for_agent_status(
-                    bench_client, ao.agent_info.id, timeout=bundle.bundle_ready_timeout, timeout_of_execution=bundle.agent_operation_timeout
-                )
-            else:
-                bench_client.push_agent_status(ao.agent_info.id, AgentPhaseEnum.Executing)
-
-                try:
-                    stdout = ao.invoke_agent(bo.bundle.name, bo.bundle_request.shared_workspace, bundle_entity, output_dir_per_bundle)
-                    bench_client.push_agent_status(ao.agent_info.id, AgentPhaseEnum.Finished, message=stdout)
-                    agent_result = WaitAgentResult(success=True)
-                except Exception as e:
-                    logger.error(e)
-                    bench_client.push_agent_status(ao.agent_info.id, AgentPhaseEnum.Error, message=f"{e}")
-                    agent_result = WaitAgentResult(success=False, message=f"{e}")
+            with metrics.time_phase("agent", phase_durations), tracing.span("agent", category="phase", agent=agent.name):
+                # TODO: Need generalization to support other bundles, agents
+                bundle_entity = bo.get_bundle()
+                bundle_entity["shared_workspace"] = bo.bundle_request.shared_workspace
+                bench_client.push_bundle_data(bundle_id, bundle_entity)
+                self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Ready)
+
+                agent_result: WaitAgentResult
+                agent_remote_mode = ao.agent_info.mode and ao.agent_info.mode == "remote"
+                if agent_remote_mode:
+                    agent_result = self.wait_for_agent_status(
+                        bench_client, ao.agent_info.id, timeout=bundle.bundle_ready_timeout, timeout_of_execution=bundle.agent_operation_timeout
+                    )
+                else:
+                    bench_client.push_agent_status(ao.agent_info.id, AgentPhaseEnum.Executing)
+
+                    try:
+                        stdout = ao.invoke_agent(bo.bundle.name, bo.bundle_request.shared_workspace, bundle_entity, output_dir_per_bundle)
+                        # The Bench Server cannot resolve local blobs, so it always gets the full output.
+                        bench_client.push_agent_status(ao.agent_info.id, AgentPhaseEnum.Finished, message=stdout)
+                        agent_result = WaitAgentResult(success=True)
+                    except Exception as e:
+                        logger.error(e)
+                        bench_client.push_agent_status(ao.agent_info.id, AgentPhaseEnum.Error, message=f"{e}")
+                        agent_result = WaitAgentResult(success=False, message=f"{e}")
 
             timestamp_after = datetime.now(timezone.utc)
             ttr = timestamp_after - timestamp_before
 
             resolved = False
+            self.check_aborted()
 
             if agent_result.success:
-                try:
-                    bench_client.download_agent_pushed_file(bundle, f"{bo.bundle_request.shared_workspace}/agent_output.data")
-                except Exception as e:
-                    logger.error(e)
-                bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Evaluating)
-                # TODO: Address time lag on the incident report to be up to date
-                if bo.bundle.enable_evaluation_wait:
-                    bo.wait_for_violation_resolved(timeout=bench_config.resolution_wait, interval=bo.bundle.polling_interval)
-                evaluation = bo.evaluate()
-                resolved = evaluation.pass_
-                bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Evaluated)
-                bundle_result = self.build_result(agent, bundle, resolved, ttr, message=evaluation.details)
+                with metrics.time_phase("evaluate", phase_durations), tracing.span("evaluate", category="phase"):
+                    try:
+                        bench_client.download_agent_pushed_file(bundle, f"{bo.bundle_request.shared_workspace}/agent_output.data")
+                    except Exception as e:
+                        logger.error(e)
+                    self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Evaluating)
+                    # TODO: Address time lag on the incident report to be up to date
+                    if bo.bundle.enable_evaluation_wait:
+                        bo.wait_for_violation_resolved(timeout=bench_config.resolution_wait, interval=bo.bundle.polling_interval)
+                    evaluation = bo.evaluate()
+                    resolved = evaluation.pass_
+                    report = evaluation.report
+                    self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Evaluated)
+                    bundle_result = self.build_result(agent, bundle, resolved, ttr, message=evaluation.details)
             else:
-                bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Error, message=agent_result.message)
+                self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Error, message=agent_result.message)
                 bundle_result = self.build_error_result(agent, bundle, f"Agent failed: {agent_result.message}", ttr=ttr)
 
-            if bench_config.soft_delete:
-                bo.delete_bundle(soft_delete=True)
-                bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Terminating)
-            else:
-                bo.delete_bundle()
-                bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Terminating)
+            with metrics.time_phase("delete", phase_durations), tracing.span("delete", category="phase", soft_delete=soft_delete):
+                if soft_delete:
+                    bo.delete_bundle(soft_delete=True)
+                    self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Terminating)
+                else:
+                    bo.delete_bundle()
+                    self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Terminating)
 
-            bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Terminated)
+                self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Terminated)
 
             if agent_remote_mode:
                 agent_result = self.wait_for_agent_to_move_next(bench_client, ao.agent_info.id, timeout=bundle.bundle_ready_timeout)
@@ -303,21 +480,37 @@ class Benchmark:
                 message = e.message
             else:
                 message = str(e)
-            error_action_message = bo.error_action()
+            with metrics.time_phase("error_action", phase_durations), tracing.span("error_action", category="phase"):
+                error_action_message = bo.error_action()
             if error_action_message:
                 message = message + "\n" + str(error_action_message)
             bundle_result = self.build_error_result(agent, bundle, message)
             bundle_results.append(bundle_result)
-            bench_client.push_bundle_status(bundle_id, BundlePhaseEnum.Error, message)
+            self.push_bundle_status(bench_client, ao, bo, BundlePhaseEnum.Error, message)
 
+        bundle_result.benchmark_id = bench_run_config.benchmark_id
+        bundle_result.offload(blob_store, report=report, threshold=bench_config.blob_threshold)
+        bundle_result.trial = trial if bench_config.repeats > 1 else None
         o = output_dir_per_bundle / "bundle-result.json"
         logger.info(f"Write to {o.as_posix()}")
         with o.open("w") as f:
             f.write(bundle_result.model_dump_json(indent=2))
+        with (output_dir_per_bundle / PHASES_FILE_NAME).open("w") as f:
+            json.dump(phase_durations, f, indent=2)
         logger.info(f"{BundleResult.to_dataframe(bundle_results).to_markdown(index=False)}")
+        self.observer.notify(
+            "benchmark_per_bundle:end",
+            lambda: {"agent_info": agent_operator.agent_info, "bundle": bundle_operator.bundle, "bundle_result": bundle_result},
+        )
 
         return bundle_results
 
+    def push_bundle_status(
+        self, bench_client: BenchClient, ao: AgentOperator, bo: BundleOperator, phase: BundlePhaseEnum, message: Optional[str] = None
+    ):
+        self.observer.notify("bundle:phase", lambda: {"agent_info": ao.agent_info, "bundle": bo.bundle, "phase": phase, "message": message})
+        bench_client.push_bundle_status(bo.bundle.id, phase, message)
+
     def build_result(
         self, agent: AgentInfo, bundle: Bundle, _pass: bool, ttr: timedelta, message: Optional[str] = None, error: bool = False
     ) -> BundleResult:
@@ -376,7 +569,8 @@ class Benchmark:
             else:
                 logger.warning(f"Unexpected phase encountered: {phase}")
 
-            time.sleep(interval)
+            if self.aborting.wait(interval):
+                return WaitAgentResult(success=False, message="Benchmark was aborted by shutdown.")
             elapsed_time += interval
 
         message = "Timeout reached. The operation is still pending."
@@ -408,9 +602,22 @@ class WaitAgentResult(BaseModel):
     message: Optional[str] = None
 
 
+def get_blob_store(bench_run_config: BenchRunConfig) -> BlobStore:
+    bench_config = bench_run_config.config
+    return BlobStore(Path(bench_config.blob_dir) if bench_config.blob_dir else Path(bench_run_config.output_dir) / BLOB_DIR_NAME)
+
+
 def to_summary_table(bundle_results: List[BundleResult]) -> str:
     summary_df = BundleResult.to_dataframe(bundle_results)
-    summary_df = summary_df.drop(columns=[BundleResult.Column.description, BundleResult.Column.agent, BundleResult.Column.message])
+    summary_df = summary_df.drop(
+        columns=[
+            BundleResult.Column.description,
+            BundleResult.Column.agent,
+            BundleResult.Column.message,
+            BundleResult.Column.message_ref,
+            BundleResult.Column.report_ref,
+        ]
+    )
     summary_df[BundleResult.Column.ttr] = summary_df[BundleResult.Column.ttr].dt.total_seconds()
     summary_df = summary_df.rename(
         columns={
@@ -421,15 +628,19 @@ def to_summary_table(bundle_results: List[BundleResult]) -> str:
     return summary_df.to_markdown(index=False)
 
 
-def build_benchmark_df(benchmark_results: List[BenchmarkResult]) -> pd.DataFrame:
-    df = BenchmarkResult.to_dataframe(benchmark_results, exclude=[BenchmarkResult.Column.results])
+def build_benchmark_df(benchmark_results: List[BenchmarkResult]) -> "pd.DataFrame":
+    import pandas as pd
+
+    df = BenchmarkResult.to_dataframe(benchmark_results, exclude=[BenchmarkResult.Column.results, BenchmarkResult.Column.scenarios])
     if not df.empty:
-        df[BenchmarkResult.Column.mttr] = df[BenchmarkResult.Column.mttr].dt.total_seconds()
+        for column in BenchmarkResult.Column.timedeltas:
+            if column in df.columns:
+                df[column] = pd.to_timedelta(df[column]).dt.total_seconds()
         df = df.sort_values(by=BenchmarkResult.Column.score, ascending=False)
     return df
 
 
-def build_bundles_df(bundle_results: List[BundleResult]) -> pd.DataFrame:
+def build_bundles_df(bundle_results: List[BundleResult]) -> "pd.DataFrame":
     df = BundleResult.to_dataframe(bundle_results)
     if not df.empty:
         df[BundleResult.Column.ttr] = df[BundleResult.Column.ttr].dt.total_seconds()
@@ -441,34 +652,85 @@ def write_for_leaderboard(benchmark_results: List[BenchmarkResult], output_dir:
     path_bundle_results = output_dir / "bundle_results.jsonl"
     path_bundle_results.unlink(missing_ok=True)
 
-    path_bench_results = output_dir / "benchmark_results.jsonl"
-    path_bench_results_md = output_dir / "benchmark_results.md"
-
     for br in benchmark_results:
         df = build_bundles_df(br.results)
         jsonline = df.to_json(orient="records", lines=True, date_format="iso")
         with path_bundle_results.open("a") as f:
             f.write(jsonline)
 
+    write_benchmark_results(benchmark_results, output_dir)
+
+
+def write_benchmark_results(benchmark_results: List[BenchmarkResult], output_dir: Path):
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path_bench_results = output_dir / "benchmark_results.jsonl"
+    path_bench_results_md = output_dir / "benchmark_results.md"
+
     df = build_benchmark_df(benchmark_results)
     with path_bench_results.open("w") as f:
         f.write(df.to_json(orient="records", lines=True, date_format="iso"))
 
+    md = to_leaderboard_markdown(df)
+    print(md)
+    with path_bench_results_md.open("w") as f:
+        f.write(md)
+
+
+def format_interval(low: "pd.Series", high: "pd.Series", scale: float = 1) -> "pd.Series":
+    formatted = "[" + (low * scale).round(1).astype(str) + ", " + (high * scale).round(1).astype(str) + "]"
+    return formatted.where(low.notna() & high.notna())
+
+
+def to_leaderboard_markdown(df: "pd.DataFrame") -> str:
+    # df is the output of build_benchmark_df. Statistics columns are only shown when at least one row has them.
     df = df.reindex(
         columns=[
             BenchmarkResult.Column.agent,
             BenchmarkResult.Column.incident_type,
             BenchmarkResult.Column.score,
+            BenchmarkResult.Column.score_ci_low,
+            BenchmarkResult.Column.score_ci_high,
+            BenchmarkResult.Column.pass_at_1,
+            BenchmarkResult.Column.pass_at_k,
             BenchmarkResult.Column.mttr,
+            BenchmarkResult.Column.mttr_ci_low,
+            BenchmarkResult.Column.mttr_ci_high,
+            BenchmarkResult.Column.ttr_p50,
+            BenchmarkResult.Column.ttr_p90,
+            BenchmarkResult.Column.ttr_p99,
             BenchmarkResult.Column.date,
         ]
     )
     df[BenchmarkResult.Column.score] = df[BenchmarkResult.Column.score] * 100
-    df = df.rename(columns={BenchmarkResult.Column.incident_type: "scenario type", BenchmarkResult.Column.score: "pass rate (%)"})
-    md = df.to_markdown(index=False)
-    print(md)
-    with path_bench_results_md.open("w") as f:
-        f.write(md)
+    df[BenchmarkResult.Column.score_ci_low] = format_interval(df[BenchmarkResult.Column.score_ci_low], df[BenchmarkResult.Column.score_ci_high], 100)
+    df[BenchmarkResult.Column.mttr_ci_low] = format_interval(df[BenchmarkResult.Column.mttr_ci_low], df[BenchmarkResult.Column.mttr_ci_high])
+    df = df.drop(columns=[BenchmarkResult.Column.score_ci_high, BenchmarkResult.Column.mttr_ci_high])
+    df[BenchmarkResult.Column.pass_at_1] = df[BenchmarkResult.Column.pass_at_1] * 100
+    df[BenchmarkResult.Column.pass_at_k] = df[BenchmarkResult.Column.pass_at_k] * 100
+    optional_columns = [
+        BenchmarkResult.Column.score_ci_low,
+        BenchmarkResult.Column.pass_at_1,
+        BenchmarkResult.Column.pass_at_k,
+        BenchmarkResult.Column.mttr_ci_low,
+        BenchmarkResult.Column.ttr_p50,
+        BenchmarkResult.Column.ttr_p90,
+        BenchmarkResult.Column.ttr_p99,
+    ]
+    df = df.drop(columns=[x for x in optional_columns if df[x].isna().all()])
+    df = df.rename(
+        columns={
+            BenchmarkResult.Column.incident_type: "scenario type",
+            BenchmarkResult.Column.score: "pass rate (%)",
+            BenchmarkResult.Column.score_ci_low: "pass rate CI (%)",
+            BenchmarkResult.Column.pass_at_1: "pass@1 (%)",
+            BenchmarkResult.Column.pass_at_k: "pass@k (%)",
+            BenchmarkResult.Column.mttr_ci_low: "mttr CI",
+            BenchmarkResult.Column.ttr_p50: "ttr p50",
+            BenchmarkResult.Column.ttr_p90: "ttr p90",
+            BenchmarkResult.Column.ttr_p99: "ttr p99",
+        }
+    )
+    return df.to_markdown(index=False)
 
 
 def merge_dicts_recursively(dict_a, dict_b):
@@ -17,9 +17,12 @@ import logging
 import os
 import subprocess
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from itbench_utilities.app.models.bundle import MakeCmd, MakeTargetMapping
+from itbench_utilities.app.utils import get_timestamp
+from itbench_utilities.cassette import Cassette, CassetteEntry, CassetteError, CassetteExhaustedError
+from itbench_utilities.common import metrics, tracing
 from itbench_utilities.models.bundle import (
     Bundle,
     BundleEvaluation,
@@ -46,11 +49,13 @@ class BundleOperator:
         observer: Observer,
         is_test: bool = False,
         _logger: Optional[logging.Logger] = None,
+        cassette: Optional[Cassette] = None,
     ) -> None:
         self.bundle = bundle
         self.bundle_request = bundle_request
         self.observer = observer
         self.is_test = is_test
+        self.cassette = cassette
         self.logger = _logger if _logger else logger
         self.make_targets = self.bundle.make_target_mapping
         deploy = MakeCmd(target="deploy_bundle")
@@ -194,7 +199,6 @@ class BundleOperator:
         logger = self.logger
 
         try:
-            current_env = os.environ.copy()
             commant_args = ["make", target, f"SHARED_WORKSPACE={self.bundle_request.shared_workspace}"]
             if self.bundle_request.input_file:
                 commant_args.append(f"INPUT_FILE={self.bundle_request.input_file}")
@@ -206,22 +210,15 @@ class BundleOperator:
             if self.is_test:
                 commant_args += ["TEST=true"]
             cwd = self.bundle.get_path().as_posix()
-            self.observer.notify("invoke_bundle:run_process:start", {"target": target, "commant_args": commant_args, "cwd": cwd, "env": current_env})
-            process = subprocess.Popen(
-                commant_args,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                cwd=cwd,
-                env=current_env,
+            # The environment is only copied when a subscriber asks for it; make inherits it anyway.
+            self.observer.notify(
+                "invoke_bundle:run_process:start", {"target": target, "commant_args": commant_args, "cwd": cwd, "env": os.environ.copy}
             )
+            returncode, stdout, stderr = self.run_process(target, commant_args, cwd, None)
 
-            process.wait()
-            returncode = process.returncode
-            stdout = process.stdout.read()
-            stderr = process.stderr.read()
-
-            self.observer.notify("invoke_bundle:run_process:end", {"returncode": returncode, "stdout": stdout, "stderr": stderr, "retry": retry})
+            self.observer.notify(
+                "invoke_bundle:run_process:end", lambda: {"returncode": returncode, "stdout": stdout, "stderr": stderr, "retry": retry}
+            )
 
             if returncode != 0:
                 logger.error(f"An error occurred. Return code: {returncode}")
@@ -230,24 +227,80 @@ class BundleOperator:
                 if _retry > max_retry:
                     raise Exception(f"{_retry} is exxess {max_retry}")
                 logger.error(f"Retry {_retry}/{max_retry}")
-                time.sleep(interval)
+                self.sleep(interval)
                 return self.invoke_bundle(target, extra_args, retry=_retry)
             return stdout
 
+        except CassetteError:
+            raise
         except Exception as e:
             message = f"An exception occurred: {e}"
             self.observer.notify("invoke_bundle:run_process:error", {"error": message})
             logger.error(message)
 
+    def run_process(self, target, commant_args, cwd, env) -> Tuple[int, str, str]:
+        if self.cassette and self.cassette.is_replay:
+            entry = self.cassette.replay(target)
+            return entry.returncode, entry.stdout, entry.stderr
+
+        started_at = get_timestamp()
+        start_time = time.monotonic()
+        with metrics.track_subprocess("make"), tracing.span(f"make {target}", category="make", bundle=self.bundle.name) as span:
+            process = subprocess.Popen(
+                commant_args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                cwd=cwd,
+                env=env,
+            )
+
+            process.wait()
+            returncode = process.returncode
+            stdout = process.stdout.read()
+            stderr = process.stderr.read()
+            if span:
+                span.attributes["returncode"] = returncode
+
+        if self.cassette:
+            self.cassette.record(
+                CassetteEntry(
+                    target=target,
+                    args=commant_args,
+                    returncode=returncode,
+                    stdout=stdout,
+                    stderr=stderr,
+                    started_at=started_at,
+                    duration=time.monotonic() - start_time,
+                )
+            )
+        return returncode, stdout, stderr
+
+    def sleep(self, seconds):
+        # Recorded runs are replayed as fast as possible.
+        if self.cassette and self.cassette.is_replay:
+            self.cassette.advance(seconds)
+            return
+        time.sleep(seconds)
+
+    def time(self) -> float:
+        if self.cassette and self.cassette.is_replay:
+            return self.cassette.time()
+        return time.time()
+
     def wait_bundle(self, type, status="True", interval: Optional[int] = None, timeout: Optional[int] = None) -> bool:
         interval = interval if interval else DEFAULT_WAIT_INTERVAL
         timeout = timeout if timeout else DEFAULT_WAIT_TIMEOUT
         logger = self.logger
 
         bundle_name = self.bundle.name
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            bundle_status = self.get_bundle_status()
+        start_time = self.time()
+        while self.time() - start_time < timeout:
+            try:
+                bundle_status = self.get_bundle_status()
+            except CassetteExhaustedError as e:
+                logger.error(f"Replay ended while waiting for {bundle_name}: {e}")
+                return False
             conditions = [x for x in bundle_status.conditions if x.type == type]
             if len(conditions) > 0:
                 condition = conditions[0]
@@ -264,7 +317,7 @@ class BundleOperator:
                     return False
                 if condition.message:
                     logger.info(condition.message)
-            time.sleep(interval)
+            self.sleep(interval)
         logger.error(f"Timed out for {bundle_name}.")
         return False
 
@@ -288,13 +341,17 @@ class BundleOperator:
 
         bundle_name = self.bundle.name
         logger.info(f"Watch a problem for {bundle_name}...")
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            result = self.get_incident()
+        start_time = self.time()
+        while self.time() - start_time < timeout:
+            try:
+                result = self.get_incident()
+            except CassetteExhaustedError as e:
+                logger.error(f"Replay ended while watching the problem for {bundle_name}: {e}")
+                return False
             logger.debug(f"The problem {result} for {bundle_name}.")
             if callback(result):
                 return True
-            time.sleep(interval)
+            self.sleep(interval)
         return False
 
 
@@ -0,0 +1,109 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import DefaultDict, List, Optional
+
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_FILE_NAME = "cassette.jsonl"
+
+
+class CassetteMode(str, Enum):
+    Record = "record"
+    Replay = "replay"
+
+
+class CassetteEntry(BaseModel):
+    target: str = Field(..., description="The Makefile target name.")
+    args: List[str] = Field([], description="The full command line passed to make.")
+    returncode: int = Field(..., description="The return code of the make invocation.")
+    stdout: Optional[str] = Field("", description="The captured stdout.")
+    stderr: Optional[str] = Field("", description="The captured stderr.")
+    started_at: datetime = Field(..., description="The date and time when the make invocation started.")
+    duration: float = Field(..., description="Wall time of the make invocation in seconds.")
+
+
+class CassetteError(Exception):
+    pass
+
+
+class CassetteExhaustedError(CassetteError):
+    pass
+
+
+class Cassette:
+
+    def __init__(self, path: Path, mode: CassetteMode) -> None:
+        self.path = Path(path)
+        self.mode = CassetteMode(mode)
+        self.lock = threading.Lock()
+        self.entries: DefaultDict[str, List[CassetteEntry]] = defaultdict(list)
+        self.cursors: DefaultDict[str, int] = defaultdict(int)
+        # Replayed waits are measured on a virtual clock advanced by the recorded durations and the requested sleeps.
+        self.clock = 0.0
+        if self.mode == CassetteMode.Replay:
+            self.load()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.unlink(missing_ok=True)
+
+    @property
+    def is_replay(self) -> bool:
+        return self.mode == CassetteMode.Replay
+
+    def load(self):
+        if not self.path.exists():
+            raise CassetteError(f"Cassette '{self.path.as_posix()}' is not found.")
+        with self.path.open("r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = CassetteEntry.model_validate_json(line)
+                self.entries[entry.target].append(entry)
+        logger.info(f"Loaded cassette '{self.path.as_posix()}' ({sum(len(x) for x in self.entries.values())} entries).")
+
+    def record(self, entry: CassetteEntry):
+        with self.lock:
+            self.entries[entry.target].append(entry)
+            with self.path.open("a") as f:
+                f.write(entry.model_dump_json() + "\n")
+
+    def replay(self, target: str) -> CassetteEntry:
+        with self.lock:
+            entries = self.entries.get(target)
+            if not entries:
+                raise CassetteError(f"No recording for target '{target}' in cassette '{self.path.as_posix()}'.")
+            cursor = self.cursors[target]
+            if cursor >= len(entries):
+                raise CassetteExhaustedError(
+                    f"Recording for target '{target}' in cassette '{self.path.as_posix()}' is exhausted ({len(entries)} entries)."
+                )
+            self.cursors[target] = cursor + 1
+            self.clock += entries[cursor].duration
+            return entries[cursor]
+
+    def time(self) -> float:
+        return self.clock
+
+    def advance(self, seconds: float):
+        with self.lock:
+            self.clock += seconds
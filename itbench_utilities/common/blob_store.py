@@ -0,0 +1,76 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Tuple, Union
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR_NAME = "blobs"
+DIGEST_ALGORITHM = "sha256"
+DEFAULT_BLOB_THRESHOLD = int(os.getenv("BLOB_THRESHOLD", "4096"))
+DEFAULT_PREVIEW_LENGTH = int(os.getenv("BLOB_PREVIEW_LENGTH", "256"))
+
+
+class BlobStore:
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    def get_path(self, ref: str) -> Path:
+        algorithm, _, digest = ref.partition(":")
+        if algorithm != DIGEST_ALGORITHM or len(digest) != 64:
+            raise ValueError(f"Invalid blob reference: {ref}")
+        return self.root / digest[:2] / f"{digest[2:]}.gz"
+
+    def put(self, data: Union[str, bytes]) -> str:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        ref = f"{DIGEST_ALGORITHM}:{hashlib.sha256(data).hexdigest()}"
+        path = self.get_path(ref)
+        if path.exists():
+            return ref
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename so that concurrent writers of the same content never leave a partial blob.
+        tmp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+        with tmp_path.open("wb") as f:
+            f.write(gzip.compress(data, mtime=0))
+        os.replace(tmp_path, path)
+        return ref
+
+    def get_bytes(self, ref: str) -> bytes:
+        with self.get_path(ref).open("rb") as f:
+            return gzip.decompress(f.read())
+
+    def get(self, ref: str) -> str:
+        return self.get_bytes(ref).decode("utf-8")
+
+    def exists(self, ref: str) -> bool:
+        return self.get_path(ref).exists()
+
+
+def offload_text(
+    store: BlobStore, text: Optional[str], threshold: int = DEFAULT_BLOB_THRESHOLD, preview_length: int = DEFAULT_PREVIEW_LENGTH
+) -> Tuple[Optional[str], Optional[str]]:
+    # Returns the text to keep inline and the blob reference, if the text was larger than the threshold.
+    if text is None or len(text) <= threshold:
+        return text, None
+    ref = store.put(text)
+    return f"{text[:preview_length]}... [{len(text)} chars stored in {ref}]", ref
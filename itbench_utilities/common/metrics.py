@@ -0,0 +1,275 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+# Values of every metric by name and label values, e.g. to forward the metrics of a worker process to the runner.
+Snapshot = Dict[str, Dict[LabelValues, Any]]
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def label_values(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(x, "")) for x in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        raise NotImplementedError
+
+    def diff(self, before: Dict[LabelValues, Any], after: Dict[LabelValues, Any]) -> Dict[LabelValues, Any]:
+        raise NotImplementedError
+
+    def merge(self, delta: Dict[LabelValues, Any]):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self.label_values(labels), 0)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self.lock:
+            return dict(self.values)
+
+    def diff(self, before: Dict[LabelValues, float], after: Dict[LabelValues, float]) -> Dict[LabelValues, float]:
+        return {key: value - before.get(key, 0) for key, value in after.items() if value != before.get(key, 0)}
+
+    def merge(self, delta: Dict[LabelValues, float]):
+        with self.lock:
+            for key, value in delta.items():
+                self.values[key] = self.values.get(key, 0) + value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self.lock:
+            for key, value in self.values.items():
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.counts: Dict[LabelValues, List[int]] = {}
+        self.sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self.label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self.sums[key] = self.sums.get(key, 0) + value
+
+    def get_count(self, **labels) -> int:
+        return sum(self.counts.get(self.label_values(labels), []))
+
+    def snapshot(self) -> Dict[LabelValues, Tuple[List[int], float]]:
+        with self.lock:
+            return {key: (list(counts), self.sums[key]) for key, counts in self.counts.items()}
+
+    def diff(
+        self, before: Dict[LabelValues, Tuple[List[int], float]], after: Dict[LabelValues, Tuple[List[int], float]]
+    ) -> Dict[LabelValues, Tuple[List[int], float]]:
+        delta = {}
+        for key, (counts, total) in after.items():
+            before_counts, before_total = before.get(key, ([0] * len(counts), 0))
+            if counts != before_counts:
+                delta[key] = ([x - y for x, y in zip(counts, before_counts)], total - before_total)
+        return delta
+
+    def merge(self, delta: Dict[LabelValues, Tuple[List[int], float]]):
+        with self.lock:
+            for key, (counts, total) in delta.items():
+                current = self.counts.setdefault(key, [0] * (len(self.buckets) + 1))
+                for index, count in enumerate(counts):
+                    current[index] += count
+                self.sums[key] = self.sums.get(key, 0) + total
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self.lock:
+            for key, counts in self.counts.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    labels = format_labels(self.labelnames + ("le",), key + (format_value(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {format_value(self.sums[key])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Snapshot:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def diff(self, before: Snapshot, after: Snapshot) -> Snapshot:
+        delta = {}
+        for name, values in after.items():
+            changes = self.metrics[name].diff(before.get(name, {}), values)
+            if changes:
+                delta[name] = changes
+        return delta
+
+    def merge(self, delta: Snapshot):
+        # Metrics unknown to this registry are ignored.
+        for name, values in delta.items():
+            if name in self.metrics:
+                self.metrics[name].merge(values)
+
+
+REGISTRY = Registry()
+
+RUNNING_TASKS = REGISTRY.register(Gauge("itbench_running_tasks", "The number of benchmark tasks currently running.", ["component"]))
+QUEUED_TASKS = REGISTRY.register(Gauge("itbench_queued_tasks", "The number of benchmark tasks waiting to be taken at the last poll.", ["component"]))
+JOBS_TAKEN = REGISTRY.register(Counter("itbench_jobs_taken_total", "The number of benchmark jobs taken.", ["component"]))
+JOBS_FAILED = REGISTRY.register(Counter("itbench_jobs_failed_total", "The number of benchmark jobs that failed.", ["component"]))
+POLLS = REGISTRY.register(Counter("itbench_polls_total", "The number of polls to the Bench Server.", ["component"]))
+BUNDLE_PHASE_DURATION = REGISTRY.register(Histogram("itbench_bundle_phase_duration_seconds", "Duration of each bundle phase in seconds.", ["phase"]))
+REST_REQUEST_DURATION = REGISTRY.register(
+    Histogram("itbench_rest_request_duration_seconds", "Latency of requests to the Bench Server in seconds.", ["method", "status"])
+)
+SUBPROCESSES = REGISTRY.register(Counter("itbench_subprocesses_total", "The number of subprocesses started.", ["kind"]))
+RUNNING_SUBPROCESSES = REGISTRY.register(Gauge("itbench_running_subprocesses", "The number of subprocesses currently running.", ["kind"]))
+
+
+@contextmanager
+def track_subprocess(kind: str):
+    SUBPROCESSES.inc(kind=kind)
+    RUNNING_SUBPROCESSES.inc(kind=kind)
+    try:
+        yield
+    finally:
+        RUNNING_SUBPROCESSES.dec(kind=kind)
+
+
+@contextmanager
+def time_phase(phase: str, durations: Optional[Dict[str, float]] = None):
+    start_time = time.monotonic()
+    try:
+        yield
+    finally:
+        duration = time.monotonic() - start_time
+        BUNDLE_PHASE_DURATION.observe(duration, phase=phase)
+        if durations is not None:
+            durations[phase] = durations.get(phase, 0) + duration
+
+
+def create_handler(registry: Registry):
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ["/metrics", "/"]:
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return MetricsHandler
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", registry: Optional[Registry] = None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), create_handler(registry if registry else REGISTRY))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
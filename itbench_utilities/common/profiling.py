@@ -0,0 +1,152 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from enum import Enum
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILE_SUFFIX = ".prof"
+REPORT_FILE_SUFFIX = ".profile.txt"
+DEFAULT_TOP = int(os.getenv("PROFILE_TOP", "30"))
+TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+
+_state = threading.local()
+# tracemalloc is process-wide: concurrent profiles share it and only the last one to finish stops it.
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+class ProfileScope(str, Enum):
+    Bundle = "bundle"
+    Job = "job"
+
+
+def get_profile_paths(output_dir: Path, name: str):
+    output_dir = Path(output_dir)
+    return output_dir / f"{name}{PROFILE_FILE_SUFFIX}", output_dir / f"{name}{REPORT_FILE_SUFFIX}"
+
+
+@contextmanager
+def profile(output_dir: Path, name: str, top: int = DEFAULT_TOP) -> Iterator[Optional[cProfile.Profile]]:
+    # A nested call (e.g. a bundle inside a profiled job) is a no-op.
+    if getattr(_state, "active", False):
+        yield None
+        return
+    _state.active = True
+    tracing = False
+    before: Optional[tracemalloc.Snapshot] = None
+    profiler: Optional[cProfile.Profile] = None
+    try:
+        start_tracemalloc()
+        tracing = True
+        before = tracemalloc.take_snapshot()
+        profiler = start_profiler(name)
+        yield profiler
+    finally:
+        if profiler:
+            profiler.disable()
+        if tracing:
+            try:
+                after = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                stop_tracemalloc()
+        _state.active = False
+        if before is not None:
+            try:
+                write_reports(profiler, before, after, current, peak, output_dir, name, top)
+            except Exception as e:
+                logger.error(f"Failed to write profile '{name}' to {output_dir}: {e}")
+
+
+def start_profiler(name: str) -> Optional[cProfile.Profile]:
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Since Python 3.12 only one cProfile profiler can be active per process; concurrent profiles only trace allocations.
+        logger.warning(f"CPU profiling is skipped for '{name}': {e}")
+        return None
+    return profiler
+
+
+def start_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_started = not tracemalloc.is_tracing()
+            if _tracemalloc_started:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            # The peak is only reset by the first profile; overlapping profiles report the peak of the whole overlap.
+            tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+def maybe_profile(enabled: bool, output_dir: Path, name: str, top: int = DEFAULT_TOP):
+    if not enabled:
+        return nullcontext()
+    return profile(output_dir, name, top)
+
+
+def write_reports(
+    profiler: Optional[cProfile.Profile],
+    before: tracemalloc.Snapshot,
+    after: tracemalloc.Snapshot,
+    current: int,
+    peak: int,
+    output_dir: Path,
+    name: str,
+    top: int,
+):
+    prof_path, report_path = get_profile_paths(output_dir, name)
+    prof_path.parent.mkdir(parents=True, exist_ok=True)
+
+    stream = io.StringIO()
+    if profiler:
+        profiler.dump_stats(prof_path.as_posix())
+        stats = pstats.Stats(profiler, stream=stream)
+        stream.write(f"# Top {top} functions by cumulative time\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    else:
+        stream.write("# CPU profile is not available: another profile was active\n")
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    diffs = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    stream.write(f"# Top {top} allocations by size difference (current: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB)\n")
+    for diff in diffs[:top]:
+        stream.write(f"{diff}\n")
+
+    with report_path.open("w") as f:
+        f.write(stream.getvalue())
+    logger.info(f"Profile is written to {prof_path.as_posix()} and {report_path.as_posix()}")
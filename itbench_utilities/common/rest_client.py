@@ -12,21 +12,40 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import base64
+import json
 import logging
-from typing import Any, Dict, Optional
+import time
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
 
 import requests
 import urllib3
 from urllib3.exceptions import InsecureRequestWarning
 
 from itbench_utilities.app.models.base import AgentPhaseEnum
-from itbench_utilities.app.utils import create_status
+from itbench_utilities.app.models.user import TokenPayload
+from itbench_utilities.app.utils import create_status, get_timestamp
+from itbench_utilities.common import metrics, tracing
 
 urllib3.disable_warnings(InsecureRequestWarning)
 
 logger = logging.getLogger(__name__)
 
 
+def decode_token_payload(token: str) -> Optional[TokenPayload]:
+    # The signature is not verified: the client only needs the claims, e.g. when the token expires.
+    try:
+        payload = token.split(".")[1]
+        data = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return TokenPayload.model_validate(data)
+    except Exception as e:
+        logger.debug(f"Failed to decode the payload of the access token: {e}")
+        return None
+
+
 class RestClient:
     def __init__(
         self,
@@ -45,23 +64,51 @@ class RestClient:
         else:
             self.headers = {"Content-type": "application/json"}
         self.verify = verify if verify else False
+        self.token_expires_at: Optional[datetime] = None
+        # Called to re-authenticate when a request is rejected with 401; the request is then retried once.
+        self.on_unauthorized: Optional[Callable[[], None]] = None
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = self.send(method, url, **kwargs)
+        headers = kwargs.get("headers") or {}
+        # Uploaded files cannot be sent twice, and requests without a token (e.g. login) have nothing to refresh.
+        if response.status_code == HTTPStatus.UNAUTHORIZED and self.on_unauthorized and "Authorization" in headers and "files" not in kwargs:
+            logger.info(f"{method} {urlparse(url).path} was unauthorized. Re-authenticate and retry.")
+            self.on_unauthorized()
+            kwargs["headers"] = {**headers, "Authorization": self.headers["Authorization"]}
+            response = self.send(method, url, **kwargs)
+        return response
+
+    def send(self, method: str, url: str, **kwargs) -> requests.Response:
+        start_time = time.monotonic()
+        status = "error"
+        try:
+            with tracing.span(f"{method} {urlparse(url).path}", category="rest") as span:
+                response = requests.request(method, url, **kwargs)
+                status = str(response.status_code)
+                if span:
+                    span.attributes["status_code"] = response.status_code
+                return response
+        finally:
+            metrics.REST_REQUEST_DURATION.observe(time.monotonic() - start_time, method=method, status=status)
 
     def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
         _endpoint = endpoint.lstrip("/")
         url = f"{self.base_url}/{_endpoint}"
-        response = requests.get(url, headers=self.headers, params=params, verify=self.verify)
+        response = self.request("GET", url, headers=self.headers, params=params, verify=self.verify)
         response.raise_for_status()
         return response
 
     def assign(self, benchmark_id: str, agent_id: str, bundle_id: str) -> requests.Response:
         url = f"{self.base_url}/benchmarks/{benchmark_id}/assign_agent"
-        response = requests.put(url, headers=self.headers, json={"agent_id": agent_id, "bundle_id": bundle_id}, verify=self.verify)
+        response = self.request("PUT", url, headers=self.headers, json={"agent_id": agent_id, "bundle_id": bundle_id}, verify=self.verify)
         return response
 
     def put(self, endpoint: str, body = None, params: Optional[Dict[str, Any]] = None) -> requests.Response:
         _endpoint = endpoint.lstrip("/")
         url = f"{self.base_url}/{_endpoint}"
-        response = requests.put(
+        response = self.request(
+            "PUT",
             url,
             headers=self.headers,
             data=body,
@@ -73,7 +120,8 @@ class RestClient:
     def post(self, endpoint: str, body = None, params: Optional[Dict[str, Any]] = None) -> requests.Response:
         _endpoint = endpoint.lstrip("/")
         url = f"{self.base_url}/{_endpoint}"
-        response = requests.post(
+        response = self.request(
+            "POST",
             url,
             headers=self.headers,
             data=body,
@@ -85,17 +133,28 @@ class RestClient:
     def push_agent_status(self, benchmark_id: str, agent_id: str, phase: AgentPhaseEnum, message: Optional[str] = None):
         url = f"{self.base_url}/benchmarks/{benchmark_id}/agents/{agent_id}/status"
         status = create_status(phase.value, message)
-        requests.put(url, headers=self.headers, data=status.model_dump_json(), verify=self.verify)
+        self.request("PUT", url, headers=self.headers, data=status.model_dump_json(), verify=self.verify)
 
     def upload_file(self, benchmark_id: str, file_path: str, new_file_name: str):
         with open(file_path, "rb") as file:
             files = {"file": (new_file_name, file)}
             url = f"{self.base_url}/benchmarks/{benchmark_id}/file"
-            response = requests.post(url, headers={"Authorization": self.headers["Authorization"]}, files=files, verify=self.verify)
+            response = self.request("POST", url, headers={"Authorization": self.headers["Authorization"]}, files=files, verify=self.verify)
             response.raise_for_status()
 
     def login(self, username, password):
         url = f"{self.base_url}/token"
-        response = requests.post(url, data={"username": username, "password": password}, verify=self.verify)
-        token = response.json()["access_token"]
+        response = self.request("POST", url, data={"username": username, "password": password}, verify=self.verify)
+        response.raise_for_status()
+        self.set_token(response.json()["access_token"])
+
+    def set_token(self, token: str):
         self.headers["Authorization"] = f"Bearer {token}"
+        payload = decode_token_payload(token)
+        self.token_expires_at = payload.exp if payload else None
+
+    def is_token_valid(self, margin: float = 0) -> bool:
+        # A token without `exp` is kept until the server rejects it.
+        if "Authorization" not in self.headers:
+            return False
+        return self.token_expires_at is None or self.token_expires_at - timedelta(seconds=margin) > get_timestamp()
@@ -0,0 +1,143 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE_NAME = "trace.json"
+
+
+class Span(BaseModel):
+    id: int = Field(..., description="Unique identifier of the span within the trace.")
+    parent_id: Optional[int] = Field(None, description="The identifier of the enclosing span.")
+    name: str = Field(..., description="The name of the span.")
+    category: str = Field("", description="The category of the span, e.g. 'bundle', 'phase', 'make', 'agent' or 'rest'.")
+    start: float = Field(..., description="Start time in microseconds since the epoch.")
+    duration: float = Field(0, description="Duration in microseconds.")
+    thread_id: int = Field(..., description="The identifier of the thread the span ran on.")
+    attributes: Dict[str, Any] = Field({}, description="Arbitrary attributes of the span.")
+
+
+class Trace:
+
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+        self.ids = count(1)
+        self.origin_wall = time.time()
+        self.origin_perf = time.perf_counter()
+
+    def now(self) -> float:
+        return (self.origin_wall + time.perf_counter() - self.origin_perf) * 1e6
+
+    def next_id(self) -> int:
+        with self.lock:
+            return next(self.ids)
+
+    def add(self, span: Span):
+        with self.lock:
+            self.spans.append(span)
+
+    def to_trace_events(self) -> List[Dict[str, Any]]:
+        # Chrome Trace Event Format, readable by Perfetto, chrome://tracing and speedscope.
+        pid = os.getpid()
+        events = []
+        for span in sorted(self.spans, key=lambda x: x.start):
+            args = {"span_id": span.id, "parent_id": span.parent_id}
+            args.update(span.attributes)
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": span.start,
+                    "dur": span.duration,
+                    "pid": pid,
+                    "tid": span.thread_id,
+                    "args": args,
+                }
+            )
+        return events
+
+    def export(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as f:
+            json.dump({"traceEvents": self.to_trace_events(), "displayTimeUnit": "ms"}, f, default=str)
+        logger.info(f"Trace is written to {path.as_posix()}")
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("itbench_utilities_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("itbench_utilities_span", default=None)
+
+
+def get_current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(path: Optional[Path]) -> Iterator[Optional[Trace]]:
+    if path is None:
+        yield None
+        return
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        try:
+            trace.export(path)
+        except Exception as e:
+            logger.error(f"Failed to export trace to {path}: {e}")
+
+
+@contextmanager
+def span(name: str, category: str = "", **attributes) -> Iterator[Optional[Span]]:
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(
+        id=trace.next_id(),
+        parent_id=parent.id if parent else None,
+        name=name,
+        category=category,
+        start=trace.now(),
+        thread_id=threading.get_ident(),
+        attributes=attributes,
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = trace.now() - current.start
+        _current_span.reset(token)
+        trace.add(current)
@@ -0,0 +1,155 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from itbench_utilities.observer import EventData, custom_serializer
+
+DEFAULT_MAX_BYTES = int(os.getenv("EVENT_SINK_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def get_event_file_path(directory: Path, name: str) -> Path:
+    return Path(directory) / f"{name}.events.jsonl"
+
+
+def list_event_files(directory: Path, name: str) -> List[Path]:
+    pattern = re.compile(rf"^{re.escape(name)}\.events\.(\d+)\.jsonl(\.gz)?$")
+    rotated: Dict[int, Path] = {}
+    for path in Path(directory).glob(f"{name}.events.*.jsonl*"):
+        m = pattern.match(path.name)
+        # While a rotated file is being compressed, the plain file is complete and the compressed one may not be.
+        if m and (int(m.group(1)) not in rotated or not m.group(2)):
+            rotated[int(m.group(1))] = path
+    files = [rotated[x] for x in sorted(rotated)]
+    current = get_event_file_path(directory, name)
+    if current.exists():
+        files.append(current)
+    return files
+
+
+def compress_file(path: Path):
+    compressed = path.with_name(path.name + ".gz")
+    temp = path.with_name(path.name + ".gz.tmp")
+    try:
+        with path.open("rb") as src, gzip.open(temp, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(temp, compressed)
+        path.unlink()
+    except Exception as e:
+        logger.error(f"Failed to compress {path.as_posix()}: {e}")
+
+
+class JsonlEventSink:
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        compress: bool = False,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> None:
+        self.directory = Path(directory)
+        self.name = name
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.path = get_event_file_path(self.directory, name)
+        self.lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sequence = self.get_last_sequence()
+        self.file = None
+        self.size = 0
+        self.compressors: List[threading.Thread] = []
+
+    def __call__(self, event_data: EventData):
+        self.write(event_data)
+
+    def write(self, event_data: EventData):
+        record = {"event": event_data.event, "timestamp": event_data.timestamp, "data": event_data.data}
+        line = (json.dumps(record, default=custom_serializer) + "\n").encode("utf-8")
+        with self.lock:
+            if self.file is None:
+                self.open()
+            if self.size > 0 and self.size + len(line) > self.max_bytes:
+                self.rotate()
+            self.file.write(line)
+            self.size += len(line)
+
+    def open(self):
+        self.file = self.path.open("ab", buffering=self.buffer_size)
+        self.size = self.file.tell()
+
+    def rotate(self):
+        self.file.close()
+        self.sequence += 1
+        rotated = self.directory / f"{self.name}.events.{self.sequence}.jsonl"
+        self.path.rename(rotated)
+        self.open()
+        if self.compress:
+            # Compress off the notifying thread and outside the lock, so that a rotation does not stall the benchmark.
+            compressor = threading.Thread(target=compress_file, args=(rotated,), name="event-sink-compressor", daemon=True)
+            compressor.start()
+            self.compressors = [x for x in self.compressors if x.is_alive()] + [compressor]
+
+    def get_last_sequence(self) -> int:
+        sequences = [0]
+        for path in list_event_files(self.directory, self.name):
+            m = re.match(rf"^{re.escape(self.name)}\.events\.(\d+)\.jsonl", path.name)
+            if m:
+                sequences.append(int(m.group(1)))
+        return max(sequences)
+
+    def flush(self):
+        with self.lock:
+            if self.file:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+            compressors, self.compressors = self.compressors, []
+        for compressor in compressors:
+            compressor.join()
+
+
+def read_events(directory: Path, name: str, event: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    for path in list_event_files(directory, name):
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be partial if the writer was killed.
+                    logger.warning(f"Skip malformed event line in {path.as_posix()}")
+                    continue
+                if event and not record.get("event", "").startswith(event):
+                    continue
+                yield record
@@ -0,0 +1,150 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from itbench_utilities.benchmark import write_benchmark_results
+from itbench_utilities.models.benchmark import GlobalBenchmarkResult
+from itbench_utilities.models.bundle import BundleResult
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_RESULTS_FILE_NAME = "bundle_results.jsonl"
+
+GroupKey = Tuple[str, ...]
+
+
+class RunningAggregate:
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.num_of_passed = 0
+        self.num_of_non_errored = 0
+        self.ttr_sum = 0.0
+        self.latest: Optional[datetime] = None
+        self.incident_types: Dict[str, None] = {}
+
+    def add(self, record: Dict[str, Any]):
+        self.count += 1
+        self.num_of_passed += 1 if record.get(BundleResult.Column.passed) else 0
+        self.num_of_non_errored += 0 if record.get(BundleResult.Column.errored) else 1
+        self.ttr_sum += float(record.get(BundleResult.Column.ttr) or 0)
+        date = datetime.fromisoformat(record[BundleResult.Column.date])
+        if self.latest is None or date > self.latest:
+            self.latest = date
+        incident_type = record.get(BundleResult.Column.incident_type)
+        if incident_type:
+            self.incident_types[incident_type] = None
+
+    def to_result(self, title: str, agent: str) -> GlobalBenchmarkResult:
+        return GlobalBenchmarkResult(
+            name=title,
+            agent=agent,
+            incident_type=",".join(self.incident_types),
+            mttr=timedelta(seconds=self.ttr_sum / self.count),
+            num_of_passed=self.num_of_passed,
+            score=self.num_of_passed / self.num_of_non_errored if self.num_of_non_errored > 0 else 0,
+            results=[],
+            date=self.latest,
+        )
+
+
+def find_result_files(paths: List[Path]) -> List[Path]:
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(sorted(path.rglob(BUNDLE_RESULTS_FILE_NAME)))
+        elif path.exists():
+            files.append(path)
+        else:
+            logger.warning(f"Skip missing result path {path.as_posix()}")
+    return files
+
+
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skip malformed result line in {path.as_posix()}")
+
+
+def get_run_key(record: Dict[str, Any]) -> Tuple[str, ...]:
+    benchmark_id = record.get(BundleResult.Column.benchmark_id)
+    if benchmark_id:
+        return ("benchmark_id", benchmark_id)
+    # Older result files have no benchmark_id: identify each result by its content so that copies are still counted once.
+    columns = [BundleResult.Column.agent, BundleResult.Column.name, BundleResult.Column.date, BundleResult.Column.trial]
+    return ("result",) + tuple(str(record.get(x)) for x in columns)
+
+
+class LeaderboardAggregator:
+
+    def __init__(self, title: str = "leaderboard", by_incident_type: bool = False) -> None:
+        self.title = title
+        self.by_incident_type = by_incident_type
+        self.aggregates: Dict[GroupKey, RunningAggregate] = {}
+        # The same run is often copied into several result directories; the first file that contains a run owns it.
+        self.owners: Dict[Tuple[str, ...], Path] = {}
+
+    def add_file(self, path: Path, out=None) -> int:
+        added = 0
+        for record in iter_records(path):
+            owner = self.owners.setdefault(get_run_key(record), path)
+            if owner != path:
+                continue
+            agent = record[BundleResult.Column.agent]
+            key = (agent, record.get(BundleResult.Column.incident_type) or "") if self.by_incident_type else (agent,)
+            aggregate = self.aggregates.get(key)
+            if aggregate is None:
+                aggregate = self.aggregates[key] = RunningAggregate()
+            aggregate.add(record)
+            if out:
+                out.write(json.dumps(record) + "\n")
+            added += 1
+        return added
+
+    def to_benchmark_results(self) -> List[GlobalBenchmarkResult]:
+        return [x.to_result(self.title, key[0]) for key, x in self.aggregates.items()]
+
+
+def build_leaderboard(paths: List[Path], output_dir: Path, title: str = "leaderboard", by_incident_type: bool = False) -> List[GlobalBenchmarkResult]:
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path_bundle_results = output_dir / BUNDLE_RESULTS_FILE_NAME
+    aggregator = LeaderboardAggregator(title=title, by_incident_type=by_incident_type)
+    # Write to a temporary file since the output directory may itself be one of the inputs.
+    tmp_path = path_bundle_results.with_name(path_bundle_results.name + ".tmp")
+    with tmp_path.open("w") as out:
+        for path in find_result_files(paths):
+            if path.resolve() == path_bundle_results.resolve():
+                continue
+            added = aggregator.add_file(path, out)
+            logger.info(f"Merged {added} results from {path.as_posix()}")
+    tmp_path.replace(path_bundle_results)
+    benchmark_results = aggregator.to_benchmark_results()
+    write_benchmark_results(benchmark_results, output_dir)
+    return benchmark_results
+
+
+def run(args):
+    build_leaderboard([Path(x) for x in args.input], Path(args.out), title=args.title, by_incident_type=args.by_incident_type)
@@ -13,14 +13,17 @@
 # limitations under the License.
 
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
-import pandas as pd
-from pandas import DataFrame
 from pydantic import BaseModel, Field
 
+from itbench_utilities.cassette import CassetteMode
+from itbench_utilities.common.blob_store import DEFAULT_BLOB_THRESHOLD
 from itbench_utilities.models.agent import AgentInfo
-from itbench_utilities.models.bundle import Bundle, BundleResult
+from itbench_utilities.models.bundle import Bundle, BundleResult, build_dataframe
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 
 class BenchConfig(BaseModel):
@@ -28,6 +31,39 @@ class BenchConfig(BaseModel):
     is_test: bool
     soft_delete: bool
     resolution_wait: int = 30
+    cassette_mode: Optional[CassetteMode] = Field(
+        None, description="Record every make invocation of the bundles to a cassette, or replay a recorded cassette instead of running make."
+    )
+    cassette_dir: Optional[str] = Field(None, description="The output directory of the recorded run to replay. Default is the output directory.")
+    trace: bool = Field(False, description="Record tracing spans of the run and write them to trace.json in the output directory.")
+    progress: bool = Field(False, description="Show a live progress table on stderr and in progress.html in the output directory.")
+    progress_history: Optional[str] = Field(
+        None,
+        description="Path to the JSON file of historical scenario durations used for ETA. Default is progress-history.json in the output directory.",
+    )
+    bootstrap_resamples: int = Field(
+        1000, description="The number of bootstrap resamples for confidence intervals of pass rate and MTTR. 0 disables them."
+    )
+    bootstrap_seed: Optional[int] = Field(None, description="The random seed of the bootstrap resampling for reproducible intervals.")
+    confidence: float = Field(0.95, description="The confidence level of the bootstrap intervals.")
+    results_store_dir: Optional[str] = Field(
+        None, description="Root directory of the historical results store to append the bundle results of this run to. Disabled if not set."
+    )
+    blob_dir: Optional[str] = Field(
+        None,
+        description="Directory of the content-addressed store for large messages and evaluation reports. Default is blobs in the output directory.",
+    )
+    blob_threshold: int = Field(DEFAULT_BLOB_THRESHOLD, description="Messages longer than this number of characters are moved to the blob store.")
+    repeats: int = Field(1, description="The number of trials of each scenario, used for pass@k.")
+    reuse_deployment: bool = Field(
+        False, description="Between trials of a scenario, revert the fault and inject it again instead of deleting and redeploying the bundle."
+    )
+    parallel_scenarios: int = Field(
+        1, description="The maximum number of scenarios of an agent run at the same time. Scenarios of a remote agent always run one at a time."
+    )
+    profile: bool = Field(
+        False, description="Profile each bundle run with cProfile and tracemalloc and write the reports to the bundle output directory."
+    )
 
 
 class BenchRunConfig(BaseModel):
@@ -40,6 +76,18 @@ class BenchRunConfig(BaseModel):
     interval: Optional[int] = None
 
 
+class ScenarioResult(BaseModel):
+    agent: str = Field(..., description="The name of the agent.")
+    name: str = Field(..., description="The name of the scenario (bundle).")
+    incident_type: Optional[str] = Field(None, description="The incident type of the scenario.")
+    trials: int = Field(..., description="The number of trials.")
+    num_of_passed: int = Field(..., description="The number of passed trials.")
+    pass_at_1: float = Field(..., description="The ratio of passed trials.")
+    pass_at_k: Optional[float] = Field(None, description="Unbiased estimate of the probability that at least one of k trials passes.")
+    ttr_mean: float = Field(..., description="Mean time to repair over the trials in seconds.")
+    ttr_variance: Optional[float] = Field(None, description="Sample variance of time to repair over the trials in seconds squared.")
+
+
 class BenchmarkResult(BaseModel):
     name: str = Field(..., description="The name identifying the benchmark test.")
     incident_type: Optional[str] = Field(None, description="Incident types.")
@@ -50,6 +98,18 @@ class BenchmarkResult(BaseModel):
     score: float = Field(..., description="The ratio of the number of passed bundle over total bundles.")
     date: datetime = Field(..., description="The date and time when the benchmark was performed.")
     id: Optional[str] = Field(None, description="The unique identifier of benchmerk (benchmark_id).")
+    ttr_p50: Optional[timedelta] = Field(None, description="The median time to repair.")
+    ttr_p90: Optional[timedelta] = Field(None, description="The 90th percentile of time to repair.")
+    ttr_p99: Optional[timedelta] = Field(None, description="The 99th percentile of time to repair.")
+    score_ci_low: Optional[float] = Field(None, description="The lower bound of the bootstrap confidence interval of the score.")
+    score_ci_high: Optional[float] = Field(None, description="The upper bound of the bootstrap confidence interval of the score.")
+    mttr_ci_low: Optional[timedelta] = Field(None, description="The lower bound of the bootstrap confidence interval of MTTR.")
+    mttr_ci_high: Optional[timedelta] = Field(None, description="The upper bound of the bootstrap confidence interval of MTTR.")
+    confidence: Optional[float] = Field(None, description="The confidence level of the intervals.")
+    k: Optional[int] = Field(None, description="The number of trials per scenario used for pass@k.")
+    pass_at_1: Optional[float] = Field(None, description="pass@1 averaged over scenarios.")
+    pass_at_k: Optional[float] = Field(None, description="pass@k averaged over scenarios.")
+    scenarios: Optional[List[ScenarioResult]] = Field(None, description="Per-scenario statistics of repeated trials.")
 
     class Column:
         id = "id"
@@ -61,11 +121,27 @@ class BenchmarkResult(BaseModel):
         num_of_passed = "num_of_passed"
         score = "score"
         date = "date"
+        ttr_p50 = "ttr_p50"
+        ttr_p90 = "ttr_p90"
+        ttr_p99 = "ttr_p99"
+        score_ci_low = "score_ci_low"
+        score_ci_high = "score_ci_high"
+        mttr_ci_low = "mttr_ci_low"
+        mttr_ci_high = "mttr_ci_high"
+        confidence = "confidence"
+        k = "k"
+        pass_at_1 = "pass_at_1"
+        pass_at_k = "pass_at_k"
+        scenarios = "scenarios"
+
+        timedeltas = [mttr, ttr_p50, ttr_p90, ttr_p99, mttr_ci_low, mttr_ci_high]
 
     @classmethod
-    def to_dataframe(cls, results: List["BenchmarkResult"], exclude=[]) -> DataFrame:
+    def to_dataframe(cls, results: List["BenchmarkResult"], exclude=[]) -> "DataFrame":
+        import pandas as pd
+
         if len(results) > 0:
-            _results = [{k: v for k, v in x.model_dump().items() if not k in exclude} for x in results]
+            _results = build_dataframe(type(results[0]), results, exclude=exclude)
         else:
             _results = pd.DataFrame(
                 {
@@ -78,9 +154,22 @@ class BenchmarkResult(BaseModel):
                     cls.Column.num_of_passed: pd.Series(dtype="float"),
                     cls.Column.score: pd.Series(dtype="float"),
                     cls.Column.date: pd.Series(dtype="datetime64[ns]"),
+                    cls.Column.ttr_p50: pd.Series(dtype="timedelta64[ns]"),
+                    cls.Column.ttr_p90: pd.Series(dtype="timedelta64[ns]"),
+                    cls.Column.ttr_p99: pd.Series(dtype="timedelta64[ns]"),
+                    cls.Column.score_ci_low: pd.Series(dtype="float"),
+                    cls.Column.score_ci_high: pd.Series(dtype="float"),
+                    cls.Column.mttr_ci_low: pd.Series(dtype="timedelta64[ns]"),
+                    cls.Column.mttr_ci_high: pd.Series(dtype="timedelta64[ns]"),
+                    cls.Column.confidence: pd.Series(dtype="float"),
+                    cls.Column.k: pd.Series(dtype="float"),
+                    cls.Column.pass_at_1: pd.Series(dtype="float"),
+                    cls.Column.pass_at_k: pd.Series(dtype="float"),
+                    cls.Column.scenarios: pd.Series(dtype="object"),
                 }
             )
-        return DataFrame(_results)
+        return pd.DataFrame(_results)
+
 
 class GlobalBenchmarkResult(BenchmarkResult):
-    github_username: Optional[str] = Field(None, description="Github username")
\ No newline at end of file
+    github_username: Optional[str] = Field(None, description="Github username")
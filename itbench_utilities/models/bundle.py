@@ -12,18 +12,71 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import typing
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type
 
-import pandas as pd
-from pandas import DataFrame
 from pydantic import BaseModel, Field
 
 from itbench_utilities.app.models.base import Env
 from itbench_utilities.app.models.bundle import MakeTargetMapping
+from itbench_utilities.common.blob_store import DEFAULT_BLOB_THRESHOLD, BlobStore, offload_text
 from itbench_utilities.models.status import Condition
 
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+def unwrap_optional(annotation: Any) -> Tuple[Any, bool]:
+    args = typing.get_args(annotation)
+    if typing.get_origin(annotation) is typing.Union and type(None) in args:
+        rest = [x for x in args if x is not type(None)]
+        return (rest[0] if len(rest) == 1 else annotation), True
+    return annotation, False
+
+
+def is_model_annotation(annotation: Any) -> bool:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return True
+    return any(is_model_annotation(x) for x in typing.get_args(annotation))
+
+
+def dump_value(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, list):
+        return [dump_value(x) for x in value]
+    return value
+
+
+def build_dataframe(model_cls: Type[BaseModel], results: List[BaseModel], exclude: List[str] = []) -> "DataFrame":
+    # Column-oriented equivalent of DataFrame([x.model_dump() for x in results]) that reads each field once per row
+    # and never serializes excluded fields.
+    import numpy as np
+    import pandas as pd
+
+    n = len(results)
+    columns: Dict[str, Any] = {}
+    for name, field in model_cls.model_fields.items():
+        if name in exclude:
+            continue
+        values = [getattr(x, name) for x in results]
+        annotation, optional = unwrap_optional(field.annotation)
+        if optional and n > 0 and all(x is None for x in values):
+            columns[name] = values
+        elif annotation is bool and not optional:
+            columns[name] = np.fromiter(values, dtype=bool, count=n)
+        elif annotation is timedelta:
+            columns[name] = np.array(values, dtype="timedelta64[us]").astype("timedelta64[ns]")
+        elif annotation is datetime:
+            columns[name] = pd.Series(values, dtype=object).infer_objects() if n > 0 else pd.Series(values, dtype="datetime64[ns]")
+        elif is_model_annotation(annotation):
+            columns[name] = [dump_value(x) for x in values]
+        else:
+            columns[name] = values
+    return pd.DataFrame(columns)
+
 
 class BundleCondition(Condition):
     lastProbeTime: Optional[datetime] = Field(default=None, description="The last time the condition was probed.")
@@ -93,6 +146,11 @@ class BundleResult(BundleInfo):
     message: Optional[str] = Field(None, description="Any message.")
     date: datetime = Field(..., description="The date and time when the benchmark was performed.")
     benchmark_id: Optional[str] = Field(None, description="Denchmark id")
+    trial: Optional[int] = Field(None, description="The 0-based index of the trial when a scenario is repeated.")
+    message_ref: Optional[str] = Field(
+        None, description="Digest reference of the full message in the blob store when it is too large to keep inline."
+    )
+    report_ref: Optional[str] = Field(None, description="Digest reference of the evaluation report in the blob store.")
 
     class Column:
         agent = "agent"
@@ -105,11 +163,28 @@ class BundleResult(BundleInfo):
         message = "message"
         date = "date"
         benchmark_id = "benchmark_id"
+        trial = "trial"
+        message_ref = "message_ref"
+        report_ref = "report_ref"
+
+    def offload(self, store: BlobStore, report: Optional[str] = None, threshold: int = DEFAULT_BLOB_THRESHOLD):
+        if self.message_ref is None:
+            self.message, self.message_ref = offload_text(store, self.message, threshold)
+        if report:
+            self.report_ref = store.put(report)
+
+    def load_message(self, store: BlobStore) -> Optional[str]:
+        return store.get(self.message_ref) if self.message_ref else self.message
+
+    def load_report(self, store: BlobStore) -> Optional[str]:
+        return store.get(self.report_ref) if self.report_ref else None
 
     @classmethod
-    def to_dataframe(cls, results: List["BundleResult"]) -> DataFrame:
+    def to_dataframe(cls, results: List["BundleResult"]) -> "DataFrame":
+        import pandas as pd
+
         if len(results) > 0:
-            _results = [x.model_dump() for x in results]
+            _results = build_dataframe(type(results[0]), results)
         else:
             _results = pd.DataFrame(
                 {
@@ -123,6 +198,9 @@ class BundleResult(BundleInfo):
                     cls.Column.message: pd.Series(dtype="str"),
                     cls.Column.date: pd.Series(dtype="datetime64[ns]"),
                     cls.Column.benchmark_id: pd.Series(dtype="str"),
+                    cls.Column.trial: pd.Series(dtype="object"),
+                    cls.Column.message_ref: pd.Series(dtype="str"),
+                    cls.Column.report_ref: pd.Series(dtype="str"),
                 }
             )
-        return DataFrame(_results)
+        return pd.DataFrame(_results)
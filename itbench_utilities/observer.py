@@ -1,13 +1,31 @@
+import atexit
+import fnmatch
 import json
 import logging
+import os
+import queue
+import threading
+import time
 from datetime import date, datetime
+from enum import Enum
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from pydantic import BaseModel
 
 from itbench_utilities.app.utils import get_timestamp
 
+DEFAULT_DISPATCH_MODE = os.getenv("OBSERVER_DISPATCH_MODE", "sync")
+DEFAULT_QUEUE_SIZE = int(os.getenv("OBSERVER_QUEUE_SIZE", "10000"))
+DEFAULT_FULL_POLICY = os.getenv("OBSERVER_FULL_POLICY", "drop")
+DEFAULT_LATE_THRESHOLD = float(os.getenv("OBSERVER_LATE_THRESHOLD", "1.0"))
+# Events written by the JSON logging callbacks. Set to "*" to log every event, including make output and environments.
+DEFAULT_LOGGED_EVENTS = [
+    x.strip()
+    for x in os.getenv("OBSERVER_LOGGED_EVENTS", "benchmark_per_bundle:,bundle:phase,invoke_bundle:run_process:error").split(",")
+    if x.strip()
+]
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,21 +35,169 @@ class EventData(BaseModel):
     data: Dict[str, Any]
 
 
-class Observer:
-    def __init__(self):
-        self.callbacks = []
+class DispatchMode(str, Enum):
+    Sync = "sync"
+    Async = "async"
+
+
+class QueueFullPolicy(str, Enum):
+    Drop = "drop"
+    Block = "block"
+
+
+class ObserverStats(BaseModel):
+    dispatched: int = 0
+    dropped: int = 0
+    late: int = 0
+
+
+Payload = Union[Dict[str, Any], Callable[[], Dict[str, Any]]]
+
+_STOP = object()
 
-    def register(self, callback: Callable[[EventData], None]):
-        self.callbacks.append(callback)
 
-    def notify(self, event: str, data: Dict[str, Any]):
-        for callback in self.callbacks:
+class Subscription:
+    def __init__(self, callback: Callable[[EventData], None], events: Optional[List[str]] = None):
+        self.callback = callback
+        self.events = events
+
+    def matches(self, event: str) -> bool:
+        if not self.events:
+            return True
+        for pattern in self.events:
+            if any(x in pattern for x in "*?["):
+                if fnmatch.fnmatchcase(event, pattern):
+                    return True
+            elif event.startswith(pattern):
+                return True
+        return False
+
+
+def resolve_payload(data: Payload) -> Dict[str, Any]:
+    if callable(data):
+        data = data()
+    return {k: v() if callable(v) else v for k, v in data.items()}
+
+
+class Observer:
+    def __init__(
+        self,
+        mode: DispatchMode = DispatchMode.Sync,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        full_policy: QueueFullPolicy = QueueFullPolicy.Drop,
+        late_threshold: float = DEFAULT_LATE_THRESHOLD,
+    ):
+        self.subscriptions: List[Subscription] = []
+        self.matched: Dict[str, Tuple[Callable[[EventData], None], ...]] = {}
+        self.mode = DispatchMode(mode)
+        self.full_policy = QueueFullPolicy(full_policy)
+        self.late_threshold = late_threshold
+        self.stats = ObserverStats()
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.dispatcher: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.closed = False
+
+    @property
+    def callbacks(self) -> List[Callable[[EventData], None]]:
+        return [x.callback for x in self.subscriptions]
+
+    def register(self, callback: Callable[[EventData], None], events: Optional[List[str]] = None):
+        """Subscribe to events matching any of `events`: a glob (e.g. 'invoke_bundle:*:end') or a prefix. All events if None."""
+        with self.lock:
+            self.subscriptions.append(Subscription(callback, events))
+            self.matched = {}
+
+    def unregister(self, callback: Callable[[EventData], None]):
+        with self.lock:
+            self.subscriptions = [x for x in self.subscriptions if x.callback != callback]
+            self.matched = {}
+
+    def get_callbacks(self, event: str) -> Tuple[Callable[[EventData], None], ...]:
+        callbacks = self.matched.get(event)
+        if callbacks is None:
+            callbacks = tuple(x.callback for x in self.subscriptions if x.matches(event))
+            self.matched[event] = callbacks
+        return callbacks
+
+    def has_subscribers(self, event: str) -> bool:
+        return len(self.get_callbacks(event)) > 0
+
+    def notify(self, event: str, data: Payload):
+        """`data`, or any of its values, may be a zero-argument callable evaluated only when a subscriber exists."""
+        if not self.has_subscribers(event):
+            return
+        if self.mode == DispatchMode.Async and not self.closed:
+            self.enqueue(event, data)
+        else:
+            self.dispatch(event, data, get_timestamp())
+
+    def dispatch(self, event: str, data: Payload, timestamp: datetime):
+        callbacks = self.get_callbacks(event)
+        try:
+            event_data = EventData.model_construct(event=event, data=resolve_payload(data), timestamp=timestamp)
+        except Exception as e:
+            logger.warning(f"Failed to build payload for event {event}: {e}")
+            return
+        for callback in callbacks:
             try:
-                event_data = EventData(event=event, data=data, timestamp=get_timestamp())
                 callback(event_data)
             except Exception as e:
                 logger.warning(f"Callback {callback.__name__} failed with exception for evant {event}: {e}")
 
+    def enqueue(self, event: str, data: Payload):
+        self.start()
+        item = (event, data, get_timestamp(), time.monotonic())
+        if self.full_policy == QueueFullPolicy.Block:
+            self.queue.put(item)
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.stats.dropped += 1
+
+    def start(self):
+        if self.dispatcher and self.dispatcher.is_alive():
+            return
+        with self.lock:
+            if self.dispatcher and self.dispatcher.is_alive():
+                return
+            self.dispatcher = threading.Thread(target=self.run_dispatcher, name="observer-dispatcher", daemon=True)
+            self.dispatcher.start()
+            atexit.register(self.close)
+
+    def run_dispatcher(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                event, data, timestamp, enqueued_at = item
+                if time.monotonic() - enqueued_at > self.late_threshold:
+                    with self.lock:
+                        self.stats.late += 1
+                self.dispatch(event, data, timestamp)
+                with self.lock:
+                    self.stats.dispatched += 1
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        if self.dispatcher and self.dispatcher.is_alive():
+            self.queue.join()
+
+    def close(self, timeout: Optional[float] = None):
+        if self.closed:
+            return
+        self.closed = True
+        atexit.unregister(self.close)
+        if self.dispatcher and self.dispatcher.is_alive():
+            self.queue.put(_STOP)
+            self.dispatcher.join(timeout)
+        if self.stats.dropped > 0 or self.stats.late > 0:
+            logger.warning(f"Observer closed: {self.stats.dropped} events were dropped and {self.stats.late} events were delivered late.")
+
 
 def custom_serializer(obj):
     if isinstance(obj, BaseModel):
@@ -51,5 +217,5 @@ def gen_json_logging_callback(logger: logging.Logger) -> Callable[[EventData], N
     return json_logging
 
 
-DEFAULT_OBSERVER = Observer()
-DEFAULT_OBSERVER.register(gen_json_logging_callback(logger))
+DEFAULT_OBSERVER = Observer(mode=DEFAULT_DISPATCH_MODE, full_policy=DEFAULT_FULL_POLICY)
+DEFAULT_OBSERVER.register(gen_json_logging_callback(logger), events=DEFAULT_LOGGED_EVENTS)
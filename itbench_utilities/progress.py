@@ -0,0 +1,197 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import html
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from pydantic import BaseModel, Field
+from tabulate import tabulate
+
+from itbench_utilities.app.models.base import BundlePhaseEnum
+from itbench_utilities.observer import EventData
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_HTML_FILE_NAME = "progress.html"
+PROGRESS_HISTORY_FILE_NAME = "progress-history.json"
+PROGRESS_EVENTS = ["bundle:phase", "benchmark_per_bundle:"]
+DEFAULT_REFRESH_INTERVAL = float(os.getenv("PROGRESS_REFRESH_INTERVAL", "5"))
+HISTORY_SMOOTHING = 0.3
+
+RowKey = Tuple[str, str]
+
+
+class ProgressRow(BaseModel):
+    agent: str = Field(..., description="The name of the agent.")
+    bundle: str = Field(..., description="The name of the bundle.")
+    phase: str = Field(BundlePhaseEnum.NotStarted.value, description="The last bundle phase reported.")
+    started_at: Optional[float] = Field(None, description="Monotonic time when the scenario started.")
+    finished_at: Optional[float] = Field(None, description="Monotonic time when the scenario finished.")
+    passed: Optional[bool] = Field(None, description="Whether the scenario passed. None until it finishes.")
+    errored: Optional[bool] = Field(None, description="Whether the scenario errored. None until it finishes.")
+
+    def elapsed(self, now: float) -> float:
+        if self.started_at is None:
+            return 0
+        return (self.finished_at if self.finished_at is not None else now) - self.started_at
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def load_history(path: Path) -> Dict[str, float]:
+    try:
+        with path.open("r") as f:
+            return {k: float(v) for k, v in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Ignore unreadable progress history {path.as_posix()}: {e}")
+        return {}
+
+
+class ProgressReporter:
+
+    def __init__(
+        self,
+        scenarios: List[RowKey],
+        html_path: Optional[Path] = None,
+        history_path: Optional[Path] = None,
+        stream: Optional[TextIO] = sys.stderr,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ) -> None:
+        self.rows: Dict[RowKey, ProgressRow] = {(a, b): ProgressRow(agent=a, bundle=b) for a, b in scenarios}
+        self.html_path = Path(html_path) if html_path else None
+        self.history_path = Path(history_path) if history_path else None
+        self.history = load_history(self.history_path) if self.history_path else {}
+        self.stream = stream
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.last_render = 0.0
+
+    def __call__(self, event_data: EventData):
+        data = event_data.data
+        agent_info, bundle = data.get("agent_info"), data.get("bundle")
+        if agent_info is None or bundle is None:
+            return
+        key = (agent_info.name, bundle.name)
+        now = time.monotonic()
+        force = False
+        with self.lock:
+            row = self.rows.setdefault(key, ProgressRow(agent=key[0], bundle=key[1]))
+            if event_data.event == "benchmark_per_bundle:start":
+                row.started_at, row.finished_at, row.passed, row.errored = now, None, None, None
+            elif event_data.event == "bundle:phase":
+                row.phase = BundlePhaseEnum(data["phase"]).value
+            elif event_data.event == "benchmark_per_bundle:end":
+                row.finished_at = now
+                bundle_result = data.get("bundle_result")
+                if bundle_result is not None:
+                    row.passed, row.errored = bundle_result.passed, bundle_result.errored
+                self.update_history(bundle.name, row.elapsed(now))
+                force = True
+        self.refresh(force=force)
+
+    def update_history(self, bundle_name: str, duration: float):
+        previous = self.history.get(bundle_name)
+        self.history[bundle_name] = duration if previous is None else (1 - HISTORY_SMOOTHING) * previous + HISTORY_SMOOTHING * duration
+
+    def eta(self, row: ProgressRow, now: float) -> Optional[float]:
+        if row.finished_at is not None:
+            return 0
+        expected = self.history.get(row.bundle)
+        if expected is None:
+            return None
+        return max(0, expected - row.elapsed(now))
+
+    def snapshot(self) -> Tuple[List[List[str]], str]:
+        now = time.monotonic()
+        table = []
+        total_eta, unknown = 0.0, 0
+        with self.lock:
+            rows = list(self.rows.values())
+            for row in rows:
+                eta = self.eta(row, now)
+                if eta is None:
+                    unknown += 1
+                else:
+                    total_eta += eta
+                if row.finished_at is None:
+                    result = "-"
+                else:
+                    result = "error" if row.errored else ("pass" if row.passed else "fail")
+                table.append([row.agent, row.bundle, row.phase, format_duration(row.elapsed(now)), format_duration(eta), result])
+        finished = [x for x in rows if x.finished_at is not None]
+        passed = len([x for x in finished if x.passed])
+        summary = f"{len(finished)}/{len(rows)} finished, {passed} passed, ETA {format_duration(total_eta)}"
+        if unknown > 0:
+            summary += f" (+{unknown} without history)"
+        return table, summary
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.last_render < self.refresh_interval:
+            return
+        self.last_render = now
+        try:
+            self.render()
+        except Exception as e:
+            logger.warning(f"Failed to render progress: {e}")
+
+    def render(self):
+        table, summary = self.snapshot()
+        headers = ["Agent", "Bundle", "Phase", "Elapsed", "ETA", "Result"]
+        if self.stream:
+            self.stream.write(f"{tabulate(table, headers=headers)}\n{summary}\n")
+            self.stream.flush()
+        if self.html_path:
+            self.write_html(headers, table, summary)
+
+    def write_html(self, headers: List[str], table: List[List[str]], summary: str):
+        head = "".join(f"<th>{html.escape(x)}</th>" for x in headers)
+        body = "".join("<tr>" + "".join(f"<td class='{html.escape(x)}'>{html.escape(x)}</td>" for x in row) + "</tr>" for row in table)
+        content = (
+            "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            f"<meta http-equiv='refresh' content='{max(1, int(self.refresh_interval))}'>"
+            "<title>ITBench progress</title><style>"
+            "body{font-family:sans-serif}table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:2px 8px}"
+            ".pass{background:#dfd}.fail{background:#fdd}.error{background:#fbb}"
+            "</style></head><body>"
+            f"<p>{html.escape(summary)}</p><table><tr>{head}</tr>{body}</table></body></html>"
+        )
+        self.html_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.html_path.with_name(self.html_path.name + ".tmp")
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, self.html_path)
+
+    def close(self):
+        self.refresh(force=True)
+        if self.history_path:
+            try:
+                self.history_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.history_path.open("w") as f:
+                    json.dump(self.history, f, indent=2)
+            except Exception as e:
+                logger.warning(f"Failed to write progress history {self.history_path.as_posix()}: {e}")
@@ -0,0 +1,290 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import math
+import statistics
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+from tabulate import tabulate
+
+from itbench_utilities.benchmark import PHASES_FILE_NAME
+from itbench_utilities.leaderboard import BUNDLE_RESULTS_FILE_NAME, iter_records
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALPHA = 0.05
+# Below this number of non-zero differences the Wilcoxon p-value is computed from the exact null distribution.
+WILCOXON_EXACT_MAX_N = 20
+
+
+class StatisticalTest(BaseModel):
+    name: str = Field(..., description="The name of the test.")
+    n: int = Field(..., description="The number of informative pairs used by the test.")
+    statistic: float = Field(..., description="The test statistic.")
+    p_value: float = Field(..., description="One-sided p-value for the candidate being worse than the baseline.")
+    significant: bool = Field(..., description="True if p_value is below alpha.")
+
+
+class ScenarioComparison(BaseModel):
+    name: str = Field(..., description="The name of the scenario.")
+    baseline_ttr: Optional[float] = Field(None, description="Mean TTR in seconds of the non-errored baseline trials.")
+    candidate_ttr: Optional[float] = Field(None, description="Mean TTR in seconds of the non-errored candidate trials.")
+    ttr_delta: Optional[float] = Field(None, description="candidate_ttr - baseline_ttr in seconds.")
+    baseline_pass_rate: float = Field(..., description="The ratio of passed baseline trials.")
+    candidate_pass_rate: float = Field(..., description="The ratio of passed candidate trials.")
+    phase_deltas: Dict[str, float] = Field({}, description="Per-phase duration deltas in seconds (candidate - baseline).")
+
+
+class PhaseComparison(BaseModel):
+    phase: str = Field(..., description="The name of the phase.")
+    baseline_mean: float = Field(..., description="Mean duration in seconds over paired scenarios in the baseline.")
+    candidate_mean: float = Field(..., description="Mean duration in seconds over paired scenarios in the candidate.")
+    delta: float = Field(..., description="candidate_mean - baseline_mean in seconds.")
+    test: StatisticalTest = Field(..., description="Wilcoxon signed-rank test of the paired durations.")
+
+
+class ComparisonReport(BaseModel):
+    baseline: str = Field(..., description="The baseline run.")
+    candidate: str = Field(..., description="The candidate run.")
+    alpha: float = Field(..., description="Significance level.")
+    scenarios: List[ScenarioComparison] = Field(..., description="Scenarios present in both runs.")
+    unpaired: List[str] = Field([], description="Scenarios present in only one of the runs.")
+    ttr_test: StatisticalTest = Field(..., description="Wilcoxon signed-rank test of paired TTR.")
+    ttr_sign_test: StatisticalTest = Field(..., description="Exact sign test of paired TTR.")
+    pass_rate_test: StatisticalTest = Field(
+        ..., description="Exact McNemar test of pass/fail outcomes of trials paired by index within each scenario."
+    )
+    phases: List[PhaseComparison] = Field([], description="Per-phase duration comparisons.")
+    regressions: List[str] = Field([], description="Significant regressions: 'ttr', 'pass_rate' or 'phase:<name>'.")
+    regressed: bool = Field(False, description="True if any regression was detected.")
+
+
+def binomial_sf(k: int, n: int) -> float:
+    # P(X >= k) for X ~ Binomial(n, 0.5)
+    if k <= 0:
+        return 1.0
+    return sum(math.comb(n, i) for i in range(k, n + 1)) / 2**n
+
+
+def sign_test(diffs: List[float], alpha: float = DEFAULT_ALPHA) -> StatisticalTest:
+    nonzero = [x for x in diffs if x != 0]
+    positives = len([x for x in nonzero if x > 0])
+    p_value = binomial_sf(positives, len(nonzero))
+    return StatisticalTest(name="sign", n=len(nonzero), statistic=positives, p_value=p_value, significant=p_value < alpha)
+
+
+def mcnemar_test(pairs: List[Tuple[bool, bool]], alpha: float = DEFAULT_ALPHA) -> StatisticalTest:
+    # Exact (binomial) McNemar test on discordant pairs; a regression is a scenario that passed in the baseline and failed in the candidate.
+    regressed = len([1 for b, c in pairs if b and not c])
+    improved = len([1 for b, c in pairs if not b and c])
+    p_value = binomial_sf(regressed, regressed + improved)
+    return StatisticalTest(name="mcnemar", n=regressed + improved, statistic=regressed, p_value=p_value, significant=p_value < alpha)
+
+
+def wilcoxon_exact_sf(ranks: List[float], w_plus: float) -> float:
+    # P(W+ >= w_plus) under the null hypothesis, where each rank is positive with probability 0.5.
+    # Average ranks of ties are multiples of 0.5, so the sums are counted over doubled ranks.
+    counts = {0: 1}
+    for rank in ranks:
+        step = round(rank * 2)
+        shifted = {}
+        for total, count in counts.items():
+            shifted[total + step] = shifted.get(total + step, 0) + count
+        for total, count in shifted.items():
+            counts[total] = counts.get(total, 0) + count
+    threshold = round(w_plus * 2)
+    return sum(count for total, count in counts.items() if total >= threshold) / 2 ** len(ranks)
+
+
+def wilcoxon_test(diffs: List[float], alpha: float = DEFAULT_ALPHA) -> StatisticalTest:
+    # Signed-rank test with average ranks for ties. Small samples use the exact null distribution,
+    # larger ones the normal approximation with tie and continuity corrections.
+    nonzero = sorted((x for x in diffs if x != 0), key=abs)
+    n = len(nonzero)
+    if n == 0:
+        return StatisticalTest(name="wilcoxon", n=0, statistic=0, p_value=1.0, significant=False)
+    ranks: List[float] = [0.0] * n
+    tie_correction = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and abs(nonzero[j + 1]) == abs(nonzero[i]):
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        tie_correction += t**3 - t
+        i = j + 1
+    w_plus = sum(r for r, x in zip(ranks, nonzero) if x > 0)
+    if n < WILCOXON_EXACT_MAX_N:
+        p_value = wilcoxon_exact_sf(ranks, w_plus)
+        return StatisticalTest(name="wilcoxon", n=n, statistic=w_plus, p_value=p_value, significant=p_value < alpha)
+    mean = n * (n + 1) / 4
+    variance = n * (n + 1) * (2 * n + 1) / 24 - tie_correction / 48
+    if variance <= 0:
+        p_value = 1.0
+    else:
+        z = (w_plus - mean - 0.5) / math.sqrt(variance)
+        p_value = 0.5 * math.erfc(z / math.sqrt(2))
+    return StatisticalTest(name="wilcoxon", n=n, statistic=w_plus, p_value=p_value, significant=p_value < alpha)
+
+
+class RunSummary:
+
+    def __init__(self, run_dir: Path, agent: Optional[str] = None) -> None:
+        self.run_dir = Path(run_dir)
+        self.ttrs: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, List[bool]] = defaultdict(list)
+        trials: Dict[str, List[Tuple[int, bool]]] = defaultdict(list)
+        self.phases: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+        agents_by_name: Dict[str, set] = defaultdict(set)
+        for record in iter_records(self.run_dir / BUNDLE_RESULTS_FILE_NAME):
+            if agent and record["agent"] != agent:
+                continue
+            name = record["name"]
+            trials[name].append((record.get("trial") or 0, bool(record.get("passed"))))
+            if not record.get("errored") and record.get("ttr") is not None:
+                self.ttrs[name].append(float(record["ttr"]))
+            agents_by_name[name].add(record["agent"])
+        # Outcomes are ordered by trial so that the trials of two runs can be paired by index.
+        for name, outcomes in trials.items():
+            self.outcomes[name] = [x[1] for x in sorted(outcomes, key=lambda x: x[0])]
+        for name, agents in agents_by_name.items():
+            for _agent in agents:
+                scenario_dir = self.run_dir / _agent / name
+                # Repeated trials write their phases under trial-<n>/.
+                for path in [scenario_dir / PHASES_FILE_NAME] + sorted(scenario_dir.glob(f"trial-*/{PHASES_FILE_NAME}")):
+                    if path.exists():
+                        with path.open("r") as f:
+                            for phase, duration in json.load(f).items():
+                                self.phases[name][phase].append(duration)
+
+    def mean_ttr(self, name: str) -> Optional[float]:
+        return statistics.fmean(self.ttrs[name]) if self.ttrs.get(name) else None
+
+    def pass_rate(self, name: str) -> float:
+        return statistics.fmean(self.outcomes[name]) if self.outcomes.get(name) else 0
+
+    def mean_phases(self, name: str) -> Dict[str, float]:
+        return {phase: statistics.fmean(x) for phase, x in self.phases.get(name, {}).items()}
+
+
+def compare_runs(
+    baseline_dir: Path,
+    candidate_dir: Path,
+    baseline_agent: Optional[str] = None,
+    candidate_agent: Optional[str] = None,
+    alpha: float = DEFAULT_ALPHA,
+) -> ComparisonReport:
+    baseline = RunSummary(baseline_dir, baseline_agent)
+    candidate = RunSummary(candidate_dir, candidate_agent)
+    names = [x for x in baseline.outcomes if x in candidate.outcomes]
+    unpaired = sorted(set(baseline.outcomes) ^ set(candidate.outcomes))
+
+    scenarios: List[ScenarioComparison] = []
+    ttr_diffs: List[float] = []
+    outcome_pairs: List[Tuple[bool, bool]] = []
+    phase_pairs: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+    for name in names:
+        baseline_ttr, candidate_ttr = baseline.mean_ttr(name), candidate.mean_ttr(name)
+        ttr_delta = candidate_ttr - baseline_ttr if baseline_ttr is not None and candidate_ttr is not None else None
+        if ttr_delta is not None:
+            ttr_diffs.append(ttr_delta)
+        baseline_pass_rate, candidate_pass_rate = baseline.pass_rate(name), candidate.pass_rate(name)
+        # Trials are paired by index; trials without a counterpart in the other run are not used by the test.
+        outcome_pairs.extend(zip(baseline.outcomes[name], candidate.outcomes[name]))
+        baseline_phases, candidate_phases = baseline.mean_phases(name), candidate.mean_phases(name)
+        phase_deltas = {}
+        for phase in baseline_phases.keys() & candidate_phases.keys():
+            phase_deltas[phase] = candidate_phases[phase] - baseline_phases[phase]
+            phase_pairs[phase].append((baseline_phases[phase], candidate_phases[phase]))
+        scenarios.append(
+            ScenarioComparison(
+                name=name,
+                baseline_ttr=baseline_ttr,
+                candidate_ttr=candidate_ttr,
+                ttr_delta=ttr_delta,
+                baseline_pass_rate=baseline_pass_rate,
+                candidate_pass_rate=candidate_pass_rate,
+                phase_deltas=phase_deltas,
+            )
+        )
+
+    phases = []
+    for phase, pairs in sorted(phase_pairs.items()):
+        baseline_mean = statistics.fmean(x[0] for x in pairs)
+        candidate_mean = statistics.fmean(x[1] for x in pairs)
+        phases.append(
+            PhaseComparison(
+                phase=phase,
+                baseline_mean=baseline_mean,
+                candidate_mean=candidate_mean,
+                delta=candidate_mean - baseline_mean,
+                test=wilcoxon_test([c - b for b, c in pairs], alpha),
+            )
+        )
+
+    report = ComparisonReport(
+        baseline=Path(baseline_dir).as_posix(),
+        candidate=Path(candidate_dir).as_posix(),
+        alpha=alpha,
+        scenarios=scenarios,
+        unpaired=unpaired,
+        ttr_test=wilcoxon_test(ttr_diffs, alpha),
+        ttr_sign_test=sign_test(ttr_diffs, alpha),
+        pass_rate_test=mcnemar_test(outcome_pairs, alpha),
+        phases=phases,
+    )
+    if report.ttr_test.significant:
+        report.regressions.append("ttr")
+    if report.pass_rate_test.significant:
+        report.regressions.append("pass_rate")
+    report.regressions.extend(f"phase:{x.phase}" for x in phases if x.test.significant)
+    report.regressed = len(report.regressions) > 0
+    return report
+
+
+def to_summary_table(report: ComparisonReport) -> str:
+    rows = [[x.name, x.baseline_ttr, x.candidate_ttr, x.ttr_delta, x.baseline_pass_rate * 100, x.candidate_pass_rate * 100] for x in report.scenarios]
+    headers = ["scenario", "baseline ttr", "candidate ttr", "ttr delta", "baseline pass (%)", "candidate pass (%)"]
+    return tabulate(rows, headers=headers, tablefmt="pipe")
+
+
+def run(args):
+    reports = [
+        compare_runs(
+            Path(args.baseline),
+            Path(x),
+            baseline_agent=args.baseline_agent,
+            candidate_agent=args.candidate_agent,
+            alpha=args.alpha if args.alpha is not None else DEFAULT_ALPHA,
+        )
+        for x in args.candidate
+    ]
+    for report in reports:
+        print(f"{report.baseline} -> {report.candidate}")
+        print(to_summary_table(report))
+        print(f"regressions: {', '.join(report.regressions) if report.regressions else 'none'}")
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with Path(args.out).open("w") as f:
+            f.write(json.dumps([x.model_dump(mode="json") for x in reports], indent=2))
+    if args.fail_on_regression and any(x.regressed for x in reports):
+        sys.exit(1)
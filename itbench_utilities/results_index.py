@@ -0,0 +1,197 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from tabulate import tabulate
+
+from itbench_utilities.leaderboard import find_result_files, iter_records
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.getenv("RESULTS_INDEX_PATH", "results_index.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    file_path TEXT NOT NULL,
+    benchmark_id TEXT,
+    agent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    incident_type TEXT,
+    passed INTEGER NOT NULL,
+    errored INTEGER NOT NULL,
+    ttr REAL,
+    date TEXT NOT NULL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS results_agent ON results (agent, incident_type, date);
+CREATE INDEX IF NOT EXISTS results_name ON results (name, date);
+CREATE INDEX IF NOT EXISTS results_benchmark_id ON results (benchmark_id);
+CREATE INDEX IF NOT EXISTS results_file_path ON results (file_path);
+"""
+
+RESULT_COLUMNS = ["benchmark_id", "agent", "name", "incident_type", "passed", "errored", "ttr", "date", "message"]
+
+
+def normalize_date(value: str) -> str:
+    # Store UTC ISO strings so that date ranges can be compared lexically (and use the index).
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def to_bound(value: Optional[str], end: bool = False) -> Optional[str]:
+    if not value:
+        return None
+    if len(value) == 10:
+        # A plain day: the end bound includes the whole day.
+        day = date.fromisoformat(value) + timedelta(days=1 if end else 0)
+        return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).isoformat()
+    return normalize_date(value)
+
+
+class ResultsIndex:
+
+    def __init__(self, path: Path = Path(DEFAULT_INDEX_PATH)) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path.as_posix())
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, paths: List[Path]) -> Tuple[int, int]:
+        """Index new or modified bundle_results.jsonl files under `paths`. Returns the number of (re)indexed and removed files."""
+        indexed, removed = 0, 0
+        known = {row[0]: (row[1], row[2]) for row in self.connection.execute("SELECT path, mtime, size FROM files")}
+        found = set()
+        for path in find_result_files(paths):
+            key = path.resolve().as_posix()
+            found.add(key)
+            stat = path.stat()
+            if known.get(key) == (stat.st_mtime, stat.st_size):
+                continue
+            with self.connection:
+                self.connection.execute("DELETE FROM results WHERE file_path = ?", (key,))
+                self.connection.executemany(
+                    f"INSERT INTO results (file_path, {', '.join(RESULT_COLUMNS)}) VALUES (?{', ?' * len(RESULT_COLUMNS)})",
+                    (self.to_row(key, x) for x in iter_records(path)),
+                )
+                self.connection.execute("INSERT OR REPLACE INTO files (path, mtime, size) VALUES (?, ?, ?)", (key, stat.st_mtime, stat.st_size))
+            indexed += 1
+        roots = [Path(x).resolve().as_posix() for x in paths]
+        for key in known.keys() - found:
+            if any(key.startswith(x) for x in roots) and not Path(key).exists():
+                with self.connection:
+                    self.connection.execute("DELETE FROM results WHERE file_path = ?", (key,))
+                    self.connection.execute("DELETE FROM files WHERE path = ?", (key,))
+                removed += 1
+        logger.info(f"Indexed {indexed} result files and removed {removed} in {self.path.as_posix()}")
+        return indexed, removed
+
+    def to_row(self, file_path: str, record: Dict[str, Any]) -> Tuple:
+        return (
+            file_path,
+            record.get("benchmark_id"),
+            record["agent"],
+            record["name"],
+            record.get("incident_type"),
+            1 if record.get("passed") else 0,
+            1 if record.get("errored") else 0,
+            record.get("ttr"),
+            normalize_date(record["date"]),
+            record.get("message"),
+        )
+
+    def build_where(
+        self,
+        agents: Optional[List[str]] = None,
+        incident_types: Optional[List[str]] = None,
+        names: Optional[List[str]] = None,
+        benchmark_ids: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for column, values in [("agent", agents), ("incident_type", incident_types), ("name", names), ("benchmark_id", benchmark_ids)]:
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if since:
+            clauses.append("date >= ?")
+            params.append(to_bound(since))
+        if until:
+            clauses.append("date < ?" if len(until) == 10 else "date <= ?")
+            params.append(to_bound(until, end=True))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        where, params = self.build_where(**filters)
+        sql = f"SELECT {', '.join(RESULT_COLUMNS)} FROM results{where} ORDER BY date DESC, agent, name"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        cursor = self.connection.execute(sql, params)
+        return [dict(zip(RESULT_COLUMNS, row)) for row in cursor]
+
+    def summarize(self, **filters) -> List[Dict[str, Any]]:
+        where, params = self.build_where(**filters)
+        sql = (
+            "SELECT agent, incident_type, COUNT(*), SUM(passed), SUM(1 - errored), AVG(ttr), MAX(date)"
+            f" FROM results{where} GROUP BY agent, incident_type ORDER BY agent, incident_type"
+        )
+        summary = []
+        for agent, incident_type, count, passed, non_errored, mttr, latest in self.connection.execute(sql, params):
+            summary.append(
+                {
+                    "agent": agent,
+                    "incident_type": incident_type,
+                    "results": count,
+                    "passed": passed,
+                    "pass rate (%)": passed / non_errored * 100 if non_errored else 0,
+                    "mttr": mttr,
+                    "date": latest,
+                }
+            )
+        return summary
+
+
+def run(args):
+    index = ResultsIndex(Path(args.index or DEFAULT_INDEX_PATH))
+    try:
+        if args.input:
+            index.update([Path(x) for x in args.input])
+        filters = {
+            "agents": args.agent,
+            "incident_types": args.incident_type,
+            "names": args.name,
+            "benchmark_ids": args.benchmark_id,
+            "since": args.since,
+            "until": args.until,
+        }
+        rows = index.summarize(**filters) if args.summary else index.query(limit=args.limit, **filters)
+        print(tabulate(rows, headers="keys", tablefmt="pipe"))
+    finally:
+        index.close()
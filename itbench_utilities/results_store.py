@@ -0,0 +1,145 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib.util
+import logging
+from datetime import date, datetime
+from enum import Enum
+from pathlib import Path
+from typing import List, Optional, Union
+from urllib.parse import quote, unquote
+from uuid import uuid4
+
+import pandas as pd
+
+import itbench_utilities.app.models  # noqa: F401 (must be loaded before models.bundle to avoid a circular import)
+from itbench_utilities.models.bundle import BundleResult
+
+logger = logging.getLogger(__name__)
+
+# Only look pyarrow up here; pandas imports it when a parquet file is read or written.
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+DAY_PARTITION = "day"
+AGENT_PARTITION = "agent"
+TTR_COLUMN = "ttr_seconds"
+BOOL_COLUMNS = [BundleResult.Column.passed, BundleResult.Column.errored]
+STRING_COLUMNS = [
+    BundleResult.Column.agent,
+    BundleResult.Column.name,
+    BundleResult.Column.incident_type,
+    BundleResult.Column.description,
+    BundleResult.Column.message,
+    BundleResult.Column.benchmark_id,
+]
+
+DateLike = Union[date, datetime, str]
+
+
+class StoreFormat(str, Enum):
+    Parquet = "parquet"
+    Csv = "csv"
+
+
+def to_day(value: DateLike) -> str:
+    if isinstance(value, str):
+        return value[:10]
+    return value.strftime("%Y-%m-%d")
+
+
+class ResultsStore:
+
+    def __init__(self, root: Path, format: Optional[StoreFormat] = None) -> None:
+        self.root = Path(root)
+        if format is None:
+            format = StoreFormat.Parquet if HAS_PYARROW else StoreFormat.Csv
+        self.format = StoreFormat(format)
+        if self.format == StoreFormat.Parquet and not HAS_PYARROW:
+            raise ValueError("The parquet format requires pyarrow. Install it with `pip install itbench-utilities[store]` or use the csv format.")
+
+    def to_frame(self, bundle_results: List[BundleResult]) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                BundleResult.Column.agent: [x.agent for x in bundle_results],
+                BundleResult.Column.name: [x.name for x in bundle_results],
+                BundleResult.Column.incident_type: [x.incident_type for x in bundle_results],
+                BundleResult.Column.description: [x.description for x in bundle_results],
+                BundleResult.Column.passed: [x.passed for x in bundle_results],
+                TTR_COLUMN: [x.ttr.total_seconds() for x in bundle_results],
+                BundleResult.Column.errored: [x.errored for x in bundle_results],
+                BundleResult.Column.message: [x.message for x in bundle_results],
+                BundleResult.Column.date: pd.to_datetime([x.date for x in bundle_results], utc=True),
+                BundleResult.Column.benchmark_id: [x.benchmark_id for x in bundle_results],
+            }
+        )
+
+    def append(self, bundle_results: List[BundleResult]) -> List[Path]:
+        if len(bundle_results) == 0:
+            return []
+        df = self.to_frame(bundle_results)
+        days = df[BundleResult.Column.date].dt.strftime("%Y-%m-%d")
+        paths = []
+        # One new part file per partition and run; existing files are never rewritten.
+        for (day, agent), part in df.groupby([days, BundleResult.Column.agent], sort=False):
+            directory = self.root / f"{DAY_PARTITION}={day}" / f"{AGENT_PARTITION}={quote(agent, safe='')}"
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"part-{uuid4().hex}.{self.format.value}"
+            if self.format == StoreFormat.Parquet:
+                part.to_parquet(path, index=False)
+            else:
+                part.to_csv(path, index=False)
+            paths.append(path)
+        logger.info(f"Appended {len(df)} results to {self.root.as_posix()}")
+        return paths
+
+    def list_files(
+        self, agents: Optional[List[str]] = None, start_date: Optional[DateLike] = None, end_date: Optional[DateLike] = None
+    ) -> List[Path]:
+        start_day = to_day(start_date) if start_date else None
+        end_day = to_day(end_date) if end_date else None
+        files = []
+        for day_dir in sorted(self.root.glob(f"{DAY_PARTITION}=*")):
+            day = day_dir.name.split("=", 1)[1]
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            for agent_dir in sorted(day_dir.glob(f"{AGENT_PARTITION}=*")):
+                agent = unquote(agent_dir.name.split("=", 1)[1])
+                if agents is not None and agent not in agents:
+                    continue
+                files.extend(sorted(agent_dir.glob("part-*.parquet")) + sorted(agent_dir.glob("part-*.csv")))
+        return files
+
+    def read_file(self, path: Path, columns: Optional[List[str]]) -> pd.DataFrame:
+        if path.suffix == ".parquet":
+            return pd.read_parquet(path, columns=columns)
+        df = pd.read_csv(path, usecols=columns, dtype={x: "string" for x in STRING_COLUMNS if columns is None or x in columns})
+        if BundleResult.Column.date in df.columns:
+            df[BundleResult.Column.date] = pd.to_datetime(df[BundleResult.Column.date], utc=True, format="ISO8601")
+        for column in BOOL_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype(bool)
+        return df
+
+    def query(
+        self,
+        columns: Optional[List[str]] = None,
+        agents: Optional[List[str]] = None,
+        start_date: Optional[DateLike] = None,
+        end_date: Optional[DateLike] = None,
+    ) -> pd.DataFrame:
+        """Read results of the given agents between start_date and end_date (inclusive days), loading only `columns` and matching partitions."""
+        frames = [self.read_file(x, columns) for x in self.list_files(agents=agents, start_date=start_date, end_date=end_date)]
+        if len(frames) == 0:
+            return pd.DataFrame(columns=columns if columns else [])
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,73 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import json
+
+from itbench_utilities.agent_harness.agent import AgentHarness
+from itbench_utilities.app.models.agent import AgentManifest
+from itbench_utilities.app.models.base import AgentPhaseEnum, Status
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+
+class FakeManifestClient:
+    # Stand-in for the agent manifest endpoints; SIGTERM arrives once the first entry is taken.
+
+    def __init__(self, harness, manifest):
+        self.harness = harness
+        self.manifest = manifest
+        self.phases = []
+
+    def get(self, endpoint):
+        return FakeResponse(self.manifest.model_dump(mode="json"))
+
+    def put(self, endpoint, body=None):
+        benchmark_id = endpoint.split("/")[-1]
+        phase = Status.model_validate_json(body).phase
+        self.phases.append((benchmark_id, phase))
+        if phase == AgentPhaseEnum.Executing:
+            self.harness.stop_event.set()
+        return FakeResponse({"success": True})
+
+
+def build_entry(benchmark_id):
+    return {
+        "benchmark_id": benchmark_id,
+        "agent_access_info": {"id": "agent1", "name": "agent1", "source_id": "agent1", "status_endpoint": ""},
+        "bundle_access_infos": [],
+        "status": {"phase": AgentPhaseEnum.NotStarted},
+    }
+
+
+def test_shutdown_leaves_entries_to_other_harnesses():
+    manifest = AgentManifest.model_validate(
+        {"token": "token", "manifest_endpoint": "/agent-manifest/agent1", "benchmark_entries": [build_entry("b1"), build_entry("b2")]}
+    )
+    harness = AgentHarness(manifest, "/tmp", "localhost", 8000, interval=0)
+    client = FakeManifestClient(harness, manifest)
+    harness.rest_client = client
+
+    asyncio.run(harness.run())
+
+    # The interrupted entry is put back and the remaining one is never taken.
+    assert client.phases == [("b1", AgentPhaseEnum.Executing), ("b1", AgentPhaseEnum.NotStarted)]
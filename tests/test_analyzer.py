@@ -0,0 +1,101 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from itbench_utilities.bechmark_analyzer import Analyzer, aggregate, calc_pass_at_k
+from itbench_utilities.models.benchmark import BenchmarkResult
+from itbench_utilities.models.bundle import BundleResult
+
+
+def build_bundle_results():
+    bundle_results = []
+    for i in range(60):
+        bundle_results.append(
+            BundleResult(
+                name=f"bundle{i % 5}",
+                agent=f"agent{i % 2}",
+                incident_type=["SRE", "FinOps", None][i % 3],
+                passed=i % 4 == 0,
+                errored=i % 7 == 0,
+                ttr=timedelta(seconds=i, microseconds=i * 3),
+                date=datetime(2024, 10, 1, tzinfo=timezone.utc) + timedelta(minutes=(i * 37) % 60),
+            )
+        )
+    return bundle_results
+
+
+def test_aggregate_matches_analyzer():
+    bundle_results = build_bundle_results()
+    benchmark_results = aggregate(bundle_results, "test", seed=0)
+    assert [x.agent for x in benchmark_results] == ["agent0", "agent1"]
+    for benchmark_result in benchmark_results:
+        expected = Analyzer([x for x in bundle_results if x.agent == benchmark_result.agent]).to_benchmark_result(
+            "test", benchmark_result.agent, seed=0
+        )
+        assert benchmark_result.model_dump() == expected.model_dump()
+
+
+def test_aggregate_by_incident_type():
+    bundle_results = build_bundle_results()
+    benchmark_results = aggregate(bundle_results, "test", by_incident_type=True)
+    assert len(benchmark_results) == 6
+    assert sum(len(x.results) for x in benchmark_results) == len(bundle_results)
+    for benchmark_result in benchmark_results:
+        assert all(x.agent == benchmark_result.agent and (x.incident_type or "") == benchmark_result.incident_type for x in benchmark_result.results)
+    assert aggregate([], "test") == []
+
+
+def test_statistics():
+    bundle_results = build_bundle_results()
+    benchmark_result = aggregate(bundle_results, "test", seed=0)[0]
+    assert benchmark_result.ttr_p50 <= benchmark_result.ttr_p90 <= benchmark_result.ttr_p99
+    assert benchmark_result.score_ci_low <= benchmark_result.score <= benchmark_result.score_ci_high
+    assert benchmark_result.mttr_ci_low <= benchmark_result.mttr <= benchmark_result.mttr_ci_high
+    assert benchmark_result.confidence == 0.95
+    assert aggregate(bundle_results, "test", seed=0)[0] == benchmark_result
+
+    benchmark_result = aggregate(bundle_results, "test", resamples=0)[0]
+    assert benchmark_result.ttr_p50 is not None
+    assert benchmark_result.score_ci_low is None and benchmark_result.mttr_ci_low is None
+
+
+def test_pass_at_k():
+    assert calc_pass_at_k(5, 0, 2) == 0
+    assert calc_pass_at_k(5, 4, 2) == 1.0
+    assert abs(calc_pass_at_k(5, 2, 2) - 0.7) < 1e-9
+    assert calc_pass_at_k(1, 1, 2) is None
+
+    bundle_results = build_bundle_results()
+    benchmark_result = aggregate(bundle_results, "test", resamples=0, k=2)[0]
+    assert benchmark_result.k == 2
+    assert len(benchmark_result.scenarios) == 5
+    scenario = benchmark_result.scenarios[0]
+    trials = [x for x in bundle_results if x.agent == scenario.agent and x.name == scenario.name]
+    assert scenario.trials == len(trials) and scenario.num_of_passed == sum(x.passed for x in trials)
+    assert scenario.pass_at_1 <= scenario.pass_at_k
+    assert aggregate(bundle_results, "test", resamples=0)[0].scenarios is None
+
+
+def test_to_dataframe_matches_model_dump():
+    bundle_results = build_bundle_results()
+    expected = pd.DataFrame([x.model_dump() for x in bundle_results])
+    pd.testing.assert_frame_equal(BundleResult.to_dataframe(bundle_results), expected)
+
+    benchmark_results = aggregate(bundle_results, "test", seed=0) + aggregate(bundle_results, "test", resamples=0)
+    for exclude in [[], [BenchmarkResult.Column.results]]:
+        expected = pd.DataFrame([{k: v for k, v in x.model_dump().items() if k not in exclude} for x in benchmark_results])
+        pd.testing.assert_frame_equal(BenchmarkResult.to_dataframe(benchmark_results, exclude=exclude), expected)
@@ -12,21 +12,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import cProfile
 import json
 import logging
 import os
+import pstats
+import threading
+import tracemalloc
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from itbench_utilities.agent_operator import AgentOperator
 from itbench_utilities.app.models.agent import Agent, AgentSpec
-from itbench_utilities.app.models.base import AgentPhaseEnum, Metadata
+from itbench_utilities.app.models.base import AgentPhaseEnum, BundlePhaseEnum, Metadata
 from itbench_utilities.app.models.bundle import Env, MakeCmd
 from itbench_utilities.app.utils import create_status, get_timestamp
 from itbench_utilities.bench_client import BenchClient
 from itbench_utilities.benchmark import Benchmark, write_for_leaderboard
 from itbench_utilities.bundle_operator import BundleOperator
+from itbench_utilities.common import profiling
+from itbench_utilities.common.profiling import get_profile_paths
+from itbench_utilities.common.tracing import TRACE_FILE_NAME
 from itbench_utilities.models.agent import AgentInfo
 from itbench_utilities.models.benchmark import (
     BenchConfig,
@@ -40,6 +47,7 @@ from itbench_utilities.models.bundle import (
     BundleStatus,
 )
 from itbench_utilities.observer import Observer, gen_json_logging_callback
+from itbench_utilities.progress import PROGRESS_HISTORY_FILE_NAME, PROGRESS_HTML_FILE_NAME
 from tests import bundle_statues
 
 OUTPUT_DIR = Path(os.getenv("TEST_OUTPUT_DIR", "/tmp/itbench_utilities_test"))
@@ -226,12 +234,14 @@ def test_evaluate_agent_with_bundle_error(monkeypatch):
     assert mock.call_count.mock_error == 1
 
 
-def run_benchmark(mock: Mock, bundles: List[str], agent_success_map: Dict[str, str]) -> List[BenchmarkResult]:
+def run_benchmark(mock: Mock, bundles: List[str], agent_success_map: Dict[str, str], **kwargs) -> List[BenchmarkResult]:
     bundles = [Bundle(id="test", name=x, directory=".", incident_type="test", status=bundle_statues.INITIAL, polling_interval=1) for x in bundles]
-    return run_benchmark_with_bundles(mock, bundles, agent_success_map)
+    return run_benchmark_with_bundles(mock, bundles, agent_success_map, **kwargs)
 
 
-def run_benchmark_with_bundles(mock: Mock, bundles: List[Bundle], agent_success_map: Dict[str, str]) -> List[BenchmarkResult]:
+def run_benchmark_with_bundles(
+    mock: Mock, bundles: List[Bundle], agent_success_map: Dict[str, str], benchmark: Optional[Benchmark] = None, **kwargs
+) -> List[BenchmarkResult]:
     monkeypatch = mock.monkeypatch
     monkeypatch.setattr(BundleOperator, "invoke_bundle", mock.gen_mock_invoke_bundle())
     monkeypatch.setattr(AgentOperator, "invoke_agent", mock.gen_mock_invoke_agent())
@@ -239,11 +249,12 @@ def run_benchmark_with_bundles(mock: Mock, bundles: List[Bundle], agent_success_
 
     agents = [AgentInfo(id="test", name=x, directory=".") for x in agent_success_map.keys()]
 
-    bench_config = BenchConfig(title="test", is_test=True, soft_delete=False, resolution_wait=1)
+    bench_config = BenchConfig(title="test", is_test=True, soft_delete=False, resolution_wait=1, **kwargs)
     bench_run_config = BenchRunConfig(
         benchmark_id="test", push_model=False, config=bench_config, agents=agents, bundles=bundles, output_dir=OUTPUT_DIR.as_posix()
     )
-    benchmark_results = Benchmark(observer=observer).benchmark(bench_run_config)
+    benchmark = benchmark if benchmark else Benchmark(observer=observer)
+    benchmark_results = benchmark.benchmark(bench_run_config)
     return benchmark_results
 
 
@@ -270,6 +281,93 @@ def test_benchmark(monkeypatch):
     assert mock.call_count.mock_error == 0
 
 
+def test_benchmark_repeats(monkeypatch):
+    agent_success_map = {"agent1": {"bundle1": True, "bundle2": False}}
+    calls = {"deploy_bundle": 0, "inject_fault": 0}
+
+    class _Mock(Mock):
+        def mock_invoke_agent(self, **kwargs):
+            bundle_name = kwargs["bundle_name"]
+            self.replace_get_evaluation_method(lambda: {"pass": agent_success_map["agent1"][bundle_name], "report": []})
+
+        def mock_deploy_bundle(self, **kwargs):
+            calls["deploy_bundle"] += 1
+            super().mock_deploy_bundle(**kwargs)
+
+        def mock_inject_fault(self, **kwargs):
+            calls["inject_fault"] += 1
+            super().mock_inject_fault(**kwargs)
+
+    benchmark_results = run_benchmark(_Mock(monkeypatch), ["bundle1", "bundle2"], agent_success_map, repeats=2, reuse_deployment=True)
+    benchmark_result = benchmark_results[0]
+    assert [(x.name, x.trial) for x in benchmark_result.results] == [("bundle1", 0), ("bundle1", 1), ("bundle2", 0), ("bundle2", 1)]
+    assert benchmark_result.k == 2 and benchmark_result.pass_at_1 == 0.5 and benchmark_result.pass_at_k == 0.5
+    assert calls == {"deploy_bundle": 2, "inject_fault": 4}
+    assert (OUTPUT_DIR / "agent1" / "bundle1" / "trial-1" / "bundle-result.json").exists()
+
+    benchmark_results = run_benchmark(_Mock(monkeypatch), ["bundle1"], agent_success_map, repeats=3, parallel_scenarios=2)
+    assert [x.trial for x in benchmark_results[0].results] == [0, 1, 2]
+    assert benchmark_results[0].scenarios[0].pass_at_k == 1.0
+
+
+def test_parallel_scenarios_of_remote_agent(monkeypatch):
+    threads = []
+
+    def run_scenario(self, ao, bo, *args):
+        threads.append(threading.current_thread())
+        return []
+
+    monkeypatch.setattr(Benchmark, "run_scenario", run_scenario)
+    bundles = [Bundle(id="test", name=f"bundle{i}", directory=".") for i in range(3)]
+    bench_config = BenchConfig(title="test", is_test=True, soft_delete=False, parallel_scenarios=2)
+    bench_run_config = BenchRunConfig(benchmark_id="test", config=bench_config, agents=[], bundles=bundles, output_dir=OUTPUT_DIR.as_posix())
+    bos = [BundleOperator(bundle=x, bundle_request=BundleRequest(shared_workspace="/tmp/shared"), observer=observer) for x in bundles]
+    for mode, parallel in [("local", True), ("remote", False)]:
+        threads.clear()
+        ao = AgentOperator(AgentInfo(id="test", name="agent1", directory=".", mode=mode))
+        Benchmark(observer=observer).run_scenarios(ao, bos, bench_run_config, None, None, OUTPUT_DIR)
+        assert len(threads) == 3
+        assert all(x != threading.main_thread() for x in threads) == parallel
+
+
+def test_agent_session(tmp_path):
+    for detach in [False, True]:
+        ao = AgentOperator(AgentInfo(id="test", name="agent1", directory=tmp_path.as_posix()), detach=detach)
+        stdout, _ = ao.run_cmd(tmp_path.as_posix(), None, "ps -o pgid= -p $$")
+        # Only a detached agent leaves the process group of the terminal, which delivers Ctrl-C.
+        assert (int(stdout) != os.getpgrp()) == detach
+
+
+def test_benchmark_drain_and_abort(monkeypatch):
+    agent_success_map = {"agent1": {"bundle1": True, "bundle2": True}}
+
+    benchmark = Benchmark(observer=observer)
+
+    class _Mock(Mock):
+        def mock_invoke_agent(self, **kwargs):
+            self.replace_get_evaluation_method(lambda: {"pass": True, "report": []})
+            benchmark.drain()
+
+    mock = _Mock(monkeypatch)
+    benchmark_results = run_benchmark(mock, ["bundle1", "bundle2"], agent_success_map, benchmark=benchmark)
+    # The running scenario finishes and the next one is skipped.
+    assert [(x.name, x.passed) for x in benchmark_results[0].results] == [("bundle1", True)]
+    assert benchmark.interrupted
+
+    benchmark = Benchmark(observer=observer)
+
+    class _AbortMock(_Mock):
+        def mock_invoke_agent(self, **kwargs):
+            benchmark.abort()
+
+    mock = _AbortMock(monkeypatch)
+    benchmark_results = run_benchmark(mock, ["bundle1", "bundle2"], agent_success_map, benchmark=benchmark)
+    # The running scenario is aborted after the agent phase and cleaned up through error_action.
+    assert [(x.name, x.errored) for x in benchmark_results[0].results] == [("bundle1", True)]
+    assert mock.call_count.mock_error == 1
+    assert benchmark.interrupted
+
+
 def test_benchmark_with_bundle_error(monkeypatch):
 
     bundles = ["bundle1", "bundle2"]
@@ -306,3 +404,114 @@ def test_benchmark_with_bundle_error(monkeypatch):
     assert benchmark_results[1].agent == "agent2" and benchmark_results[1].score < 0.01
     write_for_leaderboard(benchmark_results, OUTPUT_DIR)
     assert mock.call_count.mock_error == 2  # 1 bundle in each bench should be error
+
+
+def test_benchmark_trace(monkeypatch):
+    agent_success_map = {"agent1": {"bundle1": True}}
+
+    class _Mock(Mock):
+        def mock_invoke_agent(self, **kwargs):
+            self.replace_get_evaluation_method(lambda: {"pass": True, "report": []})
+
+    trace_path = OUTPUT_DIR / TRACE_FILE_NAME
+    trace_path.unlink(missing_ok=True)
+    run_benchmark(_Mock(monkeypatch), ["bundle1"], agent_success_map, trace=True)
+
+    with trace_path.open("r") as f:
+        events = json.load(f)["traceEvents"]
+    spans = {x["name"]: x for x in events}
+    assert spans["benchmark"]["args"]["parent_id"] is None
+    assert spans["bundle1"]["args"]["parent_id"] == spans["benchmark"]["args"]["span_id"]
+    for phase in ["deploy", "inject_fault", "agent", "evaluate", "delete"]:
+        assert spans[phase]["cat"] == "phase"
+        assert spans[phase]["args"]["parent_id"] == spans["bundle1"]["args"]["span_id"]
+
+
+def test_benchmark_profile(monkeypatch):
+    agent_success_map = {"agent1": {"bundle1": True}}
+
+    class _Mock(Mock):
+        def mock_invoke_agent(self, **kwargs):
+            self.replace_get_evaluation_method(lambda: {"pass": True, "report": []})
+
+    prof_path, report_path = get_profile_paths(OUTPUT_DIR / "agent1" / "bundle1", "benchmark_per_bundle")
+    prof_path.unlink(missing_ok=True)
+    report_path.unlink(missing_ok=True)
+    run_benchmark(_Mock(monkeypatch), ["bundle1"], agent_success_map, profile=True)
+
+    assert pstats.Stats(prof_path.as_posix()).total_calls > 0
+    report = report_path.read_text()
+    assert "benchmark_per_bundle" in report
+    assert "allocations by size difference" in report
+
+
+def test_concurrent_profiles(tmp_path):
+    # The first profile finishes while the second is still tracing allocations.
+    first_done = threading.Event()
+    errors = []
+
+    def run(name: str, wait: Optional[threading.Event], done: Optional[threading.Event]):
+        try:
+            with profiling.profile(tmp_path, name):
+                _ = [bytearray(1024) for _ in range(100)]
+                if wait:
+                    wait.wait(timeout=10)
+            if done:
+                done.set()
+        except Exception as e:
+            errors.append(e)
+
+    second_started = threading.Event()
+    threads = [
+        threading.Thread(target=run, args=("first", second_started, first_done)),
+        threading.Thread(target=run, args=("second", first_done, None)),
+    ]
+    threads[0].start()
+    while profiling._tracemalloc_users < 1:
+        pass
+    threads[1].start()
+    while profiling._tracemalloc_users < 2:
+        pass
+    second_started.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert all(get_profile_paths(tmp_path, x)[1].exists() for x in ["first", "second"])
+    assert not tracemalloc.is_tracing()
+
+
+def test_benchmark_progress(monkeypatch):
+    agent_success_map = {"agent1": {"bundle1": True}}
+
+    class _Mock(Mock):
+        def mock_invoke_agent(self, **kwargs):
+            self.replace_get_evaluation_method(lambda: {"pass": True, "report": []})
+
+    history_path = OUTPUT_DIR / PROGRESS_HISTORY_FILE_NAME
+    history_path.unlink(missing_ok=True)
+    run_benchmark(_Mock(monkeypatch), ["bundle1"], agent_success_map, progress=True)
+
+    content = (OUTPUT_DIR / PROGRESS_HTML_FILE_NAME).read_text()
+    assert "1/1 finished, 1 passed" in content
+    assert f"<td class='{BundlePhaseEnum.Terminated.value}'>" in content
+    with history_path.open("r") as f:
+        assert "bundle1" in json.load(f)
+
+
+def test_profile_without_cpu_profiler(tmp_path, monkeypatch):
+    # Python 3.12+ refuses a second active cProfile profiler.
+    class BusyProfile(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfile)
+    with profiling.profile(tmp_path, "busy") as profiler:
+        _ = [bytearray(1024) for _ in range(100)]
+    assert profiler is None
+
+    prof_path, report_path = get_profile_paths(tmp_path, "busy")
+    assert not prof_path.exists()
+    assert "allocations by size difference" in report_path.read_text()
+    assert profiling._tracemalloc_users == 0
+    assert not tracemalloc.is_tracing()
+    assert not profiling._state.active
@@ -0,0 +1,78 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+from datetime import datetime, timedelta, timezone
+
+from itbench_utilities.bench_client import BenchClient
+from itbench_utilities.common.blob_store import BlobStore
+from itbench_utilities.models.benchmark import BenchConfig, BenchRunConfig, BundleResult
+from itbench_utilities.models.bundle import Bundle
+
+
+def test_blob_store(tmp_path):
+    store = BlobStore(tmp_path)
+    ref = store.put("hello")
+    assert ref.startswith("sha256:")
+    assert store.put(b"hello") == ref
+    assert store.get(ref) == "hello"
+    assert len(list(tmp_path.rglob("*.gz"))) == 1
+
+
+def test_bundle_result_offload(tmp_path):
+    store = BlobStore(tmp_path)
+    message = '{"details": "' + "x" * 10000 + '"}'
+    bundle_result = BundleResult(
+        name="bundle1", agent="agent1", passed=True, ttr=timedelta(seconds=1), message=message, date=datetime.now(timezone.utc)
+    )
+    bundle_result.offload(store, report="report", threshold=1024)
+    assert bundle_result.message_ref is not None
+    assert len(bundle_result.message) < 1024
+    assert bundle_result.load_message(store) == message
+    assert bundle_result.load_report(store) == "report"
+
+    loaded = BundleResult.model_validate_json(bundle_result.model_dump_json())
+    assert loaded.load_message(store) == message
+
+    short = BundleResult(name="bundle1", agent="agent1", passed=True, ttr=timedelta(seconds=1), message="ok", date=datetime.now(timezone.utc))
+    short.offload(store, threshold=1024)
+    assert short.message == "ok" and short.message_ref is None and short.load_message(store) == "ok"
+
+
+def test_upload_bundle_results_sends_full_message(tmp_path):
+    class FakeRestClient:
+        def __init__(self):
+            self.bodies = []
+
+        def post(self, endpoint, body=None):
+            self.bodies.append(body)
+
+    store = BlobStore(tmp_path)
+    message = "x" * 10000
+    bundle_result = BundleResult(
+        name="bundle1", agent="agent1", passed=True, ttr=timedelta(seconds=1), message=message, date=datetime.now(timezone.utc)
+    )
+    bundle_result.offload(store, threshold=1024)
+    bench_run_config = BenchRunConfig(
+        benchmark_id="benchmark1",
+        push_model=True,
+        config=BenchConfig(title="test", is_test=True, soft_delete=False),
+        agents=[],
+        bundles=[],
+        output_dir=str(tmp_path),
+    )
+    rest_client = FakeRestClient()
+    BenchClient(bench_run_config, rest_client).upload_bundle_results(Bundle(id="bundle1", name="bundle1", directory="."), [bundle_result], store)
+    assert json.loads(rest_client.bodies[0])[0]["message"] == message
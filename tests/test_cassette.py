@@ -0,0 +1,95 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import subprocess
+import time
+
+import pytest
+
+from itbench_utilities.bundle_operator import BundleOperator
+from itbench_utilities.cassette import Cassette, CassetteEntry, CassetteExhaustedError, CassetteMode
+from itbench_utilities.models.bundle import Bundle, BundleRequest
+from itbench_utilities.observer import Observer
+
+MAKEFILE = """
+get:
+\t@echo '{"metadata": {"goal": "fix it"}}'
+"""
+
+
+def build_bundle_operator(directory, cassette) -> BundleOperator:
+    bundle = Bundle(id="test", name="bundle1", directory=directory.as_posix())
+    return BundleOperator(bundle=bundle, bundle_request=BundleRequest(shared_workspace="/tmp/shared"), observer=Observer(), cassette=cassette)
+
+
+def test_record_and_replay(tmp_path, monkeypatch):
+    bundle_dir = tmp_path / "bundle"
+    bundle_dir.mkdir()
+    (bundle_dir / "Makefile").write_text(MAKEFILE)
+    cassette_path = tmp_path / "cassette.jsonl"
+
+    bo = build_bundle_operator(bundle_dir, Cassette(cassette_path, CassetteMode.Record))
+    recorded = bo.get_bundle()
+    assert recorded["metadata"]["goal"] == "fix it"
+
+    (bundle_dir / "Makefile").unlink()
+
+    def fail_popen(*args, **kwargs):
+        raise AssertionError("make must not be invoked while replaying")
+
+    monkeypatch.setattr(subprocess, "Popen", fail_popen)
+    cassette = Cassette(cassette_path, CassetteMode.Replay)
+    assert len(cassette.entries["get"]) == 1
+    assert cassette.entries["get"][0].returncode == 0
+
+    bo = build_bundle_operator(bundle_dir, cassette)
+    assert bo.get_bundle() == recorded
+    # Calling the same target more often than recorded does not serve the last recording again.
+    with pytest.raises(CassetteExhaustedError):
+        bo.get_bundle()
+
+
+def write_status_cassette(path, count, duration):
+    status = {"status": {"conditions": [{"type": "Deployed", "status": "False", "lastTransitionTime": "2025-01-01T00:00:00Z"}]}}
+    with path.open("w") as f:
+        for _ in range(count):
+            entry = CassetteEntry(target="get_status", returncode=0, stdout=json.dumps(status), started_at="2025-01-01T00:00:00Z", duration=duration)
+            f.write(entry.model_dump_json() + "\n")
+
+
+def test_replay_wait_uses_virtual_clock(tmp_path):
+    cassette_path = tmp_path / "cassette.jsonl"
+    write_status_cassette(cassette_path, 5, 0.1)
+    cassette = Cassette(cassette_path, CassetteMode.Replay)
+    bo = build_bundle_operator(tmp_path, cassette)
+
+    start = time.monotonic()
+    assert not bo.wait_bundle("Deployed", interval=1, timeout=2)
+    assert time.monotonic() - start < 1
+    # Polls at 0.0 and 1.1 on the virtual clock; the remaining recordings are kept for later waits.
+    assert cassette.cursors["get_status"] == 2
+    assert cassette.time() == pytest.approx(2.2)
+
+
+def test_replay_wait_stops_at_end_of_recording(tmp_path):
+    cassette_path = tmp_path / "cassette.jsonl"
+    write_status_cassette(cassette_path, 3, 0.1)
+    cassette = Cassette(cassette_path, CassetteMode.Replay)
+    bo = build_bundle_operator(tmp_path, cassette)
+
+    start = time.monotonic()
+    assert not bo.wait_bundle("Deployed", interval=1, timeout=600)
+    assert time.monotonic() - start < 1
+    assert cassette.cursors["get_status"] == 3
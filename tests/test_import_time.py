@@ -0,0 +1,51 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "fastapi", "starlette"]
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "2.0"))
+
+
+def import_in_subprocess(module: str):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [x for x in {HEAVY_MODULES!r} if x in sys.modules]}}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "itbench_utilities.bench_runner.main",
+        "itbench_utilities.agent_harness.main",
+        "itbench_utilities.agent_harness.agent",
+        "itbench_utilities.bench_runner.runner",
+    ],
+)
+def test_import_time(module):
+    result = import_in_subprocess(module)
+    assert result["loaded"] == [], f"{module} imports {result['loaded']} at import time"
+    assert result["elapsed"] < IMPORT_TIME_BUDGET, f"{module} took {result['elapsed']:.3f}s to import"
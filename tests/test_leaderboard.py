@@ -0,0 +1,76 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import shutil
+from datetime import datetime, timedelta, timezone
+
+from itbench_utilities.bechmark_analyzer import aggregate
+from itbench_utilities.benchmark import write_for_leaderboard
+from itbench_utilities.leaderboard import build_leaderboard
+from itbench_utilities.models.bundle import BundleResult
+
+
+def build_bundle_results(benchmark_id: str, offset: int):
+    return [
+        BundleResult(
+            name=f"bundle{i}",
+            agent=f"agent{i % 2}",
+            incident_type=["SRE", "FinOps"][i % 2],
+            passed=(i + offset) % 3 == 0,
+            errored=i == 5,
+            ttr=timedelta(seconds=i + offset),
+            date=datetime(2024, 10, 1 + offset, tzinfo=timezone.utc) + timedelta(minutes=i),
+            benchmark_id=benchmark_id,
+        )
+        for i in range(6)
+    ]
+
+
+def test_build_leaderboard(tmp_path):
+    runs = {"run1": build_bundle_results("benchmark1", 0), "run2": build_bundle_results("benchmark2", 1)}
+    for name, bundle_results in runs.items():
+        write_for_leaderboard(aggregate(bundle_results, name, resamples=0), tmp_path / "results" / name)
+    shutil.copytree(tmp_path / "results" / "run1", tmp_path / "results" / "run1-copy")
+
+    benchmark_results = build_leaderboard([tmp_path / "results"], tmp_path / "leaderboard", title="global")
+
+    expected = aggregate(runs["run1"] + runs["run2"], "global", resamples=0)
+    assert [x.agent for x in benchmark_results] == [x.agent for x in expected]
+    for actual, exp in zip(benchmark_results, expected):
+        assert actual.num_of_passed == exp.num_of_passed
+        assert actual.score == exp.score
+        assert actual.incident_type == exp.incident_type
+        assert abs(actual.mttr - exp.mttr) < timedelta(milliseconds=1)
+        assert actual.date == exp.date
+
+    with (tmp_path / "leaderboard" / "bundle_results.jsonl").open() as f:
+        assert len(f.readlines()) == 12
+    with (tmp_path / "leaderboard" / "benchmark_results.jsonl").open() as f:
+        assert [json.loads(x)["name"] for x in f] == ["global", "global"]
+    assert "pass rate (%)" in (tmp_path / "leaderboard" / "benchmark_results.md").read_text()
+
+
+def test_build_leaderboard_without_benchmark_id(tmp_path):
+    bundle_results = build_bundle_results(None, 0)
+    write_for_leaderboard(aggregate(bundle_results, "legacy", resamples=0), tmp_path / "results" / "run1")
+    # The same run ingested again from a copied path.
+    shutil.copytree(tmp_path / "results" / "run1", tmp_path / "results" / "archive" / "run1")
+
+    benchmark_results = build_leaderboard([tmp_path / "results"], tmp_path / "leaderboard")
+
+    expected = aggregate(bundle_results, "leaderboard", resamples=0)
+    assert [x.num_of_passed for x in benchmark_results] == [x.num_of_passed for x in expected]
+    with (tmp_path / "leaderboard" / "bundle_results.jsonl").open() as f:
+        assert len(f.readlines()) == 6
@@ -0,0 +1,72 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import urllib.request
+
+from itbench_utilities.common.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    start_metrics_server,
+)
+
+
+def test_metrics_endpoint():
+    registry = Registry()
+    jobs = registry.register(Counter("test_jobs_total", "Jobs.", ["component"]))
+    durations = registry.register(Histogram("test_duration_seconds", "Durations.", ["phase"], buckets=[1, 10]))
+    jobs.inc(component="runner")
+    jobs.inc(component="runner")
+    durations.observe(0.5, phase="deploy")
+    durations.observe(5, phase="deploy")
+
+    server = start_metrics_server(0, host="127.0.0.1", registry=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            body = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+
+    assert "# TYPE test_jobs_total counter" in body
+    assert 'test_jobs_total{component="runner"} 2.0' in body
+    assert 'test_duration_seconds_bucket{phase="deploy",le="1.0"} 1' in body
+    assert 'test_duration_seconds_bucket{phase="deploy",le="+Inf"} 2' in body
+    assert 'test_duration_seconds_count{phase="deploy"} 2' in body
+
+
+def build_registry() -> Registry:
+    registry = Registry()
+    registry.register(Counter("test_jobs_total", "Jobs.", ["component"]))
+    registry.register(Gauge("test_running", "Running.", ["component"]))
+    registry.register(Histogram("test_duration_seconds", "Durations.", ["phase"], buckets=[1, 10]))
+    return registry
+
+
+def test_metrics_snapshot_merge():
+    worker, runner = build_registry(), build_registry()
+    worker.metrics["test_jobs_total"].inc(component="runner")
+    before = worker.snapshot()
+    worker.metrics["test_jobs_total"].inc(component="runner")
+    worker.metrics["test_running"].inc(component="runner")
+    worker.metrics["test_duration_seconds"].observe(5, phase="deploy")
+
+    # Only the changes since the previous snapshot are merged.
+    runner.merge(worker.diff(before, worker.snapshot()))
+    runner.merge(worker.diff(worker.snapshot(), worker.snapshot()))
+    assert runner.metrics["test_jobs_total"].get(component="runner") == 1
+    assert runner.metrics["test_running"].get(component="runner") == 1
+    assert runner.metrics["test_duration_seconds"].get_count(phase="deploy") == 1
+    assert 'test_duration_seconds_bucket{phase="deploy",le="1.0"} 0' in runner.render()
+    assert 'test_duration_seconds_sum{phase="deploy"} 5.0' in runner.render()
@@ -0,0 +1,130 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from itbench_utilities.event_sink import (
+    JsonlEventSink,
+    list_event_files,
+    read_events,
+)
+from itbench_utilities.observer import (
+    DEFAULT_LOGGED_EVENTS,
+    DispatchMode,
+    EventData,
+    Observer,
+    QueueFullPolicy,
+)
+
+
+def test_async_dispatch_flush():
+    observer = Observer(mode=DispatchMode.Async)
+    received = []
+    observer.register(lambda x: received.append(x.event))
+    for i in range(100):
+        observer.notify(f"event:{i}", {"i": i})
+    observer.flush()
+    assert received == [f"event:{i}" for i in range(100)]
+    assert observer.stats.dispatched == 100
+    observer.close()
+    assert not observer.dispatcher.is_alive()
+
+
+def test_async_dispatch_drop_when_full():
+    observer = Observer(mode=DispatchMode.Async, queue_size=1, full_policy=QueueFullPolicy.Drop, late_threshold=0)
+    release = threading.Event()
+    received = []
+
+    def slow_callback(event_data: EventData):
+        release.wait(timeout=10)
+        received.append(event_data.event)
+
+    observer.register(slow_callback)
+    for i in range(10):
+        observer.notify(f"event:{i}", {})
+    release.set()
+    observer.close()
+    assert observer.stats.dropped > 0
+    assert observer.stats.dropped + len(received) == 10
+    assert observer.stats.late == len(received)
+
+
+def test_subscription_filters():
+    observer = Observer()
+    received = {"all": [], "prefix": [], "glob": []}
+    observer.register(lambda x: received["all"].append(x.event))
+    observer.register(lambda x: received["prefix"].append(x.event), events=["invoke_bundle:"])
+    observer.register(lambda x: received["glob"].append(x.event), events=["*:end"])
+    for event in ["benchmark_per_bundle:start", "invoke_bundle:run_process:start", "invoke_bundle:run_process:end"]:
+        observer.notify(event, {})
+    assert len(received["all"]) == 3
+    assert received["prefix"] == ["invoke_bundle:run_process:start", "invoke_bundle:run_process:end"]
+    assert received["glob"] == ["invoke_bundle:run_process:end"]
+
+
+def test_lazy_payload():
+    observer = Observer()
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return "value"
+
+    received = []
+    observer.register(lambda x: received.append(x), events=["subscribed"])
+    observer.notify("unsubscribed", {"value": expensive})
+    observer.notify("unsubscribed", lambda: {"value": expensive()})
+    assert calls == []
+
+    observer.notify("subscribed", {"value": expensive, "plain": 1})
+    assert calls == [1]
+    assert received[0].data == {"value": "value", "plain": 1}
+
+
+def test_logged_events_skip_verbose_payloads():
+    observer = Observer()
+    logged = []
+    observer.register(lambda x: logged.append(x.event), events=DEFAULT_LOGGED_EVENTS)
+    calls = []
+    observer.notify("invoke_bundle:run_process:start", {"env": lambda: calls.append("env")})
+    observer.notify("invoke_bundle:run_process:end", lambda: calls.append("stdout"))
+    assert calls == []
+    for event in ["benchmark_per_bundle:start", "bundle:phase", "invoke_bundle:run_process:error"]:
+        observer.notify(event, {})
+    assert logged == ["benchmark_per_bundle:start", "bundle:phase", "invoke_bundle:run_process:error"]
+
+
+def test_jsonl_event_sink_rotation(tmp_path):
+    observer = Observer()
+    sink = JsonlEventSink(tmp_path, "benchmark1", max_bytes=1024, compress=True)
+    observer.register(sink)
+    for i in range(100):
+        observer.notify(f"invoke_bundle:{i}", {"i": i, "stdout": "x" * 50})
+    sink.close()
+
+    files = list_event_files(tmp_path, "benchmark1")
+    assert len(files) > 2
+    assert all(x.suffix == ".gz" for x in files[:-1])
+    events = list(read_events(tmp_path, "benchmark1"))
+    assert [x["data"]["i"] for x in events] == list(range(100))
+    assert events[0]["event"] == "invoke_bundle:0"
+
+
+def test_list_event_files_while_compressing(tmp_path):
+    (tmp_path / "benchmark1.events.1.jsonl").write_text("{}\n")
+    (tmp_path / "benchmark1.events.1.jsonl.gz").write_bytes(b"")
+    (tmp_path / "benchmark1.events.1.jsonl.gz.tmp").write_bytes(b"")
+    (tmp_path / "benchmark1.events.jsonl").write_text("{}\n")
+    files = list_event_files(tmp_path, "benchmark1")
+    assert [x.name for x in files] == ["benchmark1.events.1.jsonl", "benchmark1.events.jsonl"]
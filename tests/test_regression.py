@@ -0,0 +1,92 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import math
+from datetime import datetime, timedelta, timezone
+
+from itbench_utilities.bechmark_analyzer import aggregate
+from itbench_utilities.benchmark import PHASES_FILE_NAME, write_for_leaderboard
+from itbench_utilities.models.bundle import BundleResult
+from itbench_utilities.regression import compare_runs, mcnemar_test, sign_test, wilcoxon_test
+
+
+def write_run(output_dir, ttr_scale, passed, deploy):
+    bundle_results = []
+    for i in range(12):
+        bundle_results.append(
+            BundleResult(
+                name=f"bundle{i}",
+                agent="agent1",
+                passed=passed(i),
+                ttr=timedelta(seconds=(10 + i) * ttr_scale),
+                date=datetime(2024, 10, 1, tzinfo=timezone.utc),
+            )
+        )
+        phases_path = output_dir / "agent1" / f"bundle{i}" / PHASES_FILE_NAME
+        phases_path.parent.mkdir(parents=True, exist_ok=True)
+        phases_path.write_text(json.dumps({"deploy": deploy + i % 3, "agent": 10 * ttr_scale + i}))
+    write_for_leaderboard(aggregate(bundle_results, "test", resamples=0), output_dir)
+
+
+def test_statistical_tests():
+    assert math.isclose(sign_test([1] * 5).p_value, 1 / 32)
+    assert mcnemar_test([(True, False)] * 6 + [(True, True)] * 10).p_value < 0.05
+    assert mcnemar_test([(True, False), (False, True)]).p_value == 0.75
+    # Small samples use the exact null distribution, also with tied ranks.
+    assert math.isclose(wilcoxon_test(list(range(1, 11))).p_value, 1 / 1024)
+    assert math.isclose(wilcoxon_test([1, 1, -1]).p_value, 0.5)
+    assert math.isclose(wilcoxon_test([1, 2, -3, 4]).p_value, 5 / 16)
+    assert math.isclose(wilcoxon_test(list(range(1, 26))).p_value, 0.5 * math.erfc((325 - 162.5 - 0.5) / math.sqrt(1381.25) / math.sqrt(2)))
+    assert not wilcoxon_test([0, 0]).significant
+
+
+def test_compare_runs(tmp_path):
+    write_run(tmp_path / "baseline", 1, lambda i: True, 5)
+    write_run(tmp_path / "same", 1, lambda i: True, 5)
+    write_run(tmp_path / "slow", 1.5, lambda i: i % 2 == 0, 5)
+
+    report = compare_runs(tmp_path / "baseline", tmp_path / "same")
+    assert not report.regressed
+    assert len(report.scenarios) == 12
+
+    report = compare_runs(tmp_path / "baseline", tmp_path / "slow")
+    assert report.regressions == ["ttr", "pass_rate", "phase:agent"]
+    assert report.scenarios[0].ttr_delta == 5
+    assert report.scenarios[0].phase_deltas == {"deploy": 0, "agent": 5}
+
+
+def test_compare_runs_pairs_trials(tmp_path):
+    def write_trials(output_dir, passed):
+        bundle_results = [
+            BundleResult(
+                name=f"bundle{i}",
+                agent="agent1",
+                passed=passed[trial],
+                ttr=timedelta(seconds=10),
+                date=datetime(2024, 10, 1, tzinfo=timezone.utc),
+                trial=trial,
+            )
+            for i in range(6)
+            for trial in [1, 0]
+        ]
+        write_for_leaderboard(aggregate(bundle_results, "test", resamples=0), output_dir)
+
+    # Each scenario passes half of its trials in the baseline and none in the candidate.
+    write_trials(tmp_path / "baseline", [True, False])
+    write_trials(tmp_path / "candidate", [False, False])
+    report = compare_runs(tmp_path / "baseline", tmp_path / "candidate")
+    assert report.pass_rate_test.n == 6
+    assert report.pass_rate_test.statistic == 6
+    assert report.regressions == ["pass_rate"]
@@ -0,0 +1,52 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from logging.handlers import QueueHandler
+
+from itbench_utilities.app.config import AppConfig
+from itbench_utilities.bench_runner.utils import (
+    _listeners,
+    close_request_logger,
+    get_specific_log_file_path,
+    setup_request_logger,
+)
+
+
+def test_request_logger_rotation_and_close(tmp_path):
+    benchmark_id = "test-request-logger"
+    _logger = setup_request_logger(benchmark_id, log_dir=str(tmp_path / "logs"), max_bytes=1024, backup_count=2)
+    _logger.setLevel(logging.INFO)
+    log_file_path = get_specific_log_file_path(_logger, benchmark_id)
+    assert log_file_path == (tmp_path / "logs" / f"log_{benchmark_id}.log").as_posix()
+
+    for i in range(100):
+        _logger.info(f"line {i} " + "x" * 50)
+    close_request_logger(benchmark_id)
+
+    assert not any(isinstance(x, QueueHandler) for x in _logger.handlers)
+    files = sorted((tmp_path / "logs").glob(f"log_{benchmark_id}.log*"))
+    assert len(files) == 3
+    with open(log_file_path) as f:
+        assert "line 99 " in f.read()
+    _logger.setLevel(logging.NOTSET)
+
+
+def test_request_logger_limits_default_to_app_config(tmp_path):
+    benchmark_id = "test-request-logger-defaults"
+    setup_request_logger(benchmark_id, log_dir=str(tmp_path))
+    handler = _listeners[benchmark_id].handlers[0]
+    app_config = AppConfig()
+    assert (handler.maxBytes, handler.backupCount) == (app_config.log_max_bytes, app_config.log_backup_count)
+    close_request_logger(benchmark_id)
@@ -0,0 +1,63 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from itbench_utilities.bechmark_analyzer import aggregate
+from itbench_utilities.benchmark import write_for_leaderboard
+from itbench_utilities.models.bundle import BundleResult
+from itbench_utilities.results_index import ResultsIndex
+
+
+def write_run(output_dir, benchmark_id, day, agents):
+    bundle_results = [
+        BundleResult(
+            name=f"bundle{i}",
+            agent=agent,
+            incident_type=["SRE", "FinOps"][i % 2],
+            passed=i % 2 == 0,
+            ttr=timedelta(seconds=i + 1),
+            date=datetime(2024, 10, day, 12, tzinfo=timezone.utc),
+            benchmark_id=benchmark_id,
+        )
+        for agent in agents
+        for i in range(4)
+    ]
+    write_for_leaderboard(aggregate(bundle_results, benchmark_id, resamples=0), output_dir)
+
+
+def test_results_index(tmp_path):
+    write_run(tmp_path / "runs" / "run1", "benchmark1", 1, ["agent1", "agent2"])
+    write_run(tmp_path / "runs" / "run2", "benchmark2", 15, ["agent1"])
+    index = ResultsIndex(tmp_path / "index.sqlite")
+    assert index.update([tmp_path / "runs"]) == (2, 0)
+    assert index.update([tmp_path / "runs"]) == (0, 0)
+
+    assert len(index.query()) == 12
+    rows = index.query(agents=["agent1"], incident_types=["SRE"], since="2024-10-10")
+    assert [(x["benchmark_id"], x["name"]) for x in rows] == [("benchmark2", "bundle0"), ("benchmark2", "bundle2")]
+    assert len(index.query(until="2024-10-01")) == 8
+    assert len(index.query(benchmark_ids=["benchmark1"], names=["bundle1"])) == 2
+
+    summary = index.summarize(agents=["agent1"])
+    assert [(x["incident_type"], x["results"], x["pass rate (%)"]) for x in summary] == [("FinOps", 4, 0), ("SRE", 4, 100)]
+
+    write_run(tmp_path / "runs" / "run2", "benchmark3", 20, ["agent3"])
+    stat = (tmp_path / "runs" / "run2" / "bundle_results.jsonl").stat()
+    os.utime(tmp_path / "runs" / "run2" / "bundle_results.jsonl", (stat.st_atime, stat.st_mtime + 1))
+    (tmp_path / "runs" / "run1" / "bundle_results.jsonl").unlink()
+    assert index.update([tmp_path / "runs"]) == (1, 1)
+    assert {x["agent"] for x in index.query()} == {"agent3"}
+    index.close()
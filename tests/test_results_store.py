@@ -0,0 +1,58 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from itbench_utilities.models.benchmark import BundleResult
+from itbench_utilities.results_store import (
+    HAS_PYARROW,
+    TTR_COLUMN,
+    ResultsStore,
+    StoreFormat,
+)
+
+
+@pytest.mark.parametrize("format", [StoreFormat.Csv, pytest.param(StoreFormat.Parquet, marks=pytest.mark.skipif(not HAS_PYARROW, reason="pyarrow"))])
+def test_results_store(tmp_path, format):
+    store = ResultsStore(tmp_path, format=format)
+    for day in range(3):
+        store.append(
+            [
+                BundleResult(
+                    name=f"bundle{i}",
+                    agent=f"agent/{i % 2}",
+                    incident_type="SRE",
+                    passed=i % 3 == 0,
+                    ttr=timedelta(seconds=i),
+                    date=datetime(2024, 10, 1 + day, 12, tzinfo=timezone.utc),
+                    benchmark_id=f"benchmark{day}",
+                )
+                for i in range(4)
+            ]
+        )
+
+    assert len(store.list_files()) == 6
+    assert len(store.list_files(agents=["agent/1"], start_date="2024-10-02")) == 2
+
+    df = store.query()
+    assert len(df) == 12
+    assert df[BundleResult.Column.passed].dtype == bool
+
+    df = store.query(columns=[BundleResult.Column.name, TTR_COLUMN], agents=["agent/0"], end_date=datetime(2024, 10, 2))
+    assert list(df.columns) == [BundleResult.Column.name, TTR_COLUMN]
+    assert len(df) == 4
+    assert sorted(df[TTR_COLUMN].unique()) == [0, 2]
+    assert store.query(agents=["unknown"]).empty
@@ -0,0 +1,343 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import base64
+import json
+from datetime import timedelta
+
+import pytest
+import requests
+
+from itbench_utilities.app.config import AppConfig, ServiceAccount
+from itbench_utilities.app.models.benchmark import (
+    BenchmarkJob,
+    BenchmarkJobHeartbeat,
+    BenchmarkJobTake,
+)
+from itbench_utilities.app.utils import (
+    get_timestamp,
+    is_job_claimable,
+    renew_job_lease,
+)
+from itbench_utilities.bench_runner import runner as runner_module
+from itbench_utilities.bench_runner.runner import BenchmarkRunner
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeJobClient:
+    # Stand-in for the job endpoints of the Bench Server, including job leases.
+
+    def __init__(self, jobs, support_heartbeat=True):
+        self.jobs = [BenchmarkJob.model_validate(x) for x in jobs]
+        self.released = []
+        self.heartbeats = []
+        self.assigned_elsewhere = set()
+        self.deleted = set()
+        self.support_heartbeat = support_heartbeat
+
+    @property
+    def taken(self):
+        return {x.benchmark.metadata.id for x in self.jobs if x.benchmark.spec.runner_id and x.benchmark.metadata.id not in self.assigned_elsewhere}
+
+    def get_spec(self, benchmark_id):
+        return next(x.benchmark.spec for x in self.jobs if x.benchmark.metadata.id == benchmark_id)
+
+    def get(self, endpoint):
+        return FakeResponse([x.model_dump(mode="json") for x in self.jobs if is_job_claimable(x.benchmark.spec)])
+
+    def put(self, endpoint, body=None):
+        benchmark_id = endpoint.split("/")[2]
+        spec = self.get_spec(benchmark_id)
+        if endpoint.endswith("release_benchmark_job"):
+            self.released.append(benchmark_id)
+            spec.runner_id, spec.lease_expires_at = None, None
+            return FakeResponse({"success": True})
+        if endpoint.endswith("heartbeat"):
+            if not self.support_heartbeat:
+                return FakeResponse({"detail": "Method Not Allowed"}, status_code=405)
+            if benchmark_id in self.deleted:
+                return FakeResponse({"detail": "Not Found"}, status_code=404)
+            heartbeat = BenchmarkJobHeartbeat.model_validate_json(body)
+            self.heartbeats.append(benchmark_id)
+            return FakeResponse({"success": renew_job_lease(spec, heartbeat.runner_id, heartbeat.lease_seconds)})
+        take = BenchmarkJobTake.model_validate_json(body)
+        if benchmark_id in self.assigned_elsewhere or not is_job_claimable(spec):
+            return FakeResponse({"success": False})
+        return FakeResponse({"success": renew_job_lease(spec, take.runner_id, 60)})
+
+
+def build_job(benchmark_id: str):
+    return {
+        "benchmark": {
+            "metadata": {"id": benchmark_id, "resource_type": "benchmarks", "creation_timestamp": "2024-10-01T00:00:00Z"},
+            "spec": {"name": benchmark_id, "agent_access": {"agent_ids": []}, "scenario_access": {"scenario_ids": []}},
+        },
+        "agent_manifest": {"manifest_version": "v1.0", "token": "token", "agent_id": "agent", "bench_url": "http://localhost"},
+    }
+
+
+def test_runner_max_concurrent_tasks(monkeypatch):
+    jobs = [build_job(f"benchmark{i}") for i in range(6)]
+    runner = BenchmarkRunner(AppConfig(max_concurrent_tasks=1), "runner1", interval=0, max_concurrent_tasks=3)
+    assert runner.max_concurrent_tasks == 3
+    job_client = FakeJobClient(jobs)
+    monkeypatch.setattr(runner, "init_job_client", lambda: setattr(runner, "job_client", job_client))
+    monkeypatch.setattr(runner, "auth_job_client", lambda: None)
+
+    peak = {"running": 0, "max": 0, "done": 0}
+
+    async def fake_run_benchmark(benchmark, agent_manifest):
+        peak["running"] += 1
+        peak["max"] = max(peak["max"], peak["running"])
+        await asyncio.sleep(0.05)
+        peak["running"] -= 1
+        peak["done"] += 1
+        if peak["done"] == len(jobs):
+            await runner.stop()
+
+    monkeypatch.setattr(runner, "run_benchmark", fake_run_benchmark)
+    asyncio.run(asyncio.wait_for(runner.run(), timeout=10))
+    assert peak["max"] == 3
+    assert runner.running_tasks == 0
+
+
+def test_runner_claim_jobs():
+    jobs = [build_job(f"benchmark{i}") for i in range(6)]
+    runner = BenchmarkRunner(AppConfig(), "runner1", max_concurrent_tasks=2)
+    runner.job_client = FakeJobClient(jobs)
+    runner.job_client.assigned_elsewhere = {"benchmark0"}
+
+    claimed = asyncio.run(runner.claim_jobs([BenchmarkJob.model_validate(x) for x in jobs], 2))
+    assert len(claimed) == 2
+    # 4 claims are sent for 2 free slots: one loses to another runner and one extra win is released.
+    assert len(runner.job_client.released) == 1
+    assert runner.job_client.taken == {x.benchmark.metadata.id for x in claimed}
+
+
+class FakeBenchmark:
+    def __init__(self):
+        self.drained = False
+        self.aborted = asyncio.Event()
+
+    def drain(self):
+        self.drained = True
+
+    def abort(self):
+        self.aborted.set()
+
+
+def test_runner_drain_on_shutdown(monkeypatch):
+    jobs = [build_job(f"benchmark{i}") for i in range(2)]
+    app_config = AppConfig(shutdown_grace_period=0, shutdown_abort_timeout=0)
+    runner = BenchmarkRunner(app_config, "runner1", interval=0, max_concurrent_tasks=2)
+    job_client = FakeJobClient(jobs)
+    monkeypatch.setattr(runner, "init_job_client", lambda: setattr(runner, "job_client", job_client))
+    monkeypatch.setattr(runner, "auth_job_client", lambda: None)
+    fake_benchmarks = {}
+
+    async def fake_run_benchmark(benchmark, agent_manifest):
+        benchmark_id = benchmark.metadata.id
+        fake_benchmarks[benchmark_id] = runner.jobs[benchmark_id] = FakeBenchmark()
+        if len(fake_benchmarks) == len(jobs):
+            runner.request_shutdown()
+        if benchmark_id == "benchmark0":
+            # Cleans up once aborted.
+            await fake_benchmarks[benchmark_id].aborted.wait()
+            runner.jobs.pop(benchmark_id)
+        else:
+            # Never finishes the cleanup.
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(runner, "run_benchmark", fake_run_benchmark)
+    asyncio.run(asyncio.wait_for(runner.run(), timeout=5))
+    assert all(x.drained for x in fake_benchmarks.values())
+    assert all(x.aborted.is_set() for x in fake_benchmarks.values())
+    assert job_client.released == ["benchmark1"]
+
+
+def test_runner_job_lease():
+    job_client = FakeJobClient([build_job("benchmark0")])
+    runner = BenchmarkRunner(AppConfig(job_lease_seconds=3), "runner1")
+    runner.job_client = job_client
+    other_runner = BenchmarkRunner(AppConfig(), "runner2")
+    other_runner.job_client = job_client
+    assert runner.take_benchmark_job("benchmark0")
+    # Another runner cannot take the job while the lease is valid.
+    assert not other_runner.take_benchmark_job("benchmark0")
+    spec = job_client.get_spec("benchmark0")
+    assert not is_job_claimable(spec)
+
+    async def run_heartbeat():
+        task = asyncio.create_task(runner.heartbeat("benchmark0"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run_heartbeat())
+    assert job_client.heartbeats == ["benchmark0"]
+    assert spec.runner_id == "runner1"
+
+    # The runner died: once the lease expires, the job is listed and can be taken again.
+    assert is_job_claimable(spec, now=get_timestamp() + timedelta(seconds=4))
+    spec.lease_expires_at = get_timestamp() - timedelta(seconds=1)
+    assert [x["benchmark"]["metadata"]["id"] for x in job_client.get("/benchmarks/queue/list_benchmark_jobs").json()] == ["benchmark0"]
+    assert other_runner.take_benchmark_job("benchmark0")
+    assert spec.runner_id == "runner2"
+    assert runner.renew_job_lease("benchmark0") is False
+
+
+class FakeBenchmarkClient:
+    # Stand-in for the RestClient a job uses with its agent token.
+    updates = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get(self, endpoint):
+        return FakeResponse([])
+
+    def put(self, endpoint, body=None):
+        FakeBenchmarkClient.updates.append(BenchmarkJob.model_validate({"benchmark": json.loads(body)}).benchmark.status.phase)
+        return FakeResponse({"success": True})
+
+
+def test_runner_aborts_job_on_lost_lease(monkeypatch):
+    job_client = FakeJobClient([build_job("benchmark0")])
+    runner = BenchmarkRunner(AppConfig(job_lease_seconds=3), "runner1", single_run=True, interval=1)
+    monkeypatch.setattr(runner, "init_job_client", lambda: setattr(runner, "job_client", job_client))
+    monkeypatch.setattr(runner, "auth_job_client", lambda: None)
+    monkeypatch.setattr(runner_module, "RestClient", FakeBenchmarkClient)
+    FakeBenchmarkClient.updates = []
+    fake_benchmark = FakeBenchmark()
+
+    async def fake_run_job_in_thread(benchmark_id, bench_run_config, client):
+        runner.jobs[benchmark_id] = fake_benchmark
+        # Another runner takes over the job, e.g. after a network partition let the lease expire.
+        job_client.get_spec(benchmark_id).runner_id = "runner2"
+        await asyncio.wait_for(fake_benchmark.aborted.wait(), timeout=5)
+        return True
+
+    monkeypatch.setattr(runner, "run_job_in_thread", fake_run_job_in_thread)
+    asyncio.run(asyncio.wait_for(runner.run(), timeout=10))
+    assert fake_benchmark.aborted.is_set()
+    # The job belongs to the other runner: it is neither released nor reported as finished or queued.
+    assert job_client.released == []
+    assert job_client.get_spec("benchmark0").runner_id == "runner2"
+    assert FakeBenchmarkClient.updates == ["Running"]
+    assert runner.lost_leases == set()
+
+
+def test_runner_heartbeat_not_supported():
+    job_client = FakeJobClient([build_job("benchmark0")], support_heartbeat=False)
+    runner = BenchmarkRunner(AppConfig(job_lease_seconds=3), "runner1")
+    runner.job_client = job_client
+    asyncio.run(asyncio.wait_for(runner.heartbeat("benchmark0"), timeout=5))
+    assert not runner.heartbeat_supported
+
+
+def test_runner_heartbeat_job_not_found():
+    job_client = FakeJobClient([build_job("benchmark0"), build_job("benchmark1")])
+    runner = BenchmarkRunner(AppConfig(job_lease_seconds=3), "runner1")
+    runner.job_client = job_client
+    for benchmark_id in ["benchmark0", "benchmark1"]:
+        assert runner.take_benchmark_job(benchmark_id)
+        runner.jobs[benchmark_id] = FakeBenchmark()
+    # One benchmark is deleted while it runs.
+    job_client.deleted = {"benchmark1"}
+
+    async def run_heartbeats():
+        tasks = [asyncio.create_task(runner.heartbeat(x)) for x in ["benchmark0", "benchmark1"]]
+        await asyncio.sleep(0.1)
+        assert not tasks[0].done()
+        assert tasks[1].done()
+        tasks[0].cancel()
+
+    asyncio.run(run_heartbeats())
+    # Only the missing job is aborted; the lease of the other one is still renewed.
+    assert runner.heartbeat_supported
+    assert runner.lost_leases == {"benchmark1"}
+    assert runner.jobs["benchmark1"].aborted.is_set()
+    assert not runner.jobs["benchmark0"].aborted.is_set()
+    assert job_client.heartbeats == ["benchmark0"]
+
+
+class FakeAuthServer:
+    # Issues JWT access tokens on /token and rejects other requests whose token is unknown or expired.
+
+    def __init__(self, token_ttl=3600):
+        self.token_ttl = token_ttl
+        self.logins = 0
+        self.tokens = set()
+        self.reject_all = False
+
+    def issue_token(self) -> str:
+        self.logins += 1
+        claims = {"sub": "runner-sa", "name": "runner-sa", "user_type": "service", "exp": int(get_timestamp().timestamp()) + self.token_ttl}
+        encode = lambda x: base64.urlsafe_b64encode(json.dumps(x).encode("utf-8")).decode("utf-8").rstrip("=")
+        token = f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(claims)}.{self.logins}"
+        self.tokens.add(token)
+        return token
+
+    def request(self, method, url, headers=None, **kwargs):
+        response = requests.Response()
+        if url.endswith("/token"):
+            response.status_code, data = 200, {"access_token": self.issue_token(), "token_type": "bearer"}
+        elif not self.reject_all and (headers or {}).get("Authorization", "").removeprefix("Bearer ") in self.tokens:
+            response.status_code, data = 200, []
+        else:
+            response.status_code, data = 401, {"detail": "Could not validate credentials"}
+        response._content = json.dumps(data).encode("utf-8")
+        return response
+
+
+def test_runner_token_cache(monkeypatch):
+    server = FakeAuthServer()
+    monkeypatch.setattr(requests, "request", server.request)
+    app_config = AppConfig(service_accounts=[ServiceAccount(id="runner-sa", type="runner")])
+    runner = BenchmarkRunner(app_config, "runner1", service_type="runner")
+    runner.init_job_client()
+    for _ in range(3):
+        runner.auth_job_client()
+        assert runner.job_client.get("/benchmarks/queue/list_benchmark_jobs").json() == []
+    assert server.logins == 1
+
+    # The server no longer accepts the token: log in again and retry once.
+    server.tokens.clear()
+    assert runner.job_client.get("/benchmarks/queue/list_benchmark_jobs").json() == []
+    assert server.logins == 2
+
+    # A token about to expire is renewed ahead of time.
+    server.token_ttl = 10
+    runner.auth_job_client(force=True)
+    runner.auth_job_client()
+    assert server.logins == 4
+
+    # No retry loop when the new token is rejected too.
+    server.reject_all = True
+    with pytest.raises(requests.HTTPError):
+        runner.job_client.get("/benchmarks/queue/list_benchmark_jobs")
+    assert server.logins == 5
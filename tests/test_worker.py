@@ -0,0 +1,145 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import os
+import time
+
+import pytest
+
+import itbench_utilities.benchmark
+from itbench_utilities.app.config import AppConfig
+from itbench_utilities.bench_runner import worker
+from itbench_utilities.bench_runner.worker import (
+    WorkerError,
+    WorkerJob,
+    WorkerProcess,
+    open_benchmark_job,
+)
+from itbench_utilities.common import metrics
+from itbench_utilities.models.benchmark import BenchConfig, BenchRunConfig
+from itbench_utilities.observer import DispatchMode, QueueFullPolicy
+
+
+def build_worker_job(tmp_path) -> WorkerJob:
+    bench_run_config = BenchRunConfig(
+        benchmark_id="benchmark0", config=BenchConfig(title="test", is_test=True, soft_delete=False), agents=[], bundles=[], output_dir=str(tmp_path)
+    )
+    return WorkerJob(benchmark_id="benchmark0", bench_run_config=bench_run_config, app_config=AppConfig(), host="localhost", port=8000)
+
+
+# Worker targets run in a spawned process, so they must be importable module-level functions.
+def drained_worker(conn, job):
+    conn.send(("heartbeat", None))
+    command, _ = conn.recv()
+    conn.send(("result", {"interrupted": command == "drain"}))
+
+
+def allocating_worker(conn, job):
+    data = bytearray(256 * 1024 * 1024)
+    conn.send(("heartbeat", None))
+    time.sleep(60)
+    del data
+
+
+def hanging_worker(conn, job):
+    time.sleep(60)
+
+
+def crashing_worker(conn, job):
+    os._exit(3)
+
+
+def metrics_worker(conn, job):
+    def run_benchmark(self, bench_run_config, client):
+        metrics.SUBPROCESSES.inc(kind="worker_test")
+        # Still running when the job ends, e.g. a make target left behind.
+        metrics.RUNNING_SUBPROCESSES.inc(kind="worker_test")
+        metrics.BUNDLE_PHASE_DURATION.observe(1.5, phase="worker_test")
+
+    itbench_utilities.benchmark.Benchmark.run_benchmark = run_benchmark
+    worker.run_worker(conn, job)
+
+
+def run_worker_process(job, **kwargs) -> WorkerProcess:
+    async def run():
+        worker = WorkerProcess(job, **kwargs)
+        worker.start()
+        worker.drain()
+        await worker.wait()
+        return worker
+
+    return asyncio.run(asyncio.wait_for(run(), timeout=60))
+
+
+def test_worker_process_runs_benchmark(tmp_path):
+    job = build_worker_job(tmp_path)
+    job.app_config.log_dir = str(tmp_path)
+    worker = run_worker_process(job)
+    # Drained before any scenario started.
+    assert worker.result == {"interrupted": False}
+    assert (tmp_path / "benchmark_results.jsonl").exists()
+    assert (tmp_path / "log_benchmark0.log").exists()
+
+
+def test_worker_process_result(tmp_path):
+    worker = run_worker_process(build_worker_job(tmp_path), target=drained_worker)
+    assert worker.interrupted
+    assert worker.process.exitcode == 0
+
+
+@pytest.mark.parametrize("start_method", ["spawn", "fork"])
+def test_worker_process_metrics(tmp_path, start_method):
+    job = build_worker_job(tmp_path)
+    job.app_config.log_dir = str(tmp_path)
+    metrics.SUBPROCESSES.inc(kind="worker_test")
+    subprocesses = metrics.SUBPROCESSES.get(kind="worker_test")
+    observations = metrics.BUNDLE_PHASE_DURATION.get_count(phase="worker_test")
+
+    worker = run_worker_process(job, target=metrics_worker, start_method=start_method)
+    assert worker.result == {"interrupted": False}
+    # The metrics recorded in the worker are exposed by the runner once; its gauges are withdrawn when it exits.
+    assert metrics.SUBPROCESSES.get(kind="worker_test") == subprocesses + 1
+    assert metrics.BUNDLE_PHASE_DURATION.get_count(phase="worker_test") == observations + 1
+    assert metrics.RUNNING_SUBPROCESSES.get(kind="worker_test") == 0
+
+
+def test_worker_process_memory_limit(tmp_path):
+    with pytest.raises(WorkerError, match="memory limit"):
+        run_worker_process(build_worker_job(tmp_path), target=allocating_worker, memory_limit=128 * 1024 * 1024, abort_timeout=0)
+
+
+def test_worker_process_time_limit(tmp_path):
+    with pytest.raises(WorkerError, match="time limit"):
+        run_worker_process(build_worker_job(tmp_path), target=hanging_worker, time_limit=1, abort_timeout=0)
+
+
+def test_worker_process_heartbeat_timeout(tmp_path):
+    with pytest.raises(WorkerError, match="no heartbeat"):
+        run_worker_process(build_worker_job(tmp_path), target=hanging_worker, heartbeat_timeout=1, abort_timeout=0)
+
+
+def test_worker_process_crash(tmp_path):
+    with pytest.raises(WorkerError, match="exited with code 3"):
+        run_worker_process(build_worker_job(tmp_path), target=crashing_worker)
+
+
+def test_open_benchmark_job_observer_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(worker, "DEFAULT_DISPATCH_MODE", "async")
+    monkeypatch.setattr(worker, "DEFAULT_FULL_POLICY", "block")
+    with open_benchmark_job("benchmark0", AppConfig(log_dir=str(tmp_path))) as benchmark_runner:
+        assert benchmark_runner.observer.mode == DispatchMode.Async
+        assert benchmark_runner.observer.full_policy == QueueFullPolicy.Block
+    assert benchmark_runner.observer.closed